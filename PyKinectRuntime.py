@@ -11,6 +11,8 @@ import time
 
 import importlib 
 
+from framering import FrameRing, body_frame_dtype
+
 if sys.hexversion >= 0x03000000: 
     import _thread as thread
 else:
@@ -21,7 +23,14 @@ COUNT = 0
 
 class PyKinectRuntime(object):
     """manages Kinect objects and simplifying access to them"""
-    def __init__(self, frame_source_types):
+    def __init__(self, frame_source_types, export=None, export_slots=4, export_color_points=False):
+        """
+        :param frame_source_types: FrameSourceTypes_* flags of the opened streams
+        :param export: optional, prefix of shared memory rings that color, depth and body frames are
+            exported to (<prefix>-color, <prefix>-depth, <prefix>-body), see framering.FrameRing.attach
+        :param export_slots: number of frames in every ring
+        :param export_color_points: True to also export the color space points of all joints of the bodies
+        """
         # recipe to get address of surface: http://archives.seul.org/pygame/users/Apr-2008/msg00218.html
         is_64bits = sys.maxsize > 2**32
         if not is_64bits:
@@ -154,6 +163,22 @@ class PyKinectRuntime(object):
             self._handles[self._waitHandleCount] = self._body_frame_arrived_event
             self._waitHandleCount += 1
 
+        # frames are also written to shared memory, so other processes can read them without copying
+        self._color_ring = None
+        self._depth_ring = None
+        self._body_ring = None
+        if export is not None:
+            if self.frame_source_types & FrameSourceTypes_Color:
+                self._color_ring = FrameRing.create(export + "-color", (self.color_frame_desc.Height, self.color_frame_desc.Width, 4), numpy.uint8, export_slots)
+            if self.frame_source_types & FrameSourceTypes_Depth:
+                self._depth_ring = FrameRing.create(export + "-depth", (self.depth_frame_desc.Height, self.depth_frame_desc.Width), numpy.uint16, export_slots)
+            if self.frame_source_types & FrameSourceTypes_Body:
+                self._body_ring = FrameRing.create(export + "-body", (), body_frame_dtype(self.max_body_count), export_slots)
+                self._body_record = numpy.zeros((), dtype=self._body_ring.dtype)
+        self._export_mapper = self._mapper if export_color_points else None
+
+        self.jitter = None # optional, object with add(time), gets the arrival time of every body frame
+
         thread.start_new_thread(self.kinect_frame_thread, ())
 
         self._last_color_frame = None
@@ -164,7 +189,7 @@ class PyKinectRuntime(object):
         self._last_long_exposure_infrared_frame = None
         self._last_audio_frame = None
 
-        start_clock = time.clock()
+        start_clock = time.perf_counter()
         self._last_color_frame_access = self._last_color_frame_time = start_clock
         self._last_body_frame_access = self._last_body_frame_time = start_clock
         self._last_body_index_frame_access = self._last_body_index_frame_time = start_clock
@@ -193,6 +218,11 @@ class PyKinectRuntime(object):
             self._sensor.Close()
             self._sensor = None
 
+            for ring in (self._color_ring, self._depth_ring, self._body_ring):
+                if ring is not None:
+                    ring.close()
+            self._color_ring = self._depth_ring = self._body_ring = None
+
     def __del__(self):
         self.close()
 
@@ -244,7 +274,7 @@ class PyKinectRuntime(object):
         with self._color_frame_lock:
             if self._color_frame_data is not None:
                 data = numpy.copy(numpy.ctypeslib.as_array(self._color_frame_data, shape=(self._color_frame_data_capacity.value,)))
-                self._last_color_frame_access = time.clock()
+                self._last_color_frame_access = time.perf_counter()
                 return data
             else:
                 return None
@@ -253,7 +283,7 @@ class PyKinectRuntime(object):
         with self._infrared_frame_lock:
             if self._infrared_frame_data is not None:
                 data = numpy.copy(numpy.ctypeslib.as_array(self._infrared_frame_data, shape=(self._infrared_frame_data_capacity.value,)))
-                self._last_infrared_frame_access = time.clock()
+                self._last_infrared_frame_access = time.perf_counter()
                 return data
             else:
                 return None
@@ -262,7 +292,7 @@ class PyKinectRuntime(object):
         with self._depth_frame_lock:
             if self._depth_frame_data is not None:
                 data = numpy.copy(numpy.ctypeslib.as_array(self._depth_frame_data, shape=(self._depth_frame_data_capacity.value,)))
-                self._last_depth_frame_access = time.clock()
+                self._last_depth_frame_access = time.perf_counter()
                 return data
             else:
                 return None
@@ -271,7 +301,7 @@ class PyKinectRuntime(object):
         with self._body_index_frame_lock:
             if self._body_index_frame_data is not None:
                 data = numpy.copy(numpy.ctypeslib.as_array(self._body_index_frame_data, shape=(self._body_index_frame_data_capacity.value,)))
-                self._last_body_index_frame_access = time.clock()
+                self._last_body_index_frame_access = time.perf_counter()
                 return data
             else:
                 return None
@@ -279,7 +309,7 @@ class PyKinectRuntime(object):
     def get_last_body_frame(self):
         with self._body_frame_lock:
             if self._body_frame_bodies is not None:
-                self._last_body_frame_access = time.clock()
+                self._last_body_frame_access = time.perf_counter()
                 return self._body_frame_bodies.copy()
             else:
                 return None
@@ -291,9 +321,16 @@ class PyKinectRuntime(object):
     def body_joint_to_depth_space(self, joint): 
         return self._mapper.MapCameraPointToDepthSpace(joint.Position) 
 
+    def camera_point_to_color_space(self, position):
+        """
+        :param position: camera space point (x, y, z) in m, e.g. a smoothed joint position
+        :return: _ColorSpacePoint
+        """
+        return self._mapper.MapCameraPointToColorSpace(PyKinectV2._CameraSpacePoint(*[float(v) for v in position]))
+
 
     def body_joints_to_color_space(self, joints):
-        joint_points = numpy.ndarray((PyKinectV2.JointType_Count), dtype=numpy.object)
+        joint_points = numpy.ndarray((PyKinectV2.JointType_Count), dtype=object)
 
         for j in range(0, PyKinectV2.JointType_Count):
             joint_points[j] = self.body_joint_to_color_space(joints[j])
@@ -301,7 +338,7 @@ class PyKinectRuntime(object):
         return joint_points
 
     def body_joints_to_depth_space(self, joints):
-        joint_points = numpy.ndarray((PyKinectV2.JointType_Count), dtype=numpy.object)
+        joint_points = numpy.ndarray((PyKinectV2.JointType_Count), dtype=object)
 
         for j in range(0, PyKinectV2.JointType_Count):
             joint_points[j] = self.body_joint_to_depth_space(joints[j])
@@ -341,7 +378,9 @@ class PyKinectRuntime(object):
             try:
                 with self._color_frame_lock:
                     colorFrame.CopyConvertedFrameDataToArray(self._color_frame_data_capacity, self._color_frame_data, PyKinectV2.ColorImageFormat_Bgra)
-                    self._last_color_frame_time = time.clock()
+                    self._last_color_frame_time = time.perf_counter()
+                if self._color_ring is not None: # only this thread writes the frame data, no lock needed
+                    self._color_ring.write(numpy.ctypeslib.as_array(self._color_frame_data, shape=self._color_ring.shape), self._last_color_frame_time)
             except: 
                 pass
             colorFrame = None
@@ -359,7 +398,9 @@ class PyKinectRuntime(object):
             try:
                 with self._depth_frame_lock:
                     depthFrame.CopyFrameDataToArray(self._depth_frame_data_capacity, self._depth_frame_data)
-                    self._last_depth_frame_time = time.clock()
+                    self._last_depth_frame_time = time.perf_counter()
+                if self._depth_ring is not None:
+                    self._depth_ring.write(numpy.ctypeslib.as_array(self._depth_frame_data, shape=self._depth_ring.shape), self._last_depth_frame_time)
             except:
                 pass
             depthFrame = None
@@ -379,7 +420,11 @@ class PyKinectRuntime(object):
                 with self._body_frame_lock:
                     bodyFrame.GetAndRefreshBodyData(self._body_frame_data_capacity, self._body_frame_data)
                     self._body_frame_bodies = KinectBodyFrameData(bodyFrame, self._body_frame_data, self.max_body_count)
-                    self._last_body_frame_time = time.clock()
+                    self._last_body_frame_time = time.perf_counter()
+                if self._body_ring is not None:
+                    self._body_ring.write(self._body_frame_bodies.as_record(self._body_record, self._export_mapper), self._last_body_frame_time)
+                if self.jitter is not None:
+                    self.jitter.add(self._last_body_frame_time)
 
                 # need these 2 lines as a workaround for handling IBody referencing exception 
                 self._body_frame_data = None
@@ -403,7 +448,7 @@ class PyKinectRuntime(object):
             try:
                 with self._body_index_frame_lock:
                     bodyIndexFrame.CopyFrameDataToArray(self._body_index_frame_data_capacity, self._body_index_frame_data)
-                    self._last_body_index_frame_time = time.clock()
+                    self._last_body_index_frame_time = time.perf_counter()
             except: 
                 pass
             bodyIndexFrame = None
@@ -420,7 +465,7 @@ class PyKinectRuntime(object):
             try:
                 with self._infrared_frame_lock:
                     infraredFrame.CopyFrameDataToArray(self._infrared_frame_data_capacity, self._infrared_frame_data)
-                    self._last_infrared_frame_time = time.clock()
+                    self._last_infrared_frame_time = time.perf_counter()
             except:
                 pass
             infraredFrame = None
@@ -472,6 +517,26 @@ class KinectBody(object):
             body.GetJointOrientations(PyKinectV2.JointType_Count, joint_orientations)
             self.joint_orientations = joint_orientations
 
+def joints_as_array(joints):
+    """
+    view of the joints of one body as numpy array without copying
+    _Joint is (JointType, Position.x, Position.y, Position.z, TrackingState), 5 x 4 byte
+
+    :param joints: ctypes pointer to JointType_Count _Joint structures (KinectBody.joints)
+    :return: float32 array (JointType_Count, 5), positions are columns 1:4
+    """
+    return numpy.ctypeslib.as_array(ctypes.cast(joints, ctypes.POINTER(ctypes.c_float)), shape=(PyKinectV2.JointType_Count, 5))
+
+def joint_orientations_as_array(joint_orientations):
+    """
+    view of the joint orientations of one body as numpy array without copying
+    _JointOrientation is (JointType, Orientation.x, Orientation.y, Orientation.z, Orientation.w), 5 x 4 byte
+
+    :param joint_orientations: ctypes pointer to JointType_Count _JointOrientation structures (KinectBody.joint_orientations)
+    :return: float32 array (JointType_Count, 5), quaternions are columns 1:5
+    """
+    return numpy.ctypeslib.as_array(ctypes.cast(joint_orientations, ctypes.POINTER(ctypes.c_float)), shape=(PyKinectV2.JointType_Count, 5))
+
 class KinectBodyFrameData(object): 
     def __init__(self, bodyFrame, body_frame_data, max_body_count):
         self.bodies = None
@@ -480,10 +545,82 @@ class KinectBodyFrameData(object):
             self.floor_clip_plane = bodyFrame.FloorClipPlane
             self.relative_time = bodyFrame.RelativeTime
 
-            self.bodies = numpy.ndarray((max_body_count), dtype=numpy.object)
+            self.bodies = numpy.ndarray((max_body_count), dtype=object)
             for i in range(0, max_body_count):
                self.bodies[i] = KinectBody(body_frame_data[i])
 
+    def joint_positions(self):
+        """
+        positions of all joints of all bodies in one array, for vectorized processing
+
+        :return: tuple (positions, tracked) - float32 array (body count, JointType_Count, 3) with NaN for
+            untracked bodies, and bool array (body count,) which bodies are tracked
+        """
+        positions = numpy.full((len(self.bodies), PyKinectV2.JointType_Count, 3), numpy.nan, dtype=numpy.float32)
+        tracked = numpy.zeros(len(self.bodies), dtype=bool)
+        for i in range(0, len(self.bodies)):
+            body = self.bodies[i]
+            if body is None or not body.is_tracked:
+                continue
+            positions[i] = joints_as_array(body.joints)[:, 1:4]
+            tracked[i] = True
+        return positions, tracked
+
+    def joint_orientations(self):
+        """
+        orientations of all joints of all bodies in one array, for vectorized processing
+
+        :return: float32 array (body count, JointType_Count, 4) of quaternions (x, y, z, w), NaN for untracked bodies
+        """
+        orientations = numpy.full((len(self.bodies), PyKinectV2.JointType_Count, 4), numpy.nan, dtype=numpy.float32)
+        for i in range(0, len(self.bodies)):
+            body = self.bodies[i]
+            if body is None or not body.is_tracked:
+                continue
+            orientations[i] = joint_orientations_as_array(body.joint_orientations)[:, 1:5]
+        return orientations
+
+    def joint_tracking_states(self):
+        """
+        tracking states of all joints of all bodies in one array, for masking inferred joints
+
+        :return: uint8 array (body count, JointType_Count) of TrackingState_*, TrackingState_NotTracked for untracked bodies
+        """
+        states = numpy.full((len(self.bodies), PyKinectV2.JointType_Count), PyKinectV2.TrackingState_NotTracked, dtype=numpy.uint8)
+        for i in range(0, len(self.bodies)):
+            body = self.bodies[i]
+            if body is None or not body.is_tracked:
+                continue
+            # TrackingState is the int32 enum in the last column of _Joint
+            states[i] = joints_as_array(body.joints).view(numpy.int32)[:, 4]
+        return states
+
+    def as_record(self, out, mapper=None):
+        """
+        all bodies of the frame as one fixed size record, e.g. for a framering.FrameRing
+
+        :param out: array of framering.body_frame_dtype(body count), overwritten
+        :param mapper: optional ICoordinateMapper, to fill the color space points of the joints
+        :return: out
+        """
+        out.fill(0)
+        for i in range(0, len(self.bodies)):
+            body = self.bodies[i]
+            if body is None or not body.is_tracked:
+                continue
+            out['tracked'][i] = True
+            out['tracking_id'][i] = body.tracking_id
+            out['hand_states'][i] = (body.hand_left_state, body.hand_right_state)
+            out['joints'][i] = joints_as_array(body.joints)
+            out['orientations'][i] = joint_orientations_as_array(body.joint_orientations)[:, 1:5]
+            if mapper is not None: # all joints of the body with one call
+                camera_points = (PyKinectV2._CameraSpacePoint * PyKinectV2.JointType_Count)()
+                numpy.ctypeslib.as_array(ctypes.cast(camera_points, ctypes.POINTER(ctypes.c_float)), shape=(PyKinectV2.JointType_Count, 3))[:] = out['joints'][i][:, 1:4]
+                color_points = (PyKinectV2._ColorSpacePoint * PyKinectV2.JointType_Count)()
+                mapper.MapCameraPointsToColorSpace(PyKinectV2.JointType_Count, camera_points, PyKinectV2.JointType_Count, color_points)
+                out['color_points'][i] = numpy.ctypeslib.as_array(ctypes.cast(color_points, ctypes.POINTER(ctypes.c_float)), shape=(PyKinectV2.JointType_Count, 2))
+        return out
+
     def copy(self):
         res = KinectBodyFrameData(None, None, 0)
         res.floor_clip_plane = self.floor_clip_plane
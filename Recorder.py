@@ -6,29 +6,34 @@ import PyKinectRuntime
 import ctypes
 import _ctypes
 import pygame
-import sys
 
-import csv
+import argparse
 import time
 import datetime
 import os
 
+import numpy as np
 import pandas as pd
 
-import logging
-import threading
-import time
-
 import zmq
 import json
 
-if sys.hexversion >= 0x03000000:
-    import _thread as thread
-else:
-    import thread
+from poi import POIRegistry, POI_COLUMNS, DISTANCE_COLUMNS, distance_table
+from zones import ZoneTracker, ZONE_EVENT_COLUMNS
+from eventlog import EventLog, DEFAULT_EVENT_TYPES
+from tracks import TrackStore
+from smoothing import FILTERS
+from motion import MotionGate
+from capture import CaptureProxy, JitterMonitor
+from skeleton import SkeletonPublisher
+from classifier import LiveClassifier, PREDICTION_COLUMNS
+from session import RecordingSession, DEFAULT_PROFILES_FILE, load_profiles, frame_source_types
+from selection import RecordingSelection
+from wal import WriteAheadLog, WAL_FILE, RECORD_POI, RECORD_ZONE
 
 
-debug_no_csv = False # debug if testrun should not produce csv files
+# config file with POI categories, their keys and radii
+DEFAULT_POI_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "poi_config.json")
 
 
 # colors for drawing different bodies 
@@ -44,23 +49,69 @@ class Recorder(object):
     """
     This class can be used to record skeleton points and positioned points-of-interest in csv-files.
 
-    After creating the recorder, start by calling run.
+    After creating the recorder, start by calling run. The recorder can also be created from a
+    recording profile (see profiles.json) with Recorder.from_profile.
     """
-    def __init__(self):
+    def __init__(self, session=None, streams=("color", "body"), capture="thread", export=None, preview_rate=60, headless=False, joints=None, hand_states=False,
+                 orientations=False, tracking_states=False, tables=None, duration=None,
+                 poi_config=DEFAULT_POI_CONFIG, distance_format="long", zone_address=None, skeleton_address=None, event_types=DEFAULT_EVENT_TYPES,
+                 joint_filter=None, motion_gate=None, classifier=None, classifier_window=30, wal=True):
         """
         Create the Recorder and lists for collecting data
+
+        :param session: RecordingSession the data is saved into, default a new session in recordings/
+        :param streams: Kinect streams that are opened, keys of session.STREAMS
+        :param capture: "thread" to capture in a thread of this process, "process" to capture in a separate
+            process (frames come through shared memory, capture jitter does not depend on the window)
+        :param export: optional, prefix of the shared memory rings that frames are exported to for
+            analysis in other processes, see framering.py
+        :param preview_rate: frames per second of the main loop and the preview window
+        :param headless: True to record without window (no key input)
+        :param joints: names of recorded joints, None for all joints (HandTipRight is always recorded)
+        :param hand_states: True to record open/closed state of both hands
+        :param orientations: True to record joint orientations (quaternions), saved in kin-sample-full.csv
+        :param tracking_states: True to record joint tracking states (tracked/inferred), saved in kin-sample-full.csv
+        :param tables: names of saved tables (see selection.TABLES), None for all tables
+        :param duration: seconds after which the recording stops, None to stop by closing the window
+        :param poi_config: path of JSON file with POI categories, see poi_config.json
+        :param distance_format: "long" to save distances with one row per sample and POI,
+            "wide" for one row per sample and one column per configured POI key
+        :param zone_address: optional address (proto://host:port) of a PUB socket, zone events
+            are published there as JSON as soon as they happen
+        :param skeleton_address: optional address (proto://host:port) of a PUB socket, every body frame is
+            published there in binary (see skeleton.py), receive it with skeleton.SkeletonSubscriber
+        :param event_types: pygame event types that are logged, None to log all events
+        :param joint_filter: optional, smoothing of joint positions before they are saved, name of a
+            filter in smoothing.FILTERS ("one_euro", "holt") or a smoothing.JointFilter object. The
+            hand tip point is mapped from the smoothed position as well, except with capture="process"
+            (the mapping is done by the capture process on the raw joints). The preview shows raw joints.
+        :param motion_gate: optional, adaptive recording that stores only keyframes while nobody moves,
+            dict of motion.MotionGate parameters or a motion.MotionGate object
+        :param classifier: optional, live activity classifier plugin ("module:ClassName" of a
+            classifier.ActivityClassifier), runs in a worker process on the latest body frames
+        :param classifier_window: number of body frames the classifier gets
+        :param wal: True to log all data to a write-ahead log while recording, so the session can be
+            recovered with wal.py if the process dies (only if the session saves)
         """
-        pygame.init()
+        self.session = session if session is not None else RecordingSession()
+        self.session.start()
 
-        # manage how fast the screen updates
-        self._clock = pygame.time.Clock()
+        self.headless = headless
+        self.preview_rate = preview_rate
+        self.duration = duration
+        # what is recorded and saved, compiled once into index arrays
+        self.selection = RecordingSelection(joints, hand_states, orientations, tracking_states, tables)
 
-        # Set the width and height of the screen [width, height]
-        self._infoObject = pygame.display.Info()
-        self._screen = pygame.display.set_mode((self._infoObject.current_w >> 1, self._infoObject.current_h >> 1), 
-                                               pygame.HWSURFACE|pygame.DOUBLEBUF|pygame.RESIZABLE, 32)
+        pygame.init()
+
+        self._screen = None
+        if not self.headless:
+            # Set the width and height of the screen [width, height]
+            self._infoObject = pygame.display.Info()
+            self._screen = pygame.display.set_mode((self._infoObject.current_w >> 1, self._infoObject.current_h >> 1), 
+                                                   pygame.HWSURFACE|pygame.DOUBLEBUF|pygame.RESIZABLE, 32)
 
-        pygame.display.set_caption("Kinect for Windows v2 Body Game")
+            pygame.display.set_caption("Kinect for Windows v2 Body Game")
 
         # Loop until the user clicks the close button.
         self._done = False
@@ -68,39 +119,98 @@ class Recorder(object):
         # Used to manage how fast the screen updates
         self._clock = pygame.time.Clock()
 
-        # Kinect runtime object, we want only color and body frames 
-        self._kinect = PyKinectRuntime.PyKinectRuntime(PyKinectV2.FrameSourceTypes_Color | PyKinectV2.FrameSourceTypes_Body)
+        # Kinect runtime object with the selected streams, usually color and body frames
+        if capture == "process":
+            self._kinect = CaptureProxy(frame_source_types(streams), export or "kinect-capture")
+        else:
+            self._kinect = PyKinectRuntime.PyKinectRuntime(frame_source_types(streams), export)
+            self._kinect.jitter = JitterMonitor() # arrival times of body frames, the proxy has its own
 
         # back buffer surface for getting Kinect color frames, 32bit color, width and height equal to the Kinect color frame size
-        self._frame_surface = pygame.Surface((self._kinect.color_frame_desc.Width, self._kinect.color_frame_desc.Height), 0, 32)
+        self._frame_surface = None
+        if not self.headless:
+            self._frame_surface = pygame.Surface((self._kinect.color_frame_desc.Width, self._kinect.color_frame_desc.Height), 0, 32)
 
         # here we will store skeleton data 
         self._bodies = None
+        self._bodies_processed = True # False if self._bodies is a new body frame, that is not saved yet
+        # right hand tip of the subject in the latest body frame, also if the frame is not stored by
+        # the motion gate: (color space point, position, frame, timestamp), None without tracked body
+        self._hand_tip = None
+
+        self.kin_counter = 0 # count through the body frames
+        # all samples of all joints of kinect, one track per body (tracking_id),
+        # includes color space points of fingertips (for positioning of POI)
+        self.tracks = TrackStore(self.selection.columns(), self.selection.joints)
+
+        if isinstance(joint_filter, str):
+            joint_filter = FILTERS[joint_filter](body_count=self._kinect.max_body_count)
+        self.joint_filter = joint_filter
+        # map the smoothed hand tip to color space, so hand_tip_point matches the saved positions
+        self._map_filtered = joint_filter is not None and capture != "process"
+
+        if isinstance(motion_gate, dict):
+            motion_gate = MotionGate(body_count=self._kinect.max_body_count, **motion_gate)
+        self.motion_gate = motion_gate
+
+        # live prediction of the activity of the subject, predictions are logged with their latency
+        self.classifier = None
+        if classifier is not None:
+            self.classifier = LiveClassifier(classifier, classifier_window)
+
+        # events from user input of the selected types (default: key down and up, quit), with unicode (key itself, 1-9, a-z, usw)
+        # written to csv incrementally while recording
+        self.events = EventLog(self.session.file("kin-sample-events.csv"), event_types)
+
+        # POIs of all categories (e.g. tires and fields) with current and all positions through time,
+        # the keys that set them are read from the config file
+        self.pois = POIRegistry.from_file(poi_config)
+
+        self.distance_format = distance_format
+        self.distances = [] # distanz between wrist and POIs, columns = DISTANCE_COLUMNS
+
+        # crash-safe log of everything collected, removed after the csv-files are saved,
+        # with the POI categories, so recovery can write the same POI and distance tables
+        self.wal = None
+        if wal and self.session.save:
+            self.wal = WriteAheadLog(self.session.file(WAL_FILE), self.tracks.columns, self.tracks.joints, self.session.name,
+                                     settings={"poi_categories": self.pois.categories, "distance_format": distance_format})
+
+        # enter/dwell/exit of hand joints in the zones around POIs, detected live every frame
+        self.zones = ZoneTracker()
+        self.zone_events = [] # all zone events, columns = ZONE_EVENT_COLUMNS
+        self.zones.register_callback(self.zone_events.append)
+        if self.wal is not None:
+            self.zones.register_callback(lambda event: self.wal.log_json(RECORD_ZONE, event))
+
+        self._zone_socket = None
+        if zone_address is not None:
+            self._zone_socket = zmq.Context.instance().socket(zmq.PUB)
+            self._zone_socket.bind(zone_address)
+            self.zones.register_callback(self.publish_zone_event)
+
+        self.skeleton = None
+        if skeleton_address is not None:
+            self.skeleton = SkeletonPublisher(skeleton_address)
+
+    @classmethod
+    def from_profile(cls, profile, session=None):
+        """
+        Create the Recorder with the settings of a recording profile
 
-        self.kin_counter = 0 # count through the samples
-        self.hand_samples = [] # all samples of hand position of kinect
-        self.full_samples = [] # all samples of all joints of kinect
-        self.events = [] # all events from user input (mouse and key button down and up, mouse movement, window switching, window resizing)
-        self.events_keys = [] # all events with keyboard (only button down), with unicode (key itself, 1-9, a-z, usw)
-
-        # list of one single activity from key start to key end
-        # is filled while recording activity from key_start to key_end
-        # and after key_end directly saved to csv with activity_letter and timestamp in name
-        self.activity = [] # list of samples
-
-        self.finger_points = [] # 3d points and color points of fingertips with timestamp (for positioning of POI)
-
-        # info: columns in self.positions_curr = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp']
-        self.positions_curr = [] # latest positions of POI, if "tire 2" is reset, old position will be overwritten
-        
-        self.positions_all = [] # all positions of all POI through time, no position overwritten when reset
-        self.tires_curr = [] # like positions_curr but only for keys 1-2 = 2 tires
-        self.tires_all = [] # like positions_all but only for keys 1-2 = 2 tires
-        self.fields_curr = [] # like tires_curr but only for keys 3-5 = 3 tires
-        self.fields_all = [] # like positions_all but only for keys 3-5 = 3 tires
-
-        self.distances = [] # distanz between wrist and POIs
-        self.closest = [] # list of bodies and POI they each are closest to - will not be needed/saved
+        :param profile: complete profile settings, see session.load_profiles
+        :param session: RecordingSession, default a new session that saves if the profile output is not "none"
+        """
+        if session is None:
+            session = RecordingSession(save=profile["output"] != "none")
+        return cls(session, streams=profile["streams"], capture=profile["capture"], export=profile["export"], preview_rate=profile["preview_rate"], headless=profile["headless"],
+                   joints=profile["joints"], hand_states=profile["hand_states"], orientations=profile["orientations"],
+                   tracking_states=profile["tracking_states"], tables=profile["tables"], duration=profile["duration"], poi_config=profile["poi_config"],
+                   distance_format=profile["distance_format"], zone_address=profile["zone_address"],
+                   skeleton_address=profile["skeleton_address"],
+                   joint_filter=profile["joint_filter"], motion_gate=profile["motion_gate"],
+                   classifier=profile["classifier"],
+                   classifier_window=profile["classifier_window"], wal=profile["wal"])
 
     def draw_body_bone(self, joints, jointPoints, color, joint0, joint1):
         joint0State = joints[joint0].TrackingState;
@@ -174,225 +284,276 @@ class Recorder(object):
         target_surface.unlock()
 
     def run(self):
+        """
+        record until the window is closed or the duration of the recording is over,
+        then save all collected data into the session
+        """
+        start_time = time.time()
         # -------- Main Program Loop -----------
-        while not self._done:
-            # --- Main event loop
-            for event in pygame.event.get(): # User did something
-                if event.type == pygame.QUIT: # If user clicked close
-                    self._done = True # Flag that we are done so we exit this loop
-
-                elif event.type == pygame.VIDEORESIZE: # window resized
-                    self._screen = pygame.display.set_mode(event.dict['size'], 
-                                               pygame.HWSURFACE|pygame.DOUBLEBUF|pygame.RESIZABLE, 32)
-                # Event Types:
-                # 768 = KEYDOWN - Taste drücken
-                # 769 = KEYUP - Taste loslassen
-
-                # save event into CSV with timestamp
-                events_row = (event.type, self.kin_counter, int(time.time()*1000))
-                self.events.append(events_row)
-                
-                if event.type == 768: # key log - button DOWN
-                    # get last position of fingertips
-                    last_position = self.finger_points[-1:][0]
-                    # pos_row
-                    pos_row = (event.unicode, last_position[0], last_position[1], last_position[2], last_position[3], last_position[4], last_position[5], last_position[6])
-                    
-                    # save keys to csv
-                    keys_row = (event.type, event.unicode, event.scancode, self.kin_counter, int(time.time()*1000))
-                    self.events_keys.append(keys_row)
-
-                    if event.unicode == '1' or event.unicode == '2': # tires
-                        # vorhandenes Tuple in tires_curr überschreiben
-                        self.tires_curr = [i for i in self.tires_curr if i[0] != event.unicode] # delete current tire with event.unicode
-                        self.tires_curr.append(pos_row) # set it with new values
-
-                        self.tires_all.append(pos_row) # save tire position to list of all tires
-                        
-                        # vorhandenes Tuple in positions_curr überschreiben
-                        self.positions_curr = [i for i in self.positions_curr if i[0] != event.unicode]
-                        self.positions_curr.append(pos_row) 
-                        print('set tire ', event.unicode)
-                        self.positions_all.append(pos_row)
-                    
-                    elif event.unicode == '3' or event.unicode == '4': # fields
-                        
-                        #statt allen tires: fields_curr, in denen nur no-tires drinnen sind? --> darum dann Rechtecke zeichnen?
-                        self.fields_curr = [i for i in self.fields_curr if i[0] != event.unicode] # delete current position with event.unicode
-                        self.fields_curr.append(pos_row) # set it with new values
-                        self.fields_all.append(pos_row) # save tire position to list of all tires
-
-                        # vorhandenes Tuple in positions_curr überschreiben
-                        self.positions_curr = [i for i in self.positions_curr if i[0] != event.unicode]
-                        self.positions_curr.append(pos_row) 
-                        print('set field ', event.unicode)
-                        self.positions_all.append(pos_row)
-
-                    else:
-                        print('activity start of ', event.unicode)
-                        # ab hier samples in self.activity speichern und wenn Ende die Liste als csv speichern und leeren (für nächste Aktivität)
-                        # während normaler Aufnahme wird self.activity immer befüllt - weil hier drin landet man nur bei Tastendruck, nicht pro Sample
-                        # hier wird bei passendem Tastendruck entweder List speichern oder leeren
-                        
-                if event.type == 769: # key log - button UP
-                    # save keys to csv
-                    keys_down_row = (event.type, "none", event.scancode, self.kin_counter, int(time.time()*1000))
-                    self.events_keys.append(keys_down_row)
-                    print('activity end')
-                    
-            # --- filling out back buffer surface with frame's data 
-            if self._kinect.has_new_color_frame():
-                frame = self._kinect.get_last_color_frame()
-                self.draw_color_frame(frame, self._frame_surface)
-                frame = None
-
-            # --- getting skeletons
-            if self._kinect.has_new_body_frame(): 
-                self._bodies = self._kinect.get_last_body_frame()
-
-            # --- draw skeletons to _frame_surface
-            if self._bodies is not None: 
-                for i in range(0, self._kinect.max_body_count):
-                    body = self._bodies.bodies[i]
-                    if not body.is_tracked: 
-                        continue 
-                    
-                    joints = body.joints 
-                    # convert joint coordinates to color space 
-                    joint_points = self._kinect.body_joints_to_color_space(joints)
-                    
-                    self.draw_body(joints, joint_points, SKELETON_COLORS[i]) #draw body
-                    self.drawOver() # draw own stuff
-
-                    
-            # --- copy back buffer surface pixels to the screen, resize it if needed and keep aspect ratio
-            # --- (screen size may be different from Kinect's color frame size) 
-            h_to_w = float(self._frame_surface.get_height()) / self._frame_surface.get_width()
-            target_height = int(h_to_w * self._screen.get_width())
-            surface_to_draw = pygame.transform.scale(self._frame_surface, (self._screen.get_width(), target_height));
-            self._screen.blit(surface_to_draw, (0,0))
-            surface_to_draw = None
-            pygame.display.update()
-
-            # --- update the screen with what was drawn
-            pygame.display.flip()
-
-            self.processHandPos() # hand processing
-
-            # --- Limit to 60 frames per second
-            self._clock.tick(60)
+        try:
+            while not self._done:
+                if self.duration is not None and time.time() - start_time >= self.duration:
+                    self._done = True
+
+                # --- Main event loop
+                if not self.headless:
+                    events_timestamp = int(time.time()*1000) # one timestamp for all events of this loop
+                    for event in pygame.event.get(): # User did something
+                        self.handle_event(event, events_timestamp)
+
+                # --- getting skeletons
+                if self._kinect.has_new_body_frame(): 
+                    self._bodies = self._kinect.get_last_body_frame()
+                    self._bodies_processed = False
+
+                if not self.headless:
+                    self.draw_frame()
+
+                self.processHandPos() # hand processing
+
+                # --- Limit to preview_rate frames per second
+                self._clock.tick(self.preview_rate)
+        except KeyboardInterrupt: # stop headless recordings with Ctrl+C
+            pass
 
         # Close Kinect sensor, close the window and quit.
         self._kinect.close()
-
-        if not debug_no_csv:
+        if self._kinect.jitter is not None:
+            print('capture jitter:', self._kinect.jitter.summary())
+        self.events.close()
+        if self.classifier is not None:
+            self.classifier.close()
+        if self._zone_socket is not None:
+            self._zone_socket.close()
+        if self.skeleton is not None:
+            self.skeleton.close()
+
+        if self.motion_gate is not None:
+            print('motion gate: %d frames stored, %d skipped' % (self.motion_gate.stored, self.motion_gate.skipped))
+        if self.session.save:
             print('saving into csv')
             self.saveIntoCSV()
+        if self.wal is not None:
+            self.wal.close(remove=self.session.save)
 
         pygame.quit()
 
+    def handle_event(self, event, events_timestamp):
+        """
+        handle one pygame event: closing and resizing the window, setting POIs and marking activities with keys
+        :param event: pygame event
+        :param events_timestamp: unix timestamp in ms of the event loop
+        """
+        if event.type == pygame.QUIT: # If user clicked close
+            self._done = True # Flag that we are done so we exit this loop
+
+        elif event.type == pygame.VIDEORESIZE: # window resized
+            self._screen = pygame.display.set_mode(event.dict['size'], 
+                                       pygame.HWSURFACE|pygame.DOUBLEBUF|pygame.RESIZABLE, 32)
+        # Event Types:
+        # 768 = KEYDOWN - Taste drücken
+        # 769 = KEYUP - Taste loslassen
+
+        # save event into CSV with timestamp
+        if self.events.log(event, self.kin_counter, events_timestamp) and self.wal is not None:
+            self.wal.log_event(self.events.recent()[-1])
+        
+        if event.type == 768: # key log - button DOWN
+            category = self.pois.category_of(event.unicode)
+            if category is not None: # key sets a POI, e.g. tire or field
+                # last position of fingertips of the subject (body nearest to the sensor)
+                if self._hand_tip is None:
+                    print('no body tracked, cannot set', category, event.unicode)
+                else:
+                    # overwrites current POI of this key, old position stays in history
+                    hand_tip_point, hand_tip_position, frame, timestamp = self._hand_tip
+                    poi_row = self.pois.set_poi(event.unicode, hand_tip_point, hand_tip_position, frame, timestamp)
+                    if self.wal is not None:
+                        self.wal.log_json(RECORD_POI, poi_row)
+                    print('set', category, event.unicode)
+
+            else:
+                print('activity start of ', event.unicode)
+
+        if event.type == 769: # key log - button UP
+            print('activity end')
+
+    def draw_frame(self):
+        """
+        draw color frame, skeletons and POIs and show them in the window
+        """
+        # --- filling out back buffer surface with frame's data 
+        if self._kinect.has_new_color_frame():
+            frame = self._kinect.get_last_color_frame()
+            self.draw_color_frame(frame, self._frame_surface)
+            frame = None
+
+        # --- draw skeletons to _frame_surface
+        if self._bodies is not None: 
+            for i in range(0, self._kinect.max_body_count):
+                body = self._bodies.bodies[i]
+                if not body.is_tracked: 
+                    continue 
+                
+                joints = body.joints 
+                # convert joint coordinates to color space 
+                joint_points = self._kinect.body_joints_to_color_space(joints)
+                
+                self.draw_body(joints, joint_points, SKELETON_COLORS[i]) #draw body
+                self.drawOver() # draw own stuff
+
+                
+        # --- copy back buffer surface pixels to the screen, resize it if needed and keep aspect ratio
+        # --- (screen size may be different from Kinect's color frame size) 
+        h_to_w = float(self._frame_surface.get_height()) / self._frame_surface.get_width()
+        target_height = int(h_to_w * self._screen.get_width())
+        surface_to_draw = pygame.transform.scale(self._frame_surface, (self._screen.get_width(), target_height));
+        self._screen.blit(surface_to_draw, (0,0))
+        surface_to_draw = None
+        pygame.display.update()
+
+        # --- update the screen with what was drawn
+        pygame.display.flip()
+
     ######################################################################
     #                               DRAW OVER
     ######################################################################
     def drawOver(self):
         """
-        draws over points-of-interest = tires and fields
-        draws tires as circles, fields as rectangles
+        draws over points-of-interest, e.g. tires and fields
+        draws each POI in the shape of its category, circles (tires) or rectangles (fields)
         """
-        offset = 25 # = radius for circles
-
-        # drawing circles for tires
-        for tire in self.tires_curr:
-            tire_point = (int(tire[1]), int(tire[2]))
-            pygame.draw.circle(self._frame_surface, 2, tire_point, offset, 8)
-        
-        # drawing rectangles for fields
-        for field in self.fields_curr:
-            field_point = (int(field[1]), int(field[2]))
-
-            # calculate points around rectangle
-            a = (field[1] - offset, field[2] + offset)
-            b = (field[1] + offset, field[2] + offset)
-            c = (field[1] + offset, field[2] - offset)
-            d = (field[1] - offset, field[2] - offset)
-            rect_pnt_list = []
-            rect_pnt_list = [a,b,c,d]
-            pygame.draw.polygon(self._frame_surface, 2, rect_pnt_list, 8)
+        for key, poi in self.pois.current.items():
+            category = self.pois.categories[self.pois.key_map[key]]
+            offset = category["draw_size"] # = radius for circles
+
+            if category["shape"] == "rectangle":
+                # calculate points around rectangle
+                a = (poi[1] - offset, poi[2] + offset)
+                b = (poi[1] + offset, poi[2] + offset)
+                c = (poi[1] + offset, poi[2] - offset)
+                d = (poi[1] - offset, poi[2] - offset)
+                pygame.draw.polygon(self._frame_surface, 2, [a,b,c,d], 8)
+            else:
+                poi_point = (int(poi[1]), int(poi[2]))
+                pygame.draw.circle(self._frame_surface, 2, poi_point, offset, 8)
 
     ######################################################################
     #                    PROCESS HAND POSITION
     ######################################################################
     def processHandPos(self):
         """
-        takes all joints and joints of right hand and collects them, 
+        takes all joints of all tracked bodies of a new body frame and adds them to the track of each body, 
         and calls method to calculate and save extra data from distance between wrist and POIs
         """
-        if self._bodies is not None:
-            for i in range(0, self._kinect.max_body_count):
-                body = self._bodies.bodies[i]
-                if not body.is_tracked: continue 
-                joints = body.joints
-                # convert joint coordinates to color space
-                joint_points = self._kinect.body_joints_to_color_space(joints)
-                
-                # full body
-                joint_type = ['SpineBase','SpineMid','Neck','Head', 
-                              'ShoulderLeft','ElbowLeft','WristLeft','HandLeft', 
-                              'ShoulderRight','ElbowRight','WristRight','HandRight', 
-                              'HipLeft','KneeLeft','AnkleLeft','FootLeft', 
-                              'HipRight','KneeRight','AnkleRight','FootRight', 
-                              'SpineShoulder','HandTipLeft','ThumbLeft','HandTipRight','ThumbRight','Count'] #names of those joints
-                    
-                for x in range(0,25): # joint-numbers that are interesting for us
-                    pos = joints[x].Position
-                    typ = joint_type[x]
-                    
-                    if x == 10: # = if joint == WristRight
-                        csv_row = (pos.x, pos.y, pos.z, typ, self.kin_counter, int(time.time()*1000))
-                        self.hand_samples.append(csv_row)
-                
-                    # add sample to log file
-                    csv_row = (pos.x, pos.y, pos.z, typ, self.kin_counter, int(time.time()*1000))
-                    self.full_samples.append(csv_row)
+        if self._bodies is None or self._bodies_processed:
+            return
+        self._bodies_processed = True # every body frame is saved only once
 
-                fingers = PyKinectV2.JointType_HandTipRight
-                csv_row = (joint_points[fingers].x, joint_points[fingers].y, joints[fingers].Position.x, joints[fingers].Position.y, joints[fingers].Position.z, self.kin_counter, int(time.time()*1000))
-                self.finger_points.append(csv_row)
-                
-                self.kin_counter += 1 # increment counter for samples
+        positions, tracked = self._bodies.joint_positions()
+        if not tracked.any():
+            self._hand_tip = None
+            return
 
-                # calculate distance between right wrist and POIs, and save into self.distances
-                self.calc_distances(i, joints)
+        frame = self.kin_counter
+        self.kin_counter += 1 # increment counter once per frame
+        timestamp = int(time.time()*1000)
+        tracking_ids = [body.tracking_id for body in self._bodies.bodies]
+
+        if self.joint_filter is not None: # smooth all joints of all bodies, resets on tracking loss
+            positions = self.joint_filter.update(positions, tracked, timestamp / 1000.0, tracking_ids)
+
+        # distances of all joints of all bodies to all POIs in one step, (bodies, joints, POIs)
+        poi_distances = self.pois.engine.distances(positions)
+        self.zones.update(poi_distances, self.pois.radii, self.pois.engine.keys, tracking_ids, frame, timestamp)
+
+        states = None
+        if self.selection.tracking_states or self.skeleton is not None:
+            states = self._bodies.joint_tracking_states()
+        if self.skeleton is not None: # live skeleton for other workstations, one message per body frame
+            self.skeleton.publish(positions, tracked, tracking_ids, timestamp, states)
+
+        recorded = self.selection.gather(positions) # recorded joints of all bodies in one step
+        if self.selection.orientations:
+            orientations = self.selection.gather(self._bodies.joint_orientations())
+        if self.selection.tracking_states:
+            tracking_states = self.selection.gather(states)
+
+        # subject = body nearest to the sensor, its hand tip of this frame is used for new POIs
+        subject = np.argmin(np.where(tracked, positions[:, PyKinectV2.JointType_SpineBase, 2], np.inf))
+
+        samples = [] # (body index, tracking_id, sample, distances to POIs) of all tracked bodies
+        for i in np.flatnonzero(tracked):
+            body = self._bodies.bodies[i]
+            # convert fingertip coordinates to color space (for positioning of POI)
+            if self._map_filtered:
+                hand_tip = self._kinect.camera_point_to_color_space(positions[i, PyKinectV2.JointType_HandTipRight])
+            else:
+                hand_tip = self._kinect.body_joint_to_color_space(body.joints[PyKinectV2.JointType_HandTipRight])
+
+            sample = dict(frame=frame, timestamp=timestamp, positions=recorded[i], hand_tip_point=(hand_tip.x, hand_tip.y))
+            if i == subject:
+                self._hand_tip = ([hand_tip.x, hand_tip.y], positions[i, PyKinectV2.JointType_HandTipRight].tolist(), frame, timestamp)
+            if self.selection.hand_states:
+                sample['hand_states'] = (body.hand_left_state, body.hand_right_state)
+            if self.selection.orientations:
+                sample['orientations'] = orientations[i]
+            if self.selection.tracking_states:
+                sample['tracking_states'] = tracking_states[i]
+            samples.append((i, body.tracking_id, sample, poi_distances[i]))
+
+        if self.motion_gate is None:
+            self.store_frame(samples)
+        else: # while nobody moves only keyframes are stored, motion onsets get the pre-roll
+            for stored in self.motion_gate.update(positions, tracked, timestamp, samples, tracking_ids):
+                self.store_frame(stored)
+
+        if self.classifier is not None: # feed body frame of the subject to the classifier
+            self.classifier.push(frame, positions[subject], timestamp)
+
+    def store_frame(self, samples):
+        """
+        adds the samples of one body frame to the tracks and the write-ahead log, and saves the distances
+        between wrist and POIs
+        :param samples: list of (body index, tracking_id, sample, distances to POIs) of all tracked bodies
+        """
+        self.tracks.begin_frame()
+        for i, tracking_id, sample, distances in samples:
+            self.tracks.add(tracking_id, i, **sample)
+            if self.wal is not None:
+                self.wal.log_sample(tracking_id, i, sample)
 
-    def calc_distances(self, body, joints):
+            # save distance between right wrist and POIs into self.distances
+            self.calc_distances(sample['frame'], tracking_id, distances, sample['timestamp'])
+
+    def calc_distances(self, frame, tracking_id, distances, timestamp):
         """
-        calculates and saves the distance between wrist joint and the collected POIs
-        :param body: index of current body - not used here, because only one current
-        :param joints: all joints from collected body
+        saves the distance between wrist joint and the collected POIs, one row per POI
+        :param frame: counter of the body frame
+        :param tracking_id: tracking_id of current body
+        :param distances: distances of all joints of this body to all POIs (joints, POIs), from POIEngine
+        :param timestamp: unix timestamp in ms of the body frame
         """
         wrist = PyKinectV2.JointType_WristRight
-        # print('wrist xyz = ', joints[wrist].Position.x, joints[wrist].Position.y, joints[wrist].Position.z)
-        
-        diff = []
-        row_with_all = ()
 
-        for position in self.positions_curr: # iterate over all POIs
-            # info: columns in self.positions_curr = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp']
-
-            # calculate distances in x,y,z
-            diff_x = (joints[wrist].Position.x - position[3]) ** 2
-            diff_y = (joints[wrist].Position.y - position[4]) ** 2
-            diff_z = (joints[wrist].Position.z - position[5]) ** 2
-            
-            diff_nmb = diff_x + diff_y + diff_z
-            diff_row = (position[0], diff_nmb)
+        for key, distance in zip(self.pois.engine.keys, distances[wrist].tolist()): # iterate over all POIs
+            self.distances.append((frame, tracking_id, key, distance, timestamp))
 
-            # add here into df with diffs in columns
-            row_with_all = row_with_all + (position[0], diff_nmb, int(time.time()*1000))
-            
-            diff.append(diff_row)
+    def publish_zone_event(self, event):
+        """
+        publish zone event as JSON on the zone PUB socket
+        :param event: zone event row, columns = ZONE_EVENT_COLUMNS
+        """
+        self._zone_socket.send_string(json.dumps(dict(zip(ZONE_EVENT_COLUMNS, event))), zmq.NOBLOCK)
 
-        self.distances.append(row_with_all) # append distances
+    def distances_dataframe(self):
+        """
+        distances between wrist and POIs in the configured format, valid for any number of POIs
+        "long": columns = DISTANCE_COLUMNS, one row per sample and POI
+        "wide": one row per sample with columns distance_<key> for every key of the POI config,
+            missing distances (POI not set yet) are NaN
+        """
+        return distance_table(self.distances, self.distance_format, list(self.pois.key_map))
 
 
     ######################################################################
@@ -401,97 +562,112 @@ class Recorder(object):
     def saveIntoCSV(self):
         """
         save all collected lists into individual csv-files, each with specific column headers
-        custom_dir includes timestamp to track samples
+        the session directory includes timestamp to track samples
         """
-        hand_dataFrame = pd.DataFrame(self.hand_samples, columns = ['pos_x', 'pos_y', 'pos_z', 'typ', 'counter', 'timestamp'])
-        with open("%s/kin-sample-hand.csv" % custom_dir, "w") as fh_hand:
-            hand_dataFrame.to_csv(fh_hand)
-
-        full_dataFrame = pd.DataFrame(self.full_samples, columns = ['pos_x', 'pos_y', 'pos_z', 'typ', 'counter', 'timestamp'])
-        with open("%s/kin-sample-full.csv" % custom_dir, "w") as fh_full:
-            full_dataFrame.to_csv(fh_full)
-
-        events_dataFrame = pd.DataFrame(self.events, columns = ['event_type', 'counter', 'timestamp'])
-        with open("%s/kin-sample-events.csv" % custom_dir, "w") as fh_events:
-            events_dataFrame.to_csv(fh_events)
-
-        events_keys_dataFrame = pd.DataFrame(self.events_keys, columns = ['event_type', 'unicode', 'scancode', 'counter', 'timestamp'])
-        with open("%s/kin-sample-events-keys.csv" % custom_dir, "w") as fh_events_keys:
-            events_keys_dataFrame.to_csv(fh_events_keys)
-
-        hand_poi_dataFrame = pd.DataFrame(self.finger_points, columns = ['point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp'])
-        with open("%s/kin-sample-hand-points.csv" % custom_dir, "w") as fh_hand_poi:
-            hand_poi_dataFrame.to_csv(fh_hand_poi)
-
-        pos_curr_dataFrame = pd.DataFrame(self.positions_curr, columns = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp'])
-        with open("%s/kin-sample-positions-current.csv" % custom_dir, "w") as fh_pos_curr:
-            pos_curr_dataFrame.to_csv(fh_pos_curr)
-
-        pos_all_dataFrame = pd.DataFrame(self.positions_all, columns = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp'])
-        with open("%s/kin-sample-positions_all.csv" % custom_dir, "w") as fh_pos_all:
-            pos_all_dataFrame.to_csv(fh_pos_all)
-
-        tires_curr_dataFrame = pd.DataFrame(self.tires_curr, columns = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp'])
-        with open("%s/kin-sample-tires-current.csv" % custom_dir, "w") as fh_tires_curr:
-            tires_curr_dataFrame.to_csv(fh_tires_curr)
-
-        tires_all_dataFrame = pd.DataFrame(self.tires_all, columns = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp'])
-        with open("%s/kin-sample-tires_all.csv" % custom_dir, "w") as fh_tires_all:
-            tires_all_dataFrame.to_csv(fh_tires_all)
-
-        fields_curr_dataFrame = pd.DataFrame(self.fields_curr, columns = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp'])
-        with open("%s/kin-sample-fields-current.csv" % custom_dir, "w") as fh_fields_curr:
-            fields_curr_dataFrame.to_csv(fh_fields_curr)
-
-        fields_all_dataFrame = pd.DataFrame(self.fields_all, columns = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp'])
-        with open("%s/kin-sample-fields_all.csv" % custom_dir, "w") as fh_fields_all:
-            fields_all_dataFrame.to_csv(fh_fields_all)
-
-        distances_all_dataFrame = pd.DataFrame(self.distances, columns = ['tire1', 'distance1', 'timestamp1', 'tire2', 'distance2', 'timestamp2', 'field1', 'distance_field1', 'timestamp_field1', 'field2', 'distance_field2', 'timestamp_field2'])#, 'field3', 'distance_field3', 'timestamp_field3', 'field4', 'distance_field4', 'timestamp_field4', 'field5', 'distance_field5', 'timestamp_field5'])#, '5', '6', '7', '8'])
-        with open("%s/kin-sample-distances_all.csv" % custom_dir, "w") as fh_distances_all:
-            distances_all_dataFrame.to_csv(fh_distances_all)
-          
-        #closest_dataFrame = pd.DataFrame(self.closest, columns = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp'])
-        #with open("%s/kin-sample-closest.csv" % custom_dir, "w") as fh_closest:
-        #    closest_dataFrame.to_csv(fh_closest)
+        # hand, hand points and hand states are taken from the tracks, no extra copies are collected
+        if self.selection.saves('hand'):
+            hand_dataFrame = self.tracks.joint_dataframe([PyKinectV2.JointType_WristRight])
+            with open(self.session.file("kin-sample-hand.csv"), "w") as fh_hand:
+                hand_dataFrame.to_csv(fh_hand)
+
+        if self.selection.saves('full'):
+            full_dataFrame = self.tracks.joint_dataframe()
+            with open(self.session.file("kin-sample-full.csv"), "w") as fh_full:
+                full_dataFrame.to_csv(fh_full)
+
+        if self.selection.saves('hand_points'):
+            hand_poi_dataFrame = self.tracks.hand_tip_dataframe()
+            with open(self.session.file("kin-sample-hand-points.csv"), "w") as fh_hand_poi:
+                hand_poi_dataFrame.to_csv(fh_hand_poi)
+
+        if self.selection.hand_states and self.selection.saves('hand_states'):
+            hand_states_dataFrame = self.tracks.hand_state_dataframe()
+            with open(self.session.file("kin-sample-hand-states.csv"), "w") as fh_hand_states:
+                hand_states_dataFrame.to_csv(fh_hand_states)
+
+        if self.selection.saves('positions'):
+            pos_curr_dataFrame = pd.DataFrame(self.pois.current_rows(), columns = POI_COLUMNS)
+            with open(self.session.file("kin-sample-positions-current.csv"), "w") as fh_pos_curr:
+                pos_curr_dataFrame.to_csv(fh_pos_curr)
+
+            pos_all_dataFrame = pd.DataFrame(self.pois.history_rows(), columns = POI_COLUMNS)
+            with open(self.session.file("kin-sample-positions_all.csv"), "w") as fh_pos_all:
+                pos_all_dataFrame.to_csv(fh_pos_all)
+
+            # one current and one all-file per POI category, e.g. kin-sample-tires-current.csv and kin-sample-tires_all.csv
+            for category in self.pois.categories:
+                category_curr_dataFrame = pd.DataFrame(self.pois.current_rows(category), columns = POI_COLUMNS)
+                with open(self.session.file("kin-sample-%s-current.csv" % category), "w") as fh_category_curr:
+                    category_curr_dataFrame.to_csv(fh_category_curr)
+
+                category_all_dataFrame = pd.DataFrame(self.pois.history_rows(category), columns = POI_COLUMNS)
+                with open(self.session.file("kin-sample-%s_all.csv" % category), "w") as fh_category_all:
+                    category_all_dataFrame.to_csv(fh_category_all)
+
+        if self.selection.saves('distances'):
+            distances_all_dataFrame = self.distances_dataframe()
+            with open(self.session.file("kin-sample-distances_all.csv"), "w") as fh_distances_all:
+                distances_all_dataFrame.to_csv(fh_distances_all)
+
+        if self.selection.saves('zone_events'):
+            zone_events_dataFrame = pd.DataFrame(self.zone_events, columns = ZONE_EVENT_COLUMNS)
+            with open(self.session.file("kin-sample-zone-events.csv"), "w") as fh_zone_events:
+                zone_events_dataFrame.to_csv(fh_zone_events)
+
+        if self.classifier is not None and self.selection.saves('predictions'):
+            predictions_dataFrame = pd.DataFrame(self.classifier.predictions, columns = PREDICTION_COLUMNS)
+            with open(self.session.file("kin-sample-predictions.csv"), "w") as fh_predictions:
+                predictions_dataFrame.to_csv(fh_predictions)
 
         # make csv-file with targets
-        self.targets = []
-        # targets = labels for motions that subject would do inbetween keydown and keyup, preset here to document order of motions for later analysis
-        csv_row = ('050', '020', '110', '121', '010', '030', '020', '130', '111', '010', '040', '020', '210', '220', '230', '240', '310', '320', '330', '340', '410')
-        self.targets.append(csv_row)
-
-        targets_dataFrame = pd.DataFrame(self.targets, columns = ['01', '02', '03', '04', '05', '06', '07', '08', '09', '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20', '21'])
-        with open("%s/targets.csv" % custom_dir, "w") as fh_targets:
-            targets_dataFrame.to_csv(fh_targets)
+        if self.selection.saves('targets'):
+            self.targets = []
+            # targets = labels for motions that subject would do inbetween keydown and keyup, preset here to document order of motions for later analysis
+            csv_row = ('050', '020', '110', '121', '010', '030', '020', '130', '111', '010', '040', '020', '210', '220', '230', '240', '310', '320', '330', '340', '410')
+            self.targets.append(csv_row)
 
+            targets_dataFrame = pd.DataFrame(self.targets, columns = ['01', '02', '03', '04', '05', '06', '07', '08', '09', '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20', '21'])
+            with open(self.session.file("targets.csv"), "w") as fh_targets:
+                targets_dataFrame.to_csv(fh_targets)
 
-        ## open session_list_csv and add custom dir
-        #with open("session_names.csv", "a") as fh_session_name:
-        #    fh_session_name.write(custom_dir)
 
-        # make csv-file with samples
-        with open("recordings/session_names.csv", "a") as fh_samples:
-            csv_row = ',' + dir_name
-            fh_samples.write(csv_row)
-
-        # make csv-file with samples
-        with open("recordings/notes.csv", "a", newline='') as fh_notes:
-            csv_row = '\n' + dir_name + ': '
-            fh_notes.write(csv_row)
+        # add session to session_names.csv and notes.csv
+        self.session.register()
             
 # -----------------------------------------------------------------------------------------------------------------------------------------------------------
 
 __main__ = "Kinect v2 Recorder"
 
-if not debug_no_csv: # for saving into csv
-    dir_name = "sample-{}".format(datetime.datetime.now().strftime("%Y%m%d-%H%M%S")) # set name for directory
-    custom_dir = "recordings/" + dir_name # set path for directory
-    os.makedirs(custom_dir) # create directory
-
-    plot_dir = (custom_dir + "/plots")      
-    os.makedirs(plot_dir) # create directory
-
-game = Recorder()
-game.run()
-
+def main(argv=None):
+    """
+    command line entry point: record one or more sessions with the settings of a recording profile
+    :param argv: command line arguments, default sys.argv
+    """
+    parser = argparse.ArgumentParser(description="Record Kinect skeleton data and points-of-interest into csv-files.")
+    parser.add_argument("-p", "--profile", default="default", help="name of the recording profile (default: %(default)s)")
+    parser.add_argument("--profiles", default=DEFAULT_PROFILES_FILE, help="JSON file with recording profiles")
+    parser.add_argument("-d", "--duration", type=float, help="stop each recording after this many seconds")
+    parser.add_argument("-n", "--repeat", type=int, default=1, help="number of recordings in a row (default: %(default)s)")
+    parser.add_argument("-o", "--output-dir", default="recordings", help="directory of all recordings (default: %(default)s)")
+    parser.add_argument("--name", help="name of the session directory, default sample-<timestamp>")
+    parser.add_argument("--list-profiles", action="store_true", help="print the available profiles and exit")
+    args = parser.parse_args(argv)
+
+    profiles = load_profiles(args.profiles)
+    if args.list_profiles:
+        for name, profile in profiles.items():
+            print(name, json.dumps(profile))
+        return
+
+    profile = profiles[args.profile]
+    if args.duration is not None:
+        profile["duration"] = args.duration
+
+    for i in range(args.repeat):
+        session = RecordingSession(args.output_dir, args.name, save=profile["output"] != "none")
+        print('recording session', session.name)
+        Recorder.from_profile(profile, session).run()
+
+# only when started as script, the classifier worker process imports this module again
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import collections
+import ctypes
+import multiprocessing
+import time
+import traceback
+
+import numpy as np
+
+import PyKinectV2
+import PyKinectRuntime
+from framering import FrameRing
+
+# bins of the jitter histograms, interval between two body frames in ms (30 fps = 33.3 ms)
+JITTER_BINS_MS = np.concatenate([np.arange(0, 70, 2.5), [100, 200, np.inf]])
+
+# size of the frames of a stream, as FrameDescription of the runtime
+FrameDescription = collections.namedtuple('FrameDescription', ['Width', 'Height'])
+
+
+class JitterMonitor(object):
+    """
+    This class collects the arrival times of frames in an array, to compare the capture jitter of
+    different setups with histograms of the intervals.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        """
+        :param capacity: number of frame times that are kept, older times are overwritten
+        """
+        self._times = np.empty(capacity, dtype=np.float64)
+        self._count = 0
+
+    def add(self, t):
+        """
+        :param t: arrival time of a frame in seconds (time.perf_counter)
+        """
+        self._times[self._count % len(self._times)] = t
+        self._count += 1
+
+    def times(self):
+        """
+        :return: kept arrival times, oldest first
+        """
+        if self._count <= len(self._times):
+            return self._times[:self._count].copy()
+        start = self._count % len(self._times)
+        return np.concatenate([self._times[start:], self._times[:start]])
+
+    def intervals(self):
+        """
+        :return: intervals between consecutive frames in ms
+        """
+        return np.diff(self.times()) * 1000.0
+
+    def histogram(self, bins=JITTER_BINS_MS):
+        """
+        :param bins: bin edges in ms
+        :return: tuple (counts, bins) as numpy.histogram
+        """
+        return np.histogram(self.intervals(), bins)
+
+    def summary(self):
+        """
+        :return: text with number of frames and percentiles of the intervals
+        """
+        intervals = self.intervals()
+        if len(intervals) == 0:
+            return "no frames"
+        p50, p99 = np.percentile(intervals, [50, 99])
+        return "%d frames, interval p50 %.1f ms, p99 %.1f ms, max %.1f ms, std %.2f ms" % (
+            len(intervals) + 1, p50, p99, intervals.max(), intervals.std())
+
+
+def format_histogram(counts, bins, width=50):
+    """
+    histogram as text, one line per non-empty bin
+
+    :param counts: counts of the bins
+    :param bins: bin edges
+    :param width: length of the longest bar
+    :return: text
+    """
+    lines = []
+    scale = float(width) / max(counts.max(), 1)
+    for count, low, high in zip(counts, bins[:-1], bins[1:]):
+        if count:
+            lines.append("%6.1f-%6.1f ms %7d %s" % (low, high, count, '#' * max(1, int(count * scale))))
+    return "\n".join(lines)
+
+
+def _capture_worker(frame_source_types, prefix, slots, conn):
+    """
+    capture process: owns the sensor and writes all frames to the shared memory rings, if the
+    sensor cannot be opened the traceback is sent instead of the frame descriptions
+    """
+    try:
+        kinect = PyKinectRuntime.PyKinectRuntime(frame_source_types, export=prefix, export_slots=slots, export_color_points=True)
+    except Exception:
+        conn.send({'error': traceback.format_exc()})
+        conn.close()
+        return
+    kinect.jitter = JitterMonitor()
+    conn.send({
+        'color': (kinect.color_frame_desc.Width, kinect.color_frame_desc.Height),
+        'depth': (kinect.depth_frame_desc.Width, kinect.depth_frame_desc.Height),
+        'max_body_count': kinect.max_body_count})
+    conn.recv() # stop
+    kinect.close()
+    conn.send(kinect.jitter.times())
+    conn.close()
+
+
+class CaptureProxy(object):
+    """
+    This class has the API of PyKinectRuntime that the Recorder uses, but the sensor is owned by a
+    capture process, that writes the frames to shared memory (see framering.py). Capturing does
+    not share the GIL with the UI, so its jitter does not depend on rendering.
+
+    Body frames are rebuilt as KinectBodyFrameData with the joints, orientations and hand states
+    of the bodies. The coordinate mapping is done by the capture process, body_joint_to_color_space
+    returns its points for the joints of the latest body frame.
+    """
+
+    def __init__(self, frame_source_types, prefix="kinect-capture", slots=4):
+        """
+        Start the capture process and attach to its rings
+
+        :param frame_source_types: FrameSourceTypes_* flags of the opened streams
+        :param prefix: prefix of the shared memory rings, other processes can attach to them as well
+        :param slots: number of frames in every ring
+        """
+        self.frame_source_types = frame_source_types
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_capture_worker, args=(frame_source_types, prefix, slots, child), daemon=True)
+        self._process.start()
+        child.close() # only the worker holds this end, so recv gets EOF if the worker dies
+        while not self._conn.poll(0.5):
+            if not self._process.is_alive():
+                raise RuntimeError("capture process stopped with exit code {}".format(self._process.exitcode))
+        try:
+            info = self._conn.recv()
+        except EOFError:
+            raise RuntimeError("capture process stopped before the sensor was opened")
+        if 'error' in info:
+            self._process.join()
+            raise RuntimeError("capture process could not open the sensor:\n" + info['error'])
+
+        self.color_frame_desc = FrameDescription(*info['color'])
+        self.depth_frame_desc = FrameDescription(*info['depth'])
+        self.max_body_count = info['max_body_count']
+        self.jitter = None # JitterMonitor of the capture process, available after close
+
+        self._rings = {}
+        for stream, flag in (('color', PyKinectV2.FrameSourceTypes_Color), ('depth', PyKinectV2.FrameSourceTypes_Depth),
+                             ('body', PyKinectV2.FrameSourceTypes_Body)):
+            if frame_source_types & flag:
+                self._rings[stream] = FrameRing.attach(prefix + '-' + stream)
+        self._last = dict((stream, -1) for stream in self._rings) # latest frame number returned per stream
+        self._color_points = [] # (address of joints, color points) of the latest body frame
+
+    def close(self):
+        if self._process is None:
+            return
+        for ring in self._rings.values():
+            ring.close()
+        self._rings = {}
+        self.jitter = JitterMonitor()
+        if self._process.is_alive():
+            try:
+                self._conn.send('stop')
+                if self._conn.poll(5.0):
+                    for t in self._conn.recv():
+                        self.jitter.add(t)
+            except (EOFError, OSError):
+                pass # worker died, its capture times are lost
+        self._process.join(1.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._conn.close()
+        self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def surface_as_array(self, surface_buffer_interface):
+        # pygame BufferProxy supports the buffer protocol
+        return (ctypes.c_byte * surface_buffer_interface.length).from_buffer(surface_buffer_interface)
+
+    def _has_new(self, stream):
+        ring = self._rings.get(stream)
+        return ring is not None and ring.latest() > self._last[stream]
+
+    def has_new_color_frame(self):
+        return self._has_new('color')
+
+    def has_new_depth_frame(self):
+        return self._has_new('depth')
+
+    def has_new_body_frame(self):
+        return self._has_new('body')
+
+    def _get_last(self, stream):
+        ring = self._rings.get(stream)
+        if ring is None:
+            return None
+        while True: # the writer may overwrite the frame while copying, then take the next one
+            number = ring.latest()
+            if number < 0:
+                return None
+            frame = ring.read(number)
+            if frame is not None:
+                self._last[stream] = number
+                return frame
+
+    def get_last_color_frame(self):
+        frame = self._get_last('color')
+        return None if frame is None else frame[0].reshape(-1)
+
+    def get_last_depth_frame(self):
+        frame = self._get_last('depth')
+        return None if frame is None else frame[0].reshape(-1)
+
+    def get_last_body_frame(self):
+        frame = self._get_last('body')
+        if frame is None:
+            return None
+        record, timestamp = frame
+
+        bodies = PyKinectRuntime.KinectBodyFrameData(None, None, 0)
+        bodies.relative_time = timestamp
+        bodies.bodies = np.ndarray((self.max_body_count), dtype=object)
+        self._color_points = []
+        for i in range(0, self.max_body_count):
+            body = bodies.bodies[i] = PyKinectRuntime.KinectBody()
+            if not record['tracked'][i]:
+                continue
+            body.is_tracked = True
+            body.tracking_id = int(record['tracking_id'][i])
+            body.hand_left_state, body.hand_right_state = (int(state) for state in record['hand_states'][i])
+            body.joints = (PyKinectV2._Joint * PyKinectV2.JointType_Count).from_buffer_copy(record['joints'][i])
+            orientations = np.empty((PyKinectV2.JointType_Count, 5), dtype=np.float32)
+            orientations[:, 0] = np.arange(PyKinectV2.JointType_Count, dtype=np.int32).view(np.float32) # JointType as int32 bits
+            orientations[:, 1:5] = record['orientations'][i]
+            body.joint_orientations = (PyKinectV2._JointOrientation * PyKinectV2.JointType_Count).from_buffer_copy(orientations)
+            self._color_points.append((ctypes.addressof(body.joints), record['color_points'][i]))
+        return bodies
+
+    def _color_point(self, joint):
+        # find the joint in the bodies of the latest body frame by its address
+        address = ctypes.addressof(joint)
+        for start, points in self._color_points:
+            index, offset = divmod(address - start, ctypes.sizeof(PyKinectV2._Joint))
+            if offset == 0 and 0 <= index < PyKinectV2.JointType_Count:
+                return PyKinectV2._ColorSpacePoint(*points[index])
+        raise ValueError("joint is not part of the latest body frame")
+
+    def body_joint_to_color_space(self, joint):
+        return self._color_point(joint)
+
+    def body_joints_to_color_space(self, joints):
+        joint_points = np.ndarray((PyKinectV2.JointType_Count), dtype=object)
+        for j in range(0, PyKinectV2.JointType_Count):
+            joint_points[j] = self._color_point(joints[j])
+        return joint_points
+
+
+def _ui_load(seconds, work_ms):
+    # pure Python work that holds the GIL, like drawing a frame with pygame
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        busy = time.perf_counter() + work_ms / 1000.0
+        while time.perf_counter() < busy:
+            pass
+        time.sleep(max(0.0, 1.0 / 60 - work_ms / 1000.0))
+
+
+def main(argv=None):
+    """
+    compare the capture jitter of body frames in the UI process and in a capture process,
+    while the UI process is loaded like by rendering
+    """
+    parser = argparse.ArgumentParser(description="Capture jitter of body frames with in-process and out-of-process capture")
+    parser.add_argument("-d", "--duration", type=float, default=30, help="seconds per mode")
+    parser.add_argument("--load", type=float, default=12, help="ms of GIL-holding work per 60 Hz UI loop")
+    args = parser.parse_args(argv)
+
+    streams = PyKinectV2.FrameSourceTypes_Color | PyKinectV2.FrameSourceTypes_Body
+
+    kinect = PyKinectRuntime.PyKinectRuntime(streams)
+    kinect.jitter = JitterMonitor()
+    _ui_load(args.duration, args.load)
+    kinect.close()
+    before = kinect.jitter
+
+    proxy = CaptureProxy(streams)
+    _ui_load(args.duration, args.load)
+    proxy.close()
+    after = proxy.jitter
+
+    for title, monitor in (("in-process capture (thread)", before), ("out-of-process capture", after)):
+        print(title + ":", monitor.summary())
+        print(format_histogram(*monitor.histogram()))
+        print()
+
+
+if __name__ == "__main__":
+    main()
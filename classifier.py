@@ -0,0 +1,239 @@
+import importlib
+import multiprocessing
+import time
+import traceback
+
+import numpy as np
+
+import PyKinectV2
+
+# columns of logged predictions
+PREDICTION_COLUMNS = ['counter', 'timestamp', 'label', 'score', 'latency_ms', 'inference_ms']
+
+
+class ActivityClassifier(object):
+    """
+    Base class for live activity classifier plugins.
+
+    A plugin is created inside the worker process, so heavy models are loaded in load() and
+    never in the recording process. predict gets the latest window of body frames and returns
+    the predicted activity label (e.g. '020') and a score.
+    """
+
+    def load(self):
+        """
+        Load the model, called once in the worker process before the first prediction
+        """
+        pass
+
+    def predict(self, window, timestamps):
+        """
+        Predict the activity of the subject
+
+        :param window: joint positions of the last body frames (window size, JointType_Count, 3),
+            oldest first, NaN for frames without subject
+        :param timestamps: unix timestamps in ms of the frames (window size,)
+        :return: tuple (label, score)
+        """
+        raise NotImplementedError
+
+
+def load_classifier(spec, **kwargs):
+    """
+    Create classifier plugin from "module:ClassName", a class or an instance
+
+    :param spec: plugin specification
+    :param kwargs: arguments for the class
+    """
+    if isinstance(spec, str):
+        module, name = spec.split(":")
+        spec = getattr(importlib.import_module(module), name)
+    if isinstance(spec, type):
+        spec = spec(**kwargs)
+    return spec
+
+
+class FrameWindow(object):
+    """
+    This class holds the latest body frames of the subject in a preallocated ring array.
+    """
+
+    def __init__(self, size):
+        """
+        :param size: number of frames in the window
+        """
+        self._positions = np.full((size, PyKinectV2.JointType_Count, 3), np.nan, dtype=np.float32)
+        self._timestamps = np.zeros(size, dtype=np.int64)
+        self._next = 0 # position of next frame in ring
+        self.count = 0 # number of frames pushed
+
+    def push(self, positions, timestamp):
+        """
+        Add frame, overwrites the oldest frame
+
+        :param positions: joint positions of the subject (JointType_Count, 3)
+        :param timestamp: unix timestamp in ms
+        """
+        self._positions[self._next] = positions
+        self._timestamps[self._next] = timestamp
+        self._next = (self._next + 1) % len(self._timestamps)
+        self.count += 1
+
+    def full(self):
+        return self.count >= len(self._timestamps)
+
+    def ordered(self):
+        """
+        :return: tuple (positions, timestamps) as copies, oldest frame first
+        """
+        order = np.roll(np.arange(len(self._timestamps)), -self._next)
+        return self._positions[order], self._timestamps[order]
+
+
+def _worker(connection, spec, kwargs):
+    """
+    worker process: receive windows, predict and send back predictions until None is received,
+    an exception of the plugin is sent back as traceback instead of the prediction
+    """
+    try:
+        classifier = load_classifier(spec, **kwargs)
+        classifier.load()
+    except Exception:
+        connection.send((None, None, None, None, None, traceback.format_exc()))
+        connection.close()
+        return
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        counter, timestamp, window, timestamps = request
+        start = time.perf_counter()
+        try:
+            label, score = classifier.predict(window, timestamps)
+            error = None
+        except Exception:
+            label = score = None
+            error = traceback.format_exc()
+        connection.send((counter, timestamp, label, score, (time.perf_counter() - start) * 1000, error))
+    connection.close()
+
+
+class LiveClassifier(object):
+    """
+    This class runs an ActivityClassifier on the latest window of body frames in a worker process.
+
+    Only one window is in flight at a time. While the model is busy, new frames only go into the
+    ring window, so if the model falls behind, stale windows are dropped and the next prediction
+    uses the latest frames. Capture never waits for the model.
+
+    Exceptions of predict are counted in errors and the first one is printed. If the plugin cannot
+    be loaded or the worker process dies, the classifier is disabled with a message, the
+    recording goes on without predictions.
+    """
+
+    def __init__(self, spec, window_size=30, **kwargs):
+        """
+        Create the window and start the worker process
+
+        :param spec: classifier plugin, "module:ClassName" or a class (must be importable by the worker)
+        :param window_size: number of body frames given to the classifier
+        :param kwargs: arguments for the classifier class
+        """
+        self.window = FrameWindow(window_size)
+        self.predictions = [] # logged predictions, columns = PREDICTION_COLUMNS
+        self.dropped = 0 # frames that never got a prediction because the model was busy
+        self.errors = 0 # windows for which predict raised an exception
+        self.callbacks = []
+        self.active = True # False after the worker failed
+
+        self._connection, worker_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_worker, args=(worker_connection, spec, kwargs), daemon=True)
+        self._process.start()
+        self._busy = False
+
+    def register_callback(self, callback):
+        """
+        Register a new callback to be called with every prediction.
+
+        :param callback: Callable, has to accept a single argument (prediction row, columns = PREDICTION_COLUMNS)
+        """
+        self.callbacks.append(callback)
+
+    def push(self, counter, positions, timestamp):
+        """
+        Add body frame of the subject, collect a finished prediction and start the next one if the
+        worker is free. Never blocks.
+
+        :param counter: counter of the body frame
+        :param positions: joint positions of the subject (JointType_Count, 3)
+        :param timestamp: unix timestamp in ms of the frame
+        """
+        if not self.active:
+            return
+        self.window.push(positions, timestamp)
+        self.poll()
+        if not self.active or not self.window.full():
+            return
+        if self._busy:
+            self.dropped += 1
+            return
+        window, timestamps = self.window.ordered()
+        try:
+            self._connection.send((counter, timestamp, window, timestamps))
+        except (EOFError, OSError) as e:
+            self._disable("cannot send to the worker process ({!r})".format(e))
+            return
+        self._busy = True
+
+    def poll(self):
+        """
+        Collect finished prediction, if there is one
+        """
+        if not self.active:
+            return
+        try:
+            if not self._connection.poll():
+                return
+            counter, timestamp, label, score, inference_ms, error = self._connection.recv()
+        except (EOFError, OSError) as e:
+            self._disable("worker process stopped ({!r})".format(e))
+            return
+        if counter is None: # plugin could not be loaded
+            self._disable("plugin could not be loaded\n" + error)
+            return
+        self._busy = False
+        if error is not None:
+            self.errors += 1
+            if self.errors == 1:
+                print('classifier: predict failed, further errors are only counted\n' + error)
+            return
+        prediction = (counter, timestamp, label, score, time.time() * 1000 - timestamp, inference_ms)
+        self.predictions.append(prediction)
+        for callback in self.callbacks:
+            callback(prediction)
+
+    def _disable(self, reason):
+        print('classifier disabled:', reason)
+        self.active = False
+        self._busy = False
+
+    def close(self):
+        """
+        Stop the worker process, a prediction in flight is collected first
+        """
+        if self._busy:
+            try:
+                self._connection.poll(1.0)
+            except (EOFError, OSError):
+                pass
+            self.poll()
+        try:
+            self._connection.send(None)
+        except (EOFError, OSError):
+            pass
+        self._process.join(1.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._connection.close()
+        if self.errors:
+            print('classifier: predict failed for %d windows' % self.errors)
@@ -0,0 +1,142 @@
+import math
+
+import numpy as np
+
+
+class ClockEstimator(object):
+    """
+    This class relates the timestamps of a sensor to the clock of the host while packets are
+    received: host time = offset + skew * sensor time, fitted by recursive least squares with
+    exponential forgetting, so every update is O(1) and the fit follows slow drift.
+
+    Receive times contain the network delay, which is mostly small but sometimes large (jitter,
+    WLAN retries). Residuals are weighted with a Huber weight, so delayed packets hardly move the
+    fit. The sensor time mapped to the host clock (map) is free of this jitter.
+
+    A step of the offset (clock of the sensor or host set, sensor restarted) shows as a run of
+    residuals that are all large and nearly equal, unlike a network stall, after which residuals
+    shrink while the queued packets arrive. Steps are listed in steps and the fit restarts.
+    """
+
+    def __init__(self, time_constant=300.0, step_threshold=0.05, step_count=25):
+        """
+        :param time_constant: seconds of sensor time after which old packets have weight 1/e
+        :param step_threshold: smallest offset step in seconds that is detected
+        :param step_count: number of consecutive updates that show a step before it is flagged, with
+            update_batch one update per message, not per sample, so a step takes step_count messages
+        """
+        self.time_constant = time_constant
+        self.step_threshold = step_threshold
+        self.step_count = step_count
+        self.steps = [] # (host time, sensor time, size in seconds) of the detected steps
+        self.count = 0 # number of updates
+        self._origin = None # (sensor time, host time) of the first packet, values are relative to it
+        self._reset()
+
+    def _reset(self, offset=0.0, skew=1.0):
+        self._a = offset # host time at the origin
+        self._b = skew # host seconds per sensor second
+        # covariance of (a, b): prior of 1 s offset and 1e-3 skew
+        self._p_aa, self._p_ab, self._p_bb = 1.0, 0.0, 1e-6
+        self._last = None # sensor time of the last update
+        self._scale = None # mean absolute residual, scale of the Huber weight
+        self._run = 0 # consecutive packets with large residual of the same sign
+        self._run_min = self._run_max = 0.0
+
+    @property
+    def offset(self):
+        """
+        host time of sensor time 0 in seconds, None before the first update
+        """
+        if self._origin is None:
+            return None
+        return self._origin[1] + self._a - self._b * self._origin[0]
+
+    @property
+    def skew(self):
+        """
+        host seconds per sensor second, e.g. 1.00002 for a sensor clock that is 20 ppm slow
+        """
+        return self._b
+
+    def map(self, sensor_time):
+        """
+        :param sensor_time: sensor time in seconds, float or numpy array
+        :return: host time of the sensor time, receive time of the first packet before any update
+        """
+        if self._origin is None:
+            return sensor_time
+        return self._origin[1] + self._a + self._b * (sensor_time - self._origin[0])
+
+    def update(self, sensor_time, host_time):
+        """
+        Add one packet
+
+        :param sensor_time: timestamp of the sensor in seconds
+        :param host_time: receive time in seconds
+        :return: sensor time mapped to the host clock with the updated fit
+        """
+        if self._origin is None:
+            self._origin = (sensor_time, host_time)
+        x = sensor_time - self._origin[0]
+        y = host_time - self._origin[1]
+        self.count += 1
+
+        residual = y - self._a - self._b * x
+        if self._scale is not None and self._check_step(residual):
+            # restart from the new offset, keep the skew
+            self.steps.append((host_time, sensor_time, residual))
+            self._reset(self._a + residual, self._b)
+            return self.map(sensor_time)
+
+        forget = 1.0 if self._last is None else math.exp(-max(sensor_time - self._last, 0.0) / self.time_constant)
+        self._last = sensor_time
+        weight = 1.0
+        if self._scale is not None:
+            limit = 2.0 * self._scale
+            if abs(residual) > limit:
+                weight = limit / abs(residual) # Huber
+            self._scale += 0.01 * (min(abs(residual), 10 * self._scale) - self._scale)
+        else:
+            self._scale = max(abs(residual), 1e-3)
+
+        # recursive least squares for y = a + b * x
+        p_a = (self._p_aa + self._p_ab * x) / forget
+        p_b = (self._p_ab + self._p_bb * x) / forget
+        gain = 1.0 / (1.0 / weight + p_a + p_b * x)
+        k_a, k_b = p_a * gain, p_b * gain
+        self._a += k_a * residual
+        self._b += k_b * residual
+        self._p_aa = self._p_aa / forget - k_a * p_a
+        self._p_ab = self._p_ab / forget - k_a * p_b
+        self._p_bb = self._p_bb / forget - k_b * p_b
+        return self.map(sensor_time)
+
+    def _check_step(self, residual):
+        # count residuals beyond the threshold with the same sign that stay close to each other
+        if abs(residual) < max(self.step_threshold, 6 * self._scale) or \
+                (self._run and (residual > 0) != (self._run_max > 0)):
+            self._run = 0
+            return False
+        if self._run == 0:
+            self._run_min = self._run_max = residual
+        self._run += 1
+        self._run_min = min(self._run_min, residual)
+        self._run_max = max(self._run_max, residual)
+        if self._run_max - self._run_min > self.step_threshold / 2:
+            self._run = 1 # residuals change: network stall, not a step
+            self._run_min = self._run_max = residual
+            return False
+        return self._run >= self.step_count
+
+    def update_batch(self, sensor_times, host_time):
+        """
+        Add a batch message, its samples are received together, so only the last sample is used
+        for the fit. The message counts as one update, also for step_count and count.
+
+        :param sensor_times: numpy array of the sensor times of the samples in seconds
+        :param host_time: receive time of the message in seconds
+        :return: numpy array of the sensor times mapped to the host clock
+        """
+        self.update(float(sensor_times[-1]), host_time)
+        return self.map(np.asarray(sensor_times, dtype=np.float64))
@@ -0,0 +1,175 @@
+import collections
+import threading
+import time
+import traceback
+
+import numpy as np
+
+# what happens to a new item if the queue of a worker is full
+DROP_POLICIES = ("oldest", "newest") # drop the oldest queued item, or the new item
+# what the callback gets per call: one item, a list of all queued items, or the queued items of
+# one packet type as one dict of column name -> numpy array
+DELIVERIES = ("single", "list", "array")
+
+
+def _as_columns(items):
+    """
+    queued items of one packet type as one dict of column name -> array, items are packet dicts
+    or column dicts of batch callbacks
+    """
+    first = items[0]
+    columns = {"type": first["type"]}
+    for name, value in first.items():
+        if name == "type":
+            continue
+        if isinstance(value, np.ndarray):
+            columns[name] = np.concatenate([item[name] for item in items]) if len(items) > 1 else value
+        else:
+            columns[name] = np.array([item[name] for item in items])
+    return columns
+
+
+class CallbackWorker(object):
+    """
+    This class calls one callback in its own thread, so the receiving thread never waits for it.
+
+    Items are put into a bounded queue without blocking. If the callback is too slow and the
+    queue is full, items are dropped by the drop policy and counted. The lag (time between put
+    and call) and the drops are kept as metrics of the callback.
+    """
+
+    def __init__(self, callback, max_queue=10000, drop="oldest", delivery="single", max_items=1000):
+        """
+        :param callback: Callable, gets one argument per call, see delivery
+        :param max_queue: maximal number of queued items
+        :param drop: "oldest" to drop the oldest queued item for a new one (latest data, e.g. plots),
+            "newest" to drop new items (contiguous data until the queue is full)
+        :param delivery: "single" for one item per call, "list" for a list of the queued items,
+            "array" for the queued items of one packet type as dict of column name -> numpy array
+        :param max_items: maximal number of items per call for "list" and "array"
+        """
+        if drop not in DROP_POLICIES:
+            raise ValueError("Unknown drop policy {}, use one of {}".format(drop, ", ".join(DROP_POLICIES)))
+        if delivery not in DELIVERIES:
+            raise ValueError("Unknown delivery {}, use one of {}".format(delivery, ", ".join(DELIVERIES)))
+        self.callback = callback
+        self.max_queue = max_queue
+        self.drop = drop
+        self.delivery = delivery
+        self.max_items = max_items if delivery != "single" else 1
+
+        self._queue = collections.deque() # (put time, item)
+        self._condition = threading.Condition()
+        self._busy = False
+        self.active = True
+
+        self.delivered = 0 # items passed to the callback
+        self.dropped = 0
+        self.calls = 0
+        self.errors = 0 # calls that raised an exception
+        self.lag_last = 0.0 # seconds between put and call of the oldest item of a call
+        self.lag_max = 0.0
+        self._lag_sum = 0.0
+        self._runs = 0 # items taken from the queue at once
+
+        self._thread = threading.Thread(target=self._run, name="callback-" + getattr(callback, "__name__", "worker"),
+                                        daemon=True)
+        self._thread.start()
+
+    def put(self, items):
+        """
+        Queue items for the callback, never blocks
+
+        :param items: list of items
+        :return: number of dropped items
+        """
+        now = time.perf_counter()
+        dropped = 0
+        with self._condition:
+            queue = self._queue
+            for item in items:
+                if len(queue) >= self.max_queue:
+                    dropped += 1
+                    if self.drop == "newest":
+                        continue
+                    queue.popleft()
+                queue.append((now, item))
+            self.dropped += dropped
+            self._condition.notify()
+        return dropped
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and self.active:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                queue = self._queue
+                entries = [queue.popleft() for _ in range(min(len(queue), self.max_items))]
+                self._busy = True
+
+            lag = time.perf_counter() - entries[0][0]
+            items = [item for _, item in entries]
+            try:
+                if self.delivery == "single":
+                    self._call(items[0])
+                elif self.delivery == "list":
+                    self._call(items)
+                else:
+                    by_type = collections.OrderedDict()
+                    for item in items:
+                        by_type.setdefault(item["type"], []).append(item)
+                    for group in by_type.values():
+                        self._call(_as_columns(group))
+            finally:
+                with self._condition:
+                    self.delivered += len(items)
+                    self.lag_last = lag
+                    self.lag_max = max(self.lag_max, lag)
+                    self._lag_sum += lag
+                    self._runs += 1
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _call(self, argument):
+        self.calls += 1
+        try:
+            self.callback(argument)
+        except Exception:
+            self.errors += 1
+            traceback.print_exc()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued items are delivered
+
+        :param timeout: seconds to wait at most, None to wait forever
+        :return: True if the queue is empty
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def metrics(self):
+        """
+        :return: dict with name, queued, delivered, dropped, calls, errors, lag_last, lag_mean and
+            lag_max (seconds)
+        """
+        with self._condition:
+            return {"name": self._thread.name, "queued": len(self._queue), "delivered": self.delivered,
+                    "dropped": self.dropped, "calls": self.calls, "errors": self.errors, "lag_last": self.lag_last,
+                    "lag_mean": self._lag_sum / self._runs if self._runs else 0.0, "lag_max": self.lag_max}
+
+    def close(self, timeout=5.0):
+        """
+        Deliver the queued items and stop the thread
+
+        :param timeout: seconds to wait for the callback, items that are still queued are dropped
+        """
+        self.flush(timeout)
+        with self._condition:
+            self.active = False
+            self.dropped += len(self._queue)
+            self._queue.clear()
+            self._condition.notify_all()
+        self._thread.join(timeout)
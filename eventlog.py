@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pygame
+
+# pygame event types that are logged by default, mouse motion and window events are left out
+DEFAULT_EVENT_TYPES = (pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP)
+
+# columns of the event log
+EVENT_COLUMNS = ['event_type', 'unicode', 'scancode', 'counter', 'timestamp']
+
+EVENT_DTYPE = np.dtype([
+    ('event_type', np.uint16),
+    ('unicode', 'U4'), # key itself (1-9, a-z, usw), empty for other events
+    ('scancode', np.int32), # -1 for events without scancode
+    ('counter', np.int64),
+    ('timestamp', np.int64)])
+
+
+class EventLog(object):
+    """
+    This class logs user input events (key down and up, ...) into one table.
+
+    Only events of the configured types are kept. They are collected in a fixed-size typed array
+    and appended to the csv-file whenever the array is full, so the log never grows in memory
+    during long sessions.
+    """
+
+    def __init__(self, path=None, event_types=DEFAULT_EVENT_TYPES, capacity=1024):
+        """
+        Create the event log
+
+        :param path: csv-file the events are appended to, if None events are only kept until
+            the buffer is flushed (for testruns without csv files)
+        :param event_types: pygame event types that are logged, None logs all events
+        :param capacity: number of events buffered before writing them to the file
+        """
+        self.path = path
+        self.event_types = None if event_types is None else frozenset(event_types)
+        self._buffer = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self._size = 0
+        self.count = 0 # number of logged events, including flushed ones
+
+        if self.path is not None and not os.path.exists(self.path):
+            with open(self.path, "w") as fh:
+                fh.write(",".join(EVENT_COLUMNS) + "\n")
+
+    def log(self, event, counter, timestamp):
+        """
+        Log pygame event, if its type is logged
+
+        :param event: pygame event
+        :param counter: current sample counter
+        :param timestamp: unix timestamp in ms
+        :return: True if event was logged
+        """
+        if self.event_types is not None and event.type not in self.event_types:
+            return False
+
+        if self._size == len(self._buffer):
+            self.flush()
+        self._buffer[self._size] = (event.type, getattr(event, "unicode", ""),
+                                    getattr(event, "scancode", -1), counter, timestamp)
+        self._size += 1
+        self.count += 1
+        return True
+
+    def recent(self):
+        """
+        events logged since the last flush, as structured array (view of the buffer)
+        """
+        return self._buffer[:self._size]
+
+    def flush(self):
+        """
+        Append buffered events to the csv-file and empty the buffer
+        """
+        if self.path is not None and self._size:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                for row in self._buffer[:self._size].tolist():
+                    fh.write("%d,%s,%d,%d,%d\n" % (row[0], _csv_field(row[1]), row[2], row[3], row[4]))
+        self._size = 0
+
+    def close(self):
+        """
+        Flush remaining events
+        """
+        self.flush()
+
+
+def _csv_field(text):
+    """
+    quote text for csv, key characters can be comma or quote
+    """
+    if any(c in text for c in ',"\r\n'):
+        return '"%s"' % text.replace('"', '""')
+    return text
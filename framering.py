@@ -0,0 +1,216 @@
+import json
+import sys
+import time
+
+import numpy as np
+
+import PyKinectV2
+
+# header of the shared memory: latest frame number, slot count, length of the JSON layout, layout
+HEADER_SIZE = 512
+LAYOUT_OFFSET = 64
+# header of every slot, seq is odd while the writer changes the slot (seqlock)
+SLOT_DTYPE = np.dtype([('seq', '<i8'), ('number', '<i8'), ('timestamp', '<f8'), ('pad', '<i8')])
+ALIGNMENT = 64
+
+
+def body_frame_dtype(body_count):
+    """
+    one body frame as record, fixed size so it fits a ring slot
+
+    :param body_count: number of bodies in a body frame
+    :return: structured dtype with tracked, tracking_id, hand_states (left, right), joints (raw _Joint:
+        JointType, x, y, z, TrackingState as float32 bits), orientations (x, y, z, w) and color_points
+        (color space points of the joints, only if the writer maps them) of all bodies
+    """
+    return np.dtype([
+        ('tracked', np.bool_, (body_count,)),
+        ('tracking_id', '<u8', (body_count,)),
+        ('hand_states', np.uint8, (body_count, 2)),
+        ('joints', '<f4', (body_count, PyKinectV2.JointType_Count, 5)),
+        ('orientations', '<f4', (body_count, PyKinectV2.JointType_Count, 4)),
+        ('color_points', '<f4', (body_count, PyKinectV2.JointType_Count, 2))])
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class FrameRing(object):
+    """
+    This class is a ring buffer of frames in named shared memory, written by one process and read
+    by any number of other processes without copying and without locks.
+
+    Every slot has a sequence number that is odd while the writer changes the slot (seqlock).
+    A reader takes the sequence number, reads the frame and checks that the sequence number did
+    not change, otherwise the frame was overwritten while reading. The writer never waits for
+    readers, a reader that is too slow loses frames.
+    """
+
+    def __init__(self, shm, shape, dtype, slots, owner):
+        self._shm = shm
+        self.name = shm.name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self._owner = owner
+
+        self._header = np.ndarray((3,), dtype='<i8', buffer=shm.buf) # latest frame number, slots, layout length
+        offset = HEADER_SIZE
+        self._slot_headers = np.ndarray((slots,), dtype=SLOT_DTYPE, buffer=shm.buf, offset=offset)
+        offset = _aligned(offset + slots * SLOT_DTYPE.itemsize)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=shm.buf, offset=offset)
+        self._count = 0
+
+    @classmethod
+    def create(cls, name, shape, dtype, slots=4):
+        """
+        Create the shared memory of a ring, done by the writer
+
+        :param name: name of the shared memory, e.g. kinect-color
+        :param shape: shape of one frame
+        :param dtype: dtype of one frame, can be a structured dtype
+        :param slots: number of frames in the ring
+        :return: FrameRing for writing
+        """
+        from multiprocessing import shared_memory # Python 3.8
+
+        dtype = np.dtype(dtype)
+        layout = json.dumps({'shape': list(shape), 'dtype': dtype.descr if dtype.fields else dtype.str}).encode('utf-8')
+        if LAYOUT_OFFSET + len(layout) > HEADER_SIZE:
+            raise ValueError("Layout of {} does not fit into the header".format(name))
+
+        size = _aligned(HEADER_SIZE + slots * SLOT_DTYPE.itemsize) + slots * int(np.prod(shape)) * dtype.itemsize
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[LAYOUT_OFFSET:LAYOUT_OFFSET + len(layout)] = layout
+        ring = cls(shm, shape, dtype, slots, True)
+        ring._header[:] = (-1, slots, len(layout))
+        ring._slot_headers[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach to the ring of a writer, shape and dtype are read from the shared memory
+
+        :param name: name of the shared memory
+        :return: FrameRing for reading
+        """
+        from multiprocessing import shared_memory # Python 3.8
+
+        shm = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((3,), dtype='<i8', buffer=shm.buf)
+        slots, length = int(header[1]), int(header[2])
+        del header # no export of the buffer may be left, or close fails
+        layout = json.loads(bytes(shm.buf[LAYOUT_OFFSET:LAYOUT_OFFSET + length]).decode('utf-8'))
+        dtype = layout['dtype']
+        dtype = np.dtype([tuple(field) for field in dtype]) if isinstance(dtype, list) else np.dtype(dtype)
+        return cls(shm, layout['shape'], dtype, slots, False)
+
+    def write(self, frame, timestamp=None):
+        """
+        Copy a frame into the next slot
+
+        :param frame: array with the shape and dtype of the ring
+        :param timestamp: time of the frame in seconds, default time.perf_counter()
+        :return: frame number of the written frame
+        """
+        number = self._count
+        index = number % self.slots
+        seq = self._slot_headers['seq']
+        seq[index] += 1 # odd: slot is changed
+        self._slot_headers['number'][index] = number
+        self._frames[index] = frame
+        self._slot_headers['timestamp'][index] = time.perf_counter() if timestamp is None else timestamp
+        seq[index] += 1 # even: slot is stable
+        self._header[0] = number
+        self._count += 1
+        return number
+
+    def latest(self):
+        """
+        :return: number of the latest written frame, -1 if no frame was written yet
+        """
+        return int(self._header[0])
+
+    def view(self, number):
+        """
+        Frame in shared memory without copying, use valid after reading it
+
+        :param number: frame number
+        :return: tuple (frame, timestamp, seq), None if the frame is not in the ring (anymore)
+        """
+        index = number % self.slots
+        seq = int(self._slot_headers['seq'][index])
+        if seq % 2 or self._slot_headers['number'][index] != number:
+            return None
+        return self._frames[index], float(self._slot_headers['timestamp'][index]), seq
+
+    def valid(self, number, seq):
+        """
+        :param number: frame number of a view
+        :param seq: seq of the view
+        :return: True if the frame was not overwritten since the view was taken
+        """
+        return int(self._slot_headers['seq'][number % self.slots]) == seq
+
+    def read(self, number, out=None):
+        """
+        Copy a frame out of the ring
+
+        :param number: frame number
+        :param out: optional array to copy into
+        :return: tuple (frame, timestamp), None if the frame was overwritten
+        """
+        view = self.view(number)
+        if view is None:
+            return None
+        frame, timestamp, seq = view
+        if out is None:
+            out = np.empty_like(frame)
+        out[...] = frame
+        if not self.valid(number, seq):
+            return None
+        return out, timestamp
+
+    def wait(self, after=-1, timeout=None, interval=0.0002):
+        """
+        Wait for a frame newer than after, polling the header
+
+        :param after: number of the last frame the reader has seen
+        :param timeout: seconds to wait at most, None to wait forever
+        :param interval: seconds between two polls
+        :return: number of the latest frame, None after timeout
+        """
+        end = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            number = self.latest()
+            if number > after:
+                return number
+            if end is not None and time.perf_counter() > end:
+                return None
+            time.sleep(interval)
+
+    def close(self):
+        """
+        Detach from the shared memory, the writer also removes it
+        """
+        self._header = self._slot_headers = self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+if __name__ == "__main__":
+    # python framering.py kinect-body: print frame rate and latency of a running export
+    ring = FrameRing.attach(sys.argv[1] if len(sys.argv) > 1 else "kinect-body")
+    last = ring.latest()
+    try:
+        while True:
+            number = ring.wait(last)
+            view = ring.view(number)
+            if view is not None:
+                print(number, "lost %d" % (number - last - 1), "latency %.3f ms" % ((time.perf_counter() - view[1]) * 1000))
+            last = number
+    except KeyboardInterrupt:
+        ring.close()
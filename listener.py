@@ -1,7 +1,19 @@
+import argparse
+import asyncio
+import collections
+import inspect
 import zmq
 import threading
 import datetime
+import os
+import tempfile
+import time
+import numpy as np
 import metaweardata_pb2
+import metawearbatch
+from clock import ClockEstimator
+from dispatch import CallbackWorker
+from packetloss import GapDetector
 
 # Fields in protobuf packets:
 # For battery packets:
@@ -18,8 +30,35 @@ import metaweardata_pb2
 #   acc.{x,y,z}
 #   gyro.{x,y,z}
 #   extra = packet counter
+#
+# For fused batch packets (FUSED_BATCH, see metawearbatch.py):
+#   the columns of the fused packets of many samples, decoded with numpy
+
+PACKET_TYPES = ("switch", "battery", "fused")
+
+# columns of every packet type: seq (arrival order over all types), sensor and receive timestamp,
+# sensor timestamp mapped to the host clock (see clock.ClockEstimator)
+COMMON_COLUMNS = [("seq", np.int64), ("timestamp_sensor", np.float64), ("timestamp", np.float64),
+                  ("timestamp_host", np.float64)]
+# additional columns per packet type, names as in the dicts of deserialize
+PACKET_COLUMNS = {
+    "switch": [("switch_pressed", np.bool_)],
+    "battery": [("battery_percent", np.float32), ("battery_millivolts", np.float32)],
+    "fused": [("acc_x", np.float64), ("acc_y", np.float64), ("acc_z", np.float64),
+              ("gyro_x", np.float64), ("gyro_y", np.float64), ("gyro_z", np.float64),
+              ("counter", np.int64)]}
+
+# rows per cached DataFrame chunk of get_recorded
+FRAME_CHUNK_ROWS = 1 << 14
 
 def deserialize(msg):
+    if metawearbatch.is_batch(msg):
+        # many fused samples: numpy arrays instead of single values, one receive timestamp
+        data = metawearbatch.decode(msg)
+        data["type"] = "fused"
+        data["timestamp"] = datetime.datetime.now().timestamp()
+        return data
+
     packet = metaweardata_pb2.MetaWearData()
     packet.ParseFromString(msg)
 
@@ -50,90 +89,534 @@ def deserialize(msg):
     else:
         print("Warning: Packet type {} not implemented".format(packet.type))
         return {}
-        
+
     return data
 
-class Listener(object):
+class PacketColumns(object):
     """
-    This class can be used to listen to data streamed over a PUB socket
+    This class stores the packets of one type in columns (one typed numpy array per column).
 
-    After the creation of the listener, start listening by calling start.
+    The arrays grow by doubling. Rows are appended per batch of received packets, so there is
+    no Python object per packet after parsing.
 
-    You can register callbacks that will receive new data by using
-    register_callback.
-    Note that all callbacks should accept a single argument, as this will be new
-    received data.
+    With max_rows, only the latest packets are kept in memory. Older packets are spilled in
+    chunks to one append-only file per column in spill_dir (raw values, read back with
+    numpy.memmap), or dropped without spill_dir. Rows are numbered over memory and disk, the
+    receive timestamps are ascending and are used as index for time ranges.
     """
 
-    def __init__(self, address, bind=False):
+    def __init__(self, packet_type, capacity=1024, max_rows=None, spill_dir=None, chunk_rows=1 << 16):
         """
-        Create the Listener by specifying the address to connect to
+        :param packet_type: "switch", "battery" or "fused"
+        :param capacity: initial number of packets
+        :param max_rows: optional, maximal number of packets in memory
+        :param spill_dir: optional, directory for the files of spilled packets, existing files are
+            never overwritten
+        :param chunk_rows: number of packets that are spilled at once
+        """
+        self.packet_type = packet_type
+        self.names = [name for name, _ in COMMON_COLUMNS + PACKET_COLUMNS[packet_type]]
+        self.dtypes = [np.dtype(dtype) for _, dtype in COMMON_COLUMNS + PACKET_COLUMNS[packet_type]]
+        self.max_rows = max_rows
+        self.chunk_rows = chunk_rows if max_rows is None else min(chunk_rows, max_rows)
+        self.spill_dir = spill_dir
 
-        :param address: Address of the PUB socket (string, proto://host:port)
-        :param bind: Boolean indicating if the Listener should bind or connect
-            to the PUB server, default is True (bind).
+        self._columns = [np.empty(capacity if max_rows is None else min(capacity, max_rows), dtype=dtype) for dtype in self.dtypes]
+        self._first = 0 # number of the first row in memory, rows before are on disk or dropped
+        self._size = 0 # number of rows
+        self._spilled = 0 # number of rows in the spill files
+        # chunk number -> DataFrame of rows chunk * FRAME_CHUNK_ROWS ..., only complete chunks, least
+        # recently used first, with max_rows at most max_rows rows are cached
+        self._frames = collections.OrderedDict()
+        self._frame_limit = None if max_rows is None else max_rows // FRAME_CHUNK_ROWS
+        self._files = None
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._files = [open(self._path(name), "xb") for name in self.names]
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def first(self):
+        """
+        number of the first row that can be read (0 if packets are spilled, else the first row in memory)
         """
-        self.all_received = []
-            
-        self.ioloop = None
+        return 0 if self.spill_dir is not None else self._first
 
-        ctx = zmq.Context()
-        self.listener = ctx.socket(zmq.SUB)
-        self.listener.setsockopt_string(zmq.SUBSCRIBE, "")
+    def _path(self, name):
+        return os.path.join(self.spill_dir, "{}.{}.bin".format(self.packet_type, name))
 
-        if bind:
-            self.listener.bind(address)
-        else:
-            self.listener.connect(address)
-        self.poller = zmq.Poller()
-        self.poller.register(self.listener, zmq.POLLIN)
+    def _evict(self, count):
+        # move the oldest count rows out of memory, to the spill files if there are any
+        if self._files is not None:
+            for column, fh in zip(self._columns, self._files):
+                column[:count].tofile(fh)
+                fh.flush()
+            self._spilled += count
+        in_memory = self._size - self._first
+        for column in self._columns:
+            column[:in_memory - count] = column[count:in_memory]
+        self._first += count
+
+    def extend(self, rows):
+        """
+        Append packets
+
+        :param rows: list of tuples with one value per column, in the order of names
+        :return: number of the first appended row
+        """
+        start = self._reserve(len(rows))
+        for column, values in zip(self._columns, zip(*rows)):
+            column[start:start + len(rows)] = values
+        self._size += len(rows)
+        return self._first + start
+
+    def extend_columns(self, values):
+        """
+        Append packets given as columns, e.g. of a batch message
+
+        :param values: dict of column name -> array, all names, same length
+        :return: number of the first appended row
+        """
+        count = len(values[self.names[0]])
+        start = self._reserve(count)
+        for name, column in zip(self.names, self._columns):
+            column[start:start + count] = values[name]
+        self._size += count
+        return self._first + start
+
+    def _reserve(self, count):
+        # make space for count rows in memory, spill or grow, return the index of the first new row
+        if self.max_rows is not None:
+            overflow = self._size - self._first + count - self.max_rows
+            if overflow > 0: # whole chunks, so spilling happens rarely
+                self._evict(min(self._size - self._first, -(-overflow // self.chunk_rows) * self.chunk_rows))
+
+        start, end = self._size - self._first, self._size - self._first + count
+        if end > len(self._columns[0]):
+            capacity = max(end, 2 * len(self._columns[0]))
+            if self.max_rows is not None:
+                capacity = max(end, min(capacity, self.max_rows))
+            for i, column in enumerate(self._columns):
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:start] = column[:start]
+                self._columns[i] = grown
+        return start
+
+    def _disk(self, index):
+        # spilled rows of one column, without reading them
+        if self._spilled == 0:
+            return np.empty(0, dtype=self.dtypes[index])
+        return np.memmap(self._path(self.names[index]), dtype=self.dtypes[index], mode="r", shape=(self._spilled,))
+
+    def column(self, name, start=0, end=None):
+        """
+        :param name: column name
+        :param start: number of the first row
+        :param end: number after the last row, default all rows
+        :return: values of the rows, a view if they are all in memory
+        """
+        index = self.names.index(name)
+        start = max(start, self.first)
+        end = self._size if end is None else min(end, self._size)
+        memory = self._columns[index][max(start - self._first, 0):max(end - self._first, 0)]
+        if start >= self._first:
+            return memory
+        return np.concatenate([self._disk(index)[start:min(end, self._first)], memory])
+
+    def columns(self, start=0, end=None):
+        """
+        :return: dict of column name -> values of the column, for rows start to end
+        """
+        return dict((name, self.column(name, start, end)) for name in self.names)
+
+    def search(self, timestamp, side="left"):
+        """
+        binary search of a receive timestamp over memory and disk
+
+        :param timestamp: receive timestamp in seconds
+        :param side: "left" for the first row with timestamp >= the value, "right" for > the value
+        :return: row number
+        """
+        index = self.names.index("timestamp")
+        if self.first < self._first: # spilled rows come first
+            row = int(np.searchsorted(self._disk(index), timestamp, side))
+            if row < self._spilled:
+                return row
+        return self._first + int(np.searchsorted(self._columns[index][:self._size - self._first], timestamp, side))
+
+    def rows_between(self, since=None, until=None):
+        """
+        :param since: optional, first receive timestamp in seconds
+        :param until: optional, receive timestamp in seconds after the last row
+        :return: tuple (start, end) of row numbers
+        """
+        start = self.first if since is None else max(self.search(since), self.first)
+        end = self._size if until is None else self.search(until)
+        return start, max(start, end)
+
+    def dataframe(self, start, end):
+        """
+        rows as DataFrame with a type column, complete chunks of FRAME_CHUNK_ROWS rows are converted
+        only once and cached, so repeated calls only convert new rows (with max_rows only the latest
+        used chunks that fit into max_rows)
+
+        :param start: number of the first row
+        :param end: number after the last row
+        :return: DataFrame with the columns of the packet type, index from 0
+        """
+        import pandas as pd
+
+        for chunk in [chunk for chunk in self._frames if (chunk + 1) * FRAME_CHUNK_ROWS <= self.first]:
+            del self._frames[chunk] # rows were dropped
+
+        parts = []
+        for chunk in range(start // FRAME_CHUNK_ROWS, -(-end // FRAME_CHUNK_ROWS)):
+            chunk_start = chunk * FRAME_CHUNK_ROWS
+            frame = self._frames.get(chunk)
+            if frame is None:
+                chunk_end = min(chunk_start + FRAME_CHUNK_ROWS, self._size)
+                frame = pd.DataFrame(self.columns(chunk_start, chunk_end))
+                frame.index = pd.RangeIndex(max(chunk_start, self.first), chunk_end)
+                frame.insert(3, "type", self.packet_type)
+                if chunk_end - chunk_start == FRAME_CHUNK_ROWS and self._frame_limit != 0:
+                    self._frames[chunk] = frame
+                    if self._frame_limit is not None and len(self._frames) > self._frame_limit:
+                        self._frames.popitem(last=False)
+            else:
+                self._frames.move_to_end(chunk)
+            parts.append(frame.loc[max(start, chunk_start):min(end, chunk_start + FRAME_CHUNK_ROWS) - 1])
+        if not parts:
+            return pd.DataFrame(columns=self.names[:3] + ["type"] + self.names[3:])
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+
+    def to_dict(self, values):
+        """
+        one packet as dict, like deserialize
+
+        :param values: values of the packet in the order of names, e.g. a row of extend
+        """
+        data = {"timestamp_sensor": values[1], "timestamp": values[2], "type": self.packet_type}
+        for name, value in zip(self.names[3:], values[3:]):
+            data[name] = value
+        return data
+
+    def close(self):
+        """
+        Close the spill files, they stay on disk
+        """
+        if self._files is not None:
+            for fh in self._files:
+                fh.close()
+            self._files = None
+
+
+class PacketStore(object):
+    """
+    This class stores received packets in typed numpy columns per packet type (see
+    PacketColumns) and calls the registered callbacks. It does not receive by
+    itself, Listener receives in a thread and AsyncListener in an asyncio event loop.
+
+    You can register callbacks that will receive new data by using
+    register_callback.
+    Note that all callbacks should accept a single argument, as this will be new
+    received data.
+
+    All messages that are pending when the receiver wakes up are parsed as one
+    batch, dicts are only created for callbacks that want them.
 
+    Callbacks of a Listener run in their own worker thread each (see
+    dispatch.CallbackWorker), so a slow callback does not delay receiving.
+    """
+
+    # True: callbacks are called by workers, False: by the receiver (AsyncListener)
+    dispatch = True
+
+    def __init__(self, max_rows=None, spill_dir=None):
+        """
+        :param max_rows: optional, maximal number of packets per type kept in
+            memory, e.g. 1 << 20 for long recordings
+        :param spill_dir: optional, directory older packets are written to if
+            max_rows is reached, without it they are dropped. Every store writes into
+            a new subdirectory (spill_dir of the store), so receivers can share it
+        """
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            spill_dir = tempfile.mkdtemp(prefix=datetime.datetime.now().strftime("packets-%Y%m%d-%H%M%S-"), dir=spill_dir)
+        self.spill_dir = spill_dir
+        self.columns = dict((packet_type, PacketColumns(packet_type, max_rows=max_rows, spill_dir=spill_dir))
+                            for packet_type in PACKET_TYPES)
+        self._seq = 0 # arrival order of all packets
+        self._lock = threading.Lock()
+        self._packet = metaweardata_pb2.MetaWearData() # reused for parsing
+        # relation of sensor and host clock, one sensor per receiver
+        self.clock = ClockEstimator()
+        # lost, duplicated and reordered fused packets, from the packet counter
+        self.gaps = GapDetector()
+        self._loss_workers = []
         self.callbacks = []
         self.active = True
-        self.listener_thread = None
-
-    def _stream_callback(self, msg):
-        #msg is multipart, extract it first
-        self.call_callbacks(msg[0])
+        self.batch_limit = 4096 # maximal number of messages parsed as one batch
+        # parse from the zmq frames without copying them to bytes, faster for large
+        # messages, slower for single samples of about 60 bytes (see benchmark)
+        self.zero_copy = False
 
-    def start(self, verbose=False):
-        if self.ioloop is None:
-            self.listener_thread = threading.Thread(target=self._run,
-                                                    args=(verbose,))
-            self.listener_thread.start()
+    @property
+    def all_received(self):
+        """
+        all received packets as list of dicts, created on access
+        """
+        return self.get_recorded()
 
-    def register_callback(self, callback, type_filter = None):
+    def register_callback(self, callback, type_filter = None, batch = False, delivery = "single",
+                          max_queue = 10000, drop = "oldest"):
         """
         Register a new callback to be called when new data is available.
-        When closed() is called, all callbacks will be called with None as argument.
 
         :param callback: Callable, has to accept a single argument (received data)
         :param type_filter: optional, list/tuple of packet types ("switch",
             "battery", "fused"). If specified, only packets of these types will be
             received. If None, all packets will be received.
+        :param batch: If False, the callback gets every packet as dict. If True, it
+            gets the new packets of one type per received batch as dict of column name
+            -> numpy array (copies, views for an AsyncListener), with the key "type".
+            Callbacks of an AsyncListener can be coroutine functions, they are awaited.
+        :param delivery: "single" for one packet (or batch) per call, "list" for a
+            list of all queued ones, "array" for the queued ones of one packet type as
+            dict of column name -> numpy array (see dispatch.CallbackWorker)
+        :param max_queue: maximal number of queued packets (or batches) of the callback
+        :param drop: "oldest" or "newest", which packets are dropped if the queue is full
+        :return: CallbackWorker of the callback, None for an AsyncListener
+        """
+        type_filter = type_filter if type_filter is not None else PACKET_TYPES
+        worker = CallbackWorker(callback, max_queue, drop, delivery) if self.dispatch else None
+        self.callbacks.append((callback, type_filter, batch, worker))
+        return worker
+
+    def register_loss_callback(self, callback):
+        """
+        Register a callback that is notified when too many fused packets are lost
+        (see packetloss.GapDetector, listener.gaps.threshold)
+
+        :param callback: Callable, gets a dict with lost, expected, ratio, counter and host_time
+        """
+        if not self.dispatch:
+            self.gaps.register_callback(callback)
+            return
+        worker = CallbackWorker(callback, max_queue=100)
+        self._loss_workers.append(worker)
+        self.gaps.register_callback(lambda event: worker.put([event]))
+
+    def _workers(self):
+        return [worker for _, _, _, worker in self.callbacks if worker is not None] + self._loss_workers
+
+    def callback_metrics(self):
+        """
+        :return: list of dicts with the metrics of every callback (see CallbackWorker.metrics):
+            queued, delivered, dropped, calls, errors and lag in seconds
         """
-        type_filter = type_filter if type_filter is not None else ("switch","battery","fused")
-        self.callbacks.append((callback, type_filter))
-    
-    def get_recorded(self, filter_types=None, as_type=None):
+        return [worker.metrics() for worker in self._workers()]
+
+    def flush(self, timeout=None):
+        """
+        Wait until all callbacks got all received packets
+
+        :param timeout: seconds to wait per callback at most
+        """
+        for worker in self._workers():
+            worker.flush(timeout)
+
+
+    def get_recorded(self, filter_types=None, as_type=None, since=None, until=None):
         """
         Get all received data. With default parameters, this return a list of
         packets (dicts). The packets can be filtered so only packets of matching
         types will be returned. Optionally a different format can be selected.
-        
+        Packets spilled to disk are included, dropped packets are not.
+
         :param filter_types: Only return packets of these types
+        :param since: optional, only packets received at or after this unix timestamp
+            in seconds (found by binary search, only these packets are copied)
+        :param until: optional, only packets received before this unix timestamp
         :param datatype: If None, return a list of dicts. If "dataframe", return a
             pandas DataFrame (will contain columns with missing values, if more than
-            one filter_type is specified).
+            one filter_type is specified). If "columns", return a dict of packet type
+            -> dict of column name -> numpy array (copies).
         """
-        data = self.all_received[:]
-        if filter_types:
-            data = [d for d in data if d["type"] in filter_types]
-        
+        packet_types = [packet_type for packet_type in PACKET_TYPES if not filter_types or packet_type in filter_types]
         if as_type and as_type.lower() == "dataframe":
             import pandas as pd
-            data = pd.DataFrame(data)
-        return data
+            with self._lock:
+                frames = []
+                for packet_type in packet_types:
+                    start, end = self.columns[packet_type].rows_between(since, until)
+                    if end > start:
+                        frames.append(self.columns[packet_type].dataframe(start, end))
+            if not frames:
+                return pd.DataFrame()
+            if len(frames) == 1:
+                return frames[0].drop(columns="seq")
+            data = pd.concat(frames, ignore_index=True)
+            order = np.argsort(data["seq"].to_numpy(), kind="stable") # arrival order over all types
+            return data.take(order).reset_index(drop=True).drop(columns="seq")
+
+        snapshot = {}
+        with self._lock:
+            for packet_type in packet_types:
+                columns = self.columns[packet_type]
+                start, end = columns.rows_between(since, until)
+                snapshot[packet_type] = dict((name, np.array(values)) for name, values in columns.columns(start, end).items())
+
+        if as_type and as_type.lower() == "columns":
+            return snapshot
+
+        # dicts in arrival order
+        rows = []
+        for packet_type in packet_types:
+            columns = snapshot[packet_type]
+            values = [columns[name].tolist() for name in self.columns[packet_type].names]
+            rows.extend((row[0], packet_type, row) for row in zip(*values))
+        rows.sort(key=lambda row: row[0])
+        return [self.columns[packet_type].to_dict(row) for _, packet_type, row in rows]
+
+
+    def _parse(self, msg, timestamp):
+        """
+        parse one message into a row of its packet type
+
+        :return: tuple (packet type, row without seq and timestamp_host), None for unknown packet types
+        """
+        packet = self._packet
+        packet.ParseFromString(msg)
+        if packet.type == metaweardata_pb2.MetaWearData.FUSED:
+            acc, gyro = packet.acc, packet.gyro
+            return "fused", (packet.timestamp / 1000, timestamp, acc.x, acc.y, acc.z, gyro.x, gyro.y, gyro.z, packet.extra)
+        elif packet.type == metaweardata_pb2.MetaWearData.SWITCH:
+            return "switch", (packet.timestamp / 1000, timestamp, bool(packet.w))
+        elif packet.type == metaweardata_pb2.MetaWearData.BATTERY:
+            return "battery", (packet.timestamp / 1000, timestamp, packet.w, packet.x)
+        elif packet.type in (metaweardata_pb2.MetaWearData.ACC, metaweardata_pb2.MetaWearData.GYRO):
+            print("Warning: Receiving packets of type {}. Is your sensor running the latest firmware?".format(packet.type))
+        else:
+            print("Warning: Packet type {} not implemented".format(packet.type))
+        return None
+
+
+    def _store(self, messages):
+        """
+        parse a batch of messages into the columns
+
+        :param messages: list of (message as bytes or memoryview, receive timestamp in seconds)
+        :return: tuple (number of packets per packet type, start row per stored packet
+            type, (packet type, row or dict of columns of a batch) in arrival order)
+        """
+        parts = dict((packet_type, []) for packet_type in PACKET_TYPES) # lists of rows and batches
+        counts = dict((packet_type, 0) for packet_type in PACKET_TYPES)
+        order = [] # (packet type, row or batch) in arrival order, for dict callbacks
+        steps = len(self.clock.steps)
+        for msg, timestamp in messages:
+            if metawearbatch.is_batch(msg):
+                try:
+                    values = metawearbatch.decode(msg)
+                except ValueError as e:
+                    print("Warning: Invalid batch packet: {}".format(e))
+                    continue
+                count = len(values["counter"])
+                values["seq"] = np.arange(self._seq, self._seq + count)
+                values["timestamp"] = np.full(count, timestamp) # samples of a batch are received together
+                values["timestamp_host"] = self.clock.update_batch(values["timestamp_sensor"], timestamp)
+                self.gaps.update_batch(values["counter"], values["timestamp_sensor"], timestamp)
+                order.append(("fused", values))
+                parts["fused"].append(values)
+                counts["fused"] += count
+                self._seq += count
+                continue
+            parsed = self._parse(msg, timestamp)
+            if parsed is None:
+                continue
+            packet_type, row = parsed
+            row = (self._seq, row[0], row[1], self.clock.update(row[0], row[1])) + row[2:]
+            if packet_type == "fused":
+                self.gaps.update(row[-1], row[1], row[2]) # counter is the last column
+            order.append((packet_type, row))
+            if not parts[packet_type] or isinstance(parts[packet_type][-1], dict):
+                parts[packet_type].append([])
+            parts[packet_type][-1].append(row)
+            counts[packet_type] += 1
+            self._seq += 1
+
+        for _, sensor_time, size in self.clock.steps[steps:]:
+            print("Warning: Clock offset of the sensor changed by {:.3f} s at sensor time {:.3f}".format(size, sensor_time))
+
+        starts = {}
+        with self._lock:
+            for packet_type, new in parts.items():
+                columns = self.columns[packet_type]
+                for part in new:
+                    start = columns.extend_columns(part) if isinstance(part, dict) else columns.extend(part)
+                    starts.setdefault(packet_type, start)
+        return counts, starts, order
+
+    def _batch(self, counts, starts):
+        """
+        :return: dict of packet type -> dict of column name -> numpy array (views)
+            of the packets of one batch
+        """
+        return dict((packet_type, self.columns[packet_type].columns(start, start + counts[packet_type]))
+                    for packet_type, start in starts.items())
+
+    def _calls(self, counts, starts, order):
+        """
+        callbacks of one batch, batch callbacks first
+
+        :return: generator of (callback, worker, argument)
+        """
+        batches = self._batch(counts, starts)
+        for callback, type_filter, batch, worker in self.callbacks:
+            if batch:
+                for packet_type, columns in batches.items():
+                    if packet_type in type_filter:
+                        if worker is None:
+                            columns = dict(columns)
+                        else: # the views can change before the worker calls the callback (spilling)
+                            columns = dict((name, np.array(values)) for name, values in columns.items())
+                        columns["type"] = packet_type
+                        yield callback, worker, columns
+
+        dict_types = set(packet_type for _, type_filter, batch, _ in self.callbacks if not batch for packet_type in type_filter)
+        for packet_type, part in order:
+            if packet_type not in dict_types:
+                continue
+            columns = self.columns[packet_type]
+            if isinstance(part, dict): # batch message, one dict per sample
+                rows = zip(*[part[name].tolist() for name in columns.names])
+            else:
+                rows = [part]
+            for row in rows: # same dict for all callbacks of one packet
+                data = columns.to_dict(row)
+                for callback, type_filter, batch, worker in self.callbacks:
+                    if not batch and packet_type in type_filter:
+                        yield callback, worker, data
+
+    def ingest(self, messages):
+        """
+        Parse a batch of messages into the columns and pass them to the callbacks,
+        callbacks with a worker are called later by the worker (see flush).
+
+        :param messages: list of (message, receive timestamp in seconds)
+        :return: number of stored packets
+        """
+        counts, starts, order = self._store(messages)
+        queued = collections.OrderedDict() # worker -> items of this batch, one put per worker
+        for callback, worker, data in self._calls(counts, starts, order):
+            if worker is None:
+                callback(data)
+            else:
+                queued.setdefault(worker, []).append(data)
+        for worker, items in queued.items():
+            worker.put(items)
+        return sum(counts.values())
 
     def call_callbacks(self, msg):
         """
@@ -141,12 +624,75 @@ class Listener(object):
 
         :param msg: The message to pass to callbacks
         """
-        deserialized = deserialize(msg)
-        if deserialized:
-            self.all_received.append(deserialized)
-            for callback, type_filter in self.callbacks:
-                if deserialized["type"] in type_filter:
-                    callback(deserialized)
+        self.ingest([(msg, time.time())])
+
+    def _drain(self, socket):
+        """
+        receive all pending messages without waiting, at most batch_limit
+
+        :param socket: blocking zmq socket
+        :return: list of (message, receive timestamp in seconds), messages are
+            memoryviews of the zmq frames if zero_copy is set, else bytes
+        """
+        messages = []
+        append = messages.append
+        recv = socket.recv
+        if self.zero_copy:
+            while len(messages) < self.batch_limit:
+                try:
+                    append((recv(zmq.NOBLOCK, copy=False).buffer, time.time()))
+                except zmq.Again:
+                    break
+        else:
+            while len(messages) < self.batch_limit:
+                try:
+                    append((recv(zmq.NOBLOCK), time.time()))
+                except zmq.Again:
+                    break
+        return messages
+
+
+class Listener(PacketStore):
+    """
+    This class can be used to listen to data streamed over a PUB socket
+
+    After the creation of the listener, start listening by calling start. The
+    listener receives in its own thread, see AsyncListener to receive in an
+    asyncio event loop instead.
+    """
+
+    def __init__(self, address, bind=False, max_rows=None, spill_dir=None):
+        """
+        Create the Listener by specifying the address to connect to
+
+        :param address: Address of the PUB socket (string, proto://host:port)
+        :param bind: Boolean indicating if the Listener should bind or connect
+            to the PUB server, default is False (connect).
+        :param max_rows: optional, maximal number of packets per type kept in
+            memory, e.g. 1 << 20 for long recordings
+        :param spill_dir: optional, directory older packets are written to if
+            max_rows is reached, in a new subdirectory, without it they are dropped
+        """
+        super(Listener, self).__init__(max_rows, spill_dir)
+
+        ctx = zmq.Context()
+        self.listener = ctx.socket(zmq.SUB)
+        self.listener.setsockopt_string(zmq.SUBSCRIBE, "")
+
+        if bind:
+            self.listener.bind(address)
+        else:
+            self.listener.connect(address)
+        self.poller = zmq.Poller()
+        self.poller.register(self.listener, zmq.POLLIN)
+
+        self.listener_thread = None
+
+    def start(self, verbose=False):
+        if self.listener_thread is None:
+            self.listener_thread = threading.Thread(target=self._run,
+                                                    args=(verbose,))
+            self.listener_thread.start()
 
     def _run(self, verbose=False):
         """
@@ -154,14 +700,14 @@ class Listener(object):
 
         :param verbose: If true: print all received data objects
         """
-        if self.ioloop is None:
-            while self.active:
-                evts = dict(self.poller.poll(600))
-                if self.listener in evts:
-                    data = self.listener.recv()
-                    if verbose:
-                        print(data)
-                    self.call_callbacks(data)
+        while self.active:
+            evts = dict(self.poller.poll(600))
+            if self.listener in evts:
+                messages = self._drain(self.listener)
+                if verbose:
+                    for data, _ in messages:
+                        print(bytes(data))
+                self.ingest(messages)
 
     def close(self):
         """
@@ -169,11 +715,179 @@ class Listener(object):
 
         """
         self.active = False
-        if self.ioloop is None:
-            if self.listener_thread is not None:
-                self.listener_thread.join()
-                self.listener.close()
-                # for callback in self.callbacks:
-                #    callback(None)
+        if self.listener_thread is not None:
+            self.listener_thread.join()
+        self.listener.close()
+        for worker in self._workers():
+            worker.close()
+        for columns in self.columns.values():
+            columns.close()
+
+
+class AsyncListener(PacketStore):
+    """
+    This class receives data streamed over a PUB socket in an asyncio event loop
+    (zmq.asyncio), so several sensors and the skeleton stream of the recorder
+    (skeleton.AsyncSkeletonSubscriber) can be received in one thread, see run_all.
+
+    Iterate over batches, or register callbacks and call start or await run.
+    Callbacks can be coroutine functions, they are awaited before the next batch
+    is received. They run in the event loop, not in workers, so blocking work
+    belongs into loop.run_in_executor.
+    """
+
+    dispatch = False
+
+    def __init__(self, address, bind=False, context=None, max_rows=None, spill_dir=None):
+        """
+        :param address: Address of the PUB socket (string, proto://host:port)
+        :param bind: Boolean indicating if the listener should bind or connect
+            to the PUB server, default is False (connect).
+        :param context: optional, zmq.asyncio.Context, default the shared instance
+        :param max_rows: optional, maximal number of packets per type kept in
+            memory
+        :param spill_dir: optional, directory older packets are written to if
+            max_rows is reached, in a new subdirectory
+        """
+        super(AsyncListener, self).__init__(max_rows, spill_dir)
+        import zmq.asyncio
+
+        context = context if context is not None else zmq.asyncio.Context.instance()
+        self.socket = context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"")
+        if bind:
+            self.socket.bind(address)
         else:
-            self.stream.close()
+            self.socket.connect(address)
+        # blocking socket on the same zmq socket, to drain pending messages without futures
+        self._socket = zmq.Socket.shadow(self.socket.underlying)
+        self.task = None
+
+    async def batches(self, timeout=600):
+        """
+        Receive until stop is called, callbacks are called for every batch.
+
+        :param timeout: ms between two checks of stop
+        :return: async iterator of dicts of packet type -> dict of column name ->
+            numpy array (views, copy them to keep them), only types that are in
+            the batch
+        """
+        while self.active:
+            if not await self.socket.poll(timeout, zmq.POLLIN):
+                continue
+            counts, starts, order = self._store(self._drain(self._socket))
+            for callback, _, data in self._calls(counts, starts, order):
+                result = callback(data)
+                if inspect.isawaitable(result):
+                    await result
+            if starts:
+                yield self._batch(counts, starts)
+
+    async def run(self):
+        """
+        Receive and call the callbacks until stop is called
+        """
+        async for _ in self.batches():
+            pass
+
+    def start(self):
+        """
+        Run in a task of the running event loop
+        """
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        """
+        Stop receiving and close the socket
+        """
+        self.active = False
+        if self.task is not None:
+            self.task.cancel()
+        self.socket.close()
+        for columns in self.columns.values():
+            columns.close()
+
+
+async def run_all(*receivers):
+    """
+    Receive from several AsyncListeners (and AsyncSkeletonSubscribers) in one event loop
+
+    :param receivers: objects with a coroutine function run
+    """
+    await asyncio.gather(*(receiver.run() for receiver in receivers))
+
+
+def _fused_message(i):
+    packet = metaweardata_pb2.MetaWearData()
+    packet.type = metaweardata_pb2.MetaWearData.FUSED
+    packet.timestamp = i
+    packet.acc.x, packet.acc.y, packet.acc.z = 0.1, -0.98, 0.05
+    packet.gyro.x, packet.gyro.y, packet.gyro.z = 1.5, -2.0, 0.25
+    packet.extra = i
+    return packet.SerializeToString()
+
+
+def _fused_batch_message(i, samples):
+    counters = np.arange(i, i + samples)
+    return metawearbatch.encode(counters * 10, np.full((samples, 3), 0.5), np.full((samples, 3), 1.5), counters)
+
+
+def benchmark(count=100000, batch_limit=4096, zero_copy=False, address="tcp://127.0.0.1:5599", samples_per_message=1):
+    """
+    Receive throughput of a Listener: a local PUB socket queues count fused packets,
+    then the listener is started and the time until all packets are stored is measured.
+
+    :param samples_per_message: 1 for single sample messages, else FUSED_BATCH messages
+    :return: samples per second
+    """
+    publisher = zmq.Context.instance().socket(zmq.PUB)
+    publisher.setsockopt(zmq.SNDHWM, 0) # keep all messages the listener did not take yet
+    publisher.bind(address)
+    listener = Listener(address)
+    listener.batch_limit = batch_limit
+    listener.zero_copy = zero_copy
+    time.sleep(0.3) # subscription has to arrive before sending
+
+    if samples_per_message == 1:
+        messages = [_fused_message(i) for i in range(count)]
+    else:
+        messages = [_fused_batch_message(i, samples_per_message) for i in range(0, count, samples_per_message)]
+        count = len(messages) * samples_per_message
+    for msg in messages:
+        publisher.send(msg)
+    time.sleep(0.5) # all messages queued at the listener
+
+    start = time.perf_counter()
+    listener.start()
+    while len(listener.columns["fused"]) < count:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    listener.close()
+    publisher.close()
+    return count / elapsed
+
+
+def main(argv=None):
+    """
+    compare receive throughput of one batch per message, batches per wakeup,
+    zero-copy batches and FUSED_BATCH messages
+    """
+    parser = argparse.ArgumentParser(description="Receive throughput of the Listener")
+    parser.add_argument("-n", "--count", type=int, default=100000, help="number of packets per mode")
+    parser.add_argument("-s", "--samples", type=int, default=100, help="samples per FUSED_BATCH message")
+    args = parser.parse_args(argv)
+
+    for title, batch_limit, zero_copy, samples in (("one message per wakeup", 1, False, 1),
+                                                   ("batched", 4096, False, 1),
+                                                   ("batched, zero copy", 4096, True, 1),
+                                                   ("FUSED_BATCH messages", 4096, False, args.samples),
+                                                   ("FUSED_BATCH, zero copy", 4096, True, args.samples)):
+        print("%-24s %9.0f samples/s" % (title, benchmark(args.count, batch_limit, zero_copy, samples_per_message=samples)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import numpy as np
+
+# Wire format of FUSED_BATCH messages (see metaweardata.proto), encoded and decoded with numpy
+# instead of one protobuf message per sample:
+#   MetaWearData.type      = FUSED_BATCH
+#   MetaWearData.timestamp = sensor timestamp in ms of the first sample
+#   MetaWearData.extra     = packet counter of the first sample
+#   MetaWearData.batch     = MetaWearBatch, packed columns, timestamps and counters as deltas
+# Every protobuf serializer writes the fields in order of their numbers, so the type is the
+# first field and a batch message starts with BATCH_PREFIX. Single sample (v1) messages of
+# older senders start with another type and are parsed by metaweardata_pb2 as before.
+# metaweardata_pb2 (generated from metaweardata.proto) parses batch messages as well, with
+# one Python object per value, this module is the fast path of the Listener.
+
+FUSED_BATCH = 6
+BATCH_PREFIX = b"\x08\x06" # field 1 (type) as varint, FUSED_BATCH
+
+# wire types of protobuf
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH = 2
+WIRE_FIXED32 = 5
+
+# fields of MetaWearData
+FIELD_TYPE = 1
+FIELD_TIMESTAMP = 2
+FIELD_EXTRA = 9
+FIELD_BATCH = 10
+
+# fields of MetaWearBatch: name -> (field number, numpy dtype of the packed values, None for sint64)
+BATCH_FIELDS = [("timestamp_delta", 1, None),
+                ("acc_x", 2, np.dtype("<f4")), ("acc_y", 3, np.dtype("<f4")), ("acc_z", 4, np.dtype("<f4")),
+                ("gyro_x", 5, np.dtype("<f4")), ("gyro_y", 6, np.dtype("<f4")), ("gyro_z", 7, np.dtype("<f4")),
+                ("counter_delta", 8, None)]
+
+
+def is_batch(msg):
+    """
+    :param msg: received message, bytes or memoryview
+    :return: True if the message is a FUSED_BATCH message
+    """
+    return bytes(msg[:2]) == BATCH_PREFIX
+
+
+def _varint(data, pos):
+    # one varint at pos, return (value, position after it)
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _fields(data):
+    """
+    scan the fields of one protobuf message
+
+    :param data: message as numpy uint8 array
+    :return: generator of (field number, wire type, value), value is an int for varints and
+        fixed fields and a (start, end) tuple for length delimited fields
+    """
+    view = memoryview(data) # items are Python ints
+    pos, end = 0, len(data)
+    while pos < end:
+        tag, pos = _varint(view, pos)
+        number, wire = tag >> 3, tag & 7
+        if wire == WIRE_VARINT:
+            value, pos = _varint(view, pos)
+        elif wire == WIRE_LENGTH:
+            length, pos = _varint(view, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire == WIRE_FIXED64:
+            value = int(data[pos:pos + 8].view("<u8")[0])
+            pos += 8
+        elif wire == WIRE_FIXED32:
+            value = int(data[pos:pos + 4].view("<u4")[0])
+            pos += 4
+        else:
+            raise ValueError("Unsupported wire type {} of field {}".format(wire, number))
+        yield number, wire, value
+    if pos != end:
+        raise ValueError("Truncated message")
+
+
+def decode_varints(data):
+    """
+    Decode packed varints in one array step
+
+    :param data: numpy uint8 array of concatenated varints
+    :return: numpy uint64 array of the values
+    """
+    if len(data) == 0:
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80) # last byte of every varint
+    if len(ends) == 0 or ends[-1] != len(data) - 1:
+        raise ValueError("Truncated varint")
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    shifts = (np.arange(len(data)) - np.repeat(starts, ends - starts + 1)).astype(np.uint64) * np.uint64(7)
+    return np.add.reduceat(np.left_shift((data & 0x7f).astype(np.uint64), shifts), starts)
+
+
+def encode_varints(values):
+    """
+    Encode unsigned values as packed varints
+
+    :param values: numpy uint64 array
+    :return: numpy uint8 array
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    offsets = np.cumsum(lengths) - lengths
+    for k in range(int(lengths.max()) if len(values) else 0):
+        selected = lengths > k
+        byte = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (lengths[selected] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[selected] + k] = byte | more
+    return out
+
+
+def zigzag_decode(values):
+    """
+    :param values: numpy uint64 array of sint64 wire values
+    :return: numpy int64 array
+    """
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def zigzag_encode(values):
+    """
+    :param values: numpy int64 array
+    :return: numpy uint64 array of sint64 wire values
+    """
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def _varint_bytes(value):
+    # one unsigned varint, for tags and single fields
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _length_field(number, payload):
+    return _varint_bytes((number << 3) | WIRE_LENGTH) + _varint_bytes(len(payload)) + payload
+
+
+def encode(timestamps, acc, gyro, counters):
+    """
+    Encode fused samples as one FUSED_BATCH message
+
+    :param timestamps: sensor timestamps in ms (samples,)
+    :param acc: acceleration (samples, 3)
+    :param gyro: angular velocity (samples, 3)
+    :param counters: packet counters (samples,)
+    :return: bytes of a MetaWearData message
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    counters = np.asarray(counters, dtype=np.int64)
+    acc = np.asarray(acc, dtype="<f4")
+    gyro = np.asarray(gyro, dtype="<f4")
+    if len(timestamps) == 0:
+        raise ValueError("A batch needs at least one sample")
+
+    columns = {"timestamp_delta": np.diff(timestamps, prepend=timestamps[0]),
+               "counter_delta": np.diff(counters, prepend=counters[0])}
+    for i, axis in enumerate("xyz"):
+        columns["acc_" + axis] = acc[:, i]
+        columns["gyro_" + axis] = gyro[:, i]
+    batch = b"".join(_length_field(number, (encode_varints(zigzag_encode(columns[name])) if dtype is None
+                                            else np.ascontiguousarray(columns[name])).tobytes())
+                     for name, number, dtype in BATCH_FIELDS)
+    head = b"".join(_varint_bytes(value) for value in (
+        (FIELD_TYPE << 3) | WIRE_VARINT, FUSED_BATCH,
+        (FIELD_TIMESTAMP << 3) | WIRE_VARINT, int(timestamps[0]) % (1 << 64),
+        (FIELD_EXTRA << 3) | WIRE_VARINT, int(counters[0]) % (1 << 64)))
+    return head + _length_field(FIELD_BATCH, batch)
+
+
+def decode(msg):
+    """
+    Decode a FUSED_BATCH message, the float columns are views of the message
+
+    :param msg: bytes or memoryview of the message
+    :return: dict of column name -> numpy array with timestamp_sensor (seconds), acc_x, acc_y,
+        acc_z, gyro_x, gyro_y, gyro_z (float32) and counter, like the fused columns of the Listener
+    """
+    data = np.frombuffer(msg, dtype=np.uint8)
+    timestamp = counter = 0
+    batch = None
+    for number, wire, value in _fields(data):
+        if number == FIELD_TYPE and value != FUSED_BATCH:
+            raise ValueError("Not a batch message, type {}".format(value))
+        elif number == FIELD_TIMESTAMP:
+            timestamp = value - (1 << 64) if value >= 1 << 63 else value
+        elif number == FIELD_EXTRA:
+            counter = value - (1 << 64) if value >= 1 << 63 else value
+        elif number == FIELD_BATCH:
+            batch = data[value[0]:value[1]]
+    if batch is None:
+        raise ValueError("Batch message without samples")
+
+    fields = dict((number, (name, dtype)) for name, number, dtype in BATCH_FIELDS)
+    parts = dict((name, []) for name, _, _ in BATCH_FIELDS)
+    for number, wire, value in _fields(batch):
+        if number not in fields:
+            continue
+        name, dtype = fields[number]
+        if wire != WIRE_LENGTH:
+            raise ValueError("Field {} is not packed".format(name))
+        parts[name].append(batch[value[0]:value[1]])
+
+    columns = {}
+    for name, _, dtype in BATCH_FIELDS:
+        chunks = parts[name]
+        raw = chunks[0] if len(chunks) == 1 else np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint8)
+        columns[name] = zigzag_decode(decode_varints(raw)) if dtype is None else raw.view(dtype)
+    count = len(columns["timestamp_delta"])
+    if any(len(values) != count for values in columns.values()):
+        raise ValueError("Columns of the batch have different lengths")
+
+    result = {"timestamp_sensor": (timestamp + np.cumsum(columns.pop("timestamp_delta"))) / 1000,
+              "counter": counter + np.cumsum(columns.pop("counter_delta"))}
+    result.update(columns)
+    return result
@@ -0,0 +1,128 @@
+import collections
+
+import numpy as np
+
+import PyKinectV2
+from PyKinectRuntime import KINECT_MAX_BODY_COUNT
+
+
+class MotionGate(object):
+    """
+    This class decides which body frames are stored in adaptive recording mode.
+
+    The speed of all joints of all tracked bodies is calculated in one array step per frame.
+    While there is motion every frame is stored. When the motion stays below the threshold for
+    the hold time (post-roll), only one keyframe per keyframe interval is stored. The frames
+    of the last pre-roll time are kept in a buffer and stored as soon as motion starts again,
+    so the start of a motion is never cut.
+
+    The gate does not know what a frame contains, update gets an opaque item per frame and
+    returns the items that are stored, in order.
+    """
+
+    def __init__(self, threshold=0.3, hold_ms=1000, pre_roll_ms=500, keyframe_ms=1000, body_count=KINECT_MAX_BODY_COUNT):
+        """
+        :param threshold: joint speed in m/s above which a body is moving
+        :param hold_ms: time without motion before recording drops to keyframes (post-roll)
+        :param pre_roll_ms: time before the start of a motion that is stored as well
+        :param keyframe_ms: time between two keyframes while there is no motion
+        :param body_count: number of bodies in a body frame
+        """
+        self.threshold = threshold
+        self.hold_ms = hold_ms
+        self.pre_roll_ms = pre_roll_ms
+        self.keyframe_ms = keyframe_ms
+
+        self._positions = np.full((body_count, PyKinectV2.JointType_Count, 3), np.nan, dtype=np.float32)
+        self._ids = np.full(body_count, -1, dtype=np.int64)
+        self._timestamp = None
+        self._last_motion = None # timestamp of the last frame with motion
+        self._last_stored = None # timestamp of the last stored frame
+        self._pre_roll = collections.deque() # (timestamp, item) of not stored frames
+
+        self.stored = 0 # number of stored frames
+        self.skipped = 0 # number of frames that were not stored
+
+    @property
+    def moving(self):
+        """
+        True while frames are stored completely, False while only keyframes are stored
+        """
+        return self._last_motion is not None and self._timestamp - self._last_motion < self.hold_ms
+
+    def speeds(self, positions, tracked, timestamp, tracking_ids=None):
+        """
+        Maximal joint speed of every body since the previous frame
+
+        :param positions: joint positions (bodies, JointType_Count, 3)
+        :param tracked: bool array (bodies,) which bodies are tracked
+        :param timestamp: unix timestamp in ms of the frame
+        :param tracking_ids: optional, tracking_id of every body, a new id counts as new body
+        :return: float array (bodies,), inf for bodies that are new, NaN for untracked bodies
+        """
+        tracked = np.asarray(tracked, dtype=bool)
+        new = tracked & np.isnan(self._positions[:, 0, 0])
+        if tracking_ids is not None:
+            tracking_ids = np.asarray(tracking_ids, dtype=np.int64)
+            new |= tracked & (self._ids != tracking_ids)
+            self._ids[:] = tracking_ids
+
+        dt = 1.0 if self._timestamp is None else max(timestamp - self._timestamp, 1) / 1000.0
+        # fmax ignores NaN of joints without position, bodies without any position stay NaN
+        speed = np.sqrt(np.fmax.reduce(np.sum((positions - self._positions) ** 2, axis=2), axis=1)) / dt
+        speed[new] = np.inf
+        speed[~tracked] = np.nan
+
+        self._positions[:] = np.where(tracked.reshape(-1, 1, 1), positions, np.nan)
+        return speed
+
+    def update(self, positions, tracked, timestamp, item, tracking_ids=None):
+        """
+        Process one body frame
+
+        :param positions: joint positions (bodies, JointType_Count, 3)
+        :param tracked: bool array (bodies,) which bodies are tracked
+        :param timestamp: unix timestamp in ms of the frame
+        :param item: data of the frame, returned when the frame is stored
+        :param tracking_ids: optional, tracking_id of every body
+        :return: list of items to store now, oldest first (pre-roll followed by this frame)
+        """
+        speed = self.speeds(positions, tracked, timestamp, tracking_ids)
+        self._timestamp = timestamp
+        with np.errstate(invalid='ignore'):
+            if (speed > self.threshold).any():
+                self._last_motion = timestamp
+
+        if self.moving:
+            self._trim(timestamp) # frames can be older than the pre-roll after a time without bodies
+            stored = [buffered for _, buffered in self._pre_roll] + [item] # motion onset gets the pre-roll
+            self._pre_roll.clear()
+        elif self._last_stored is None or timestamp - self._last_stored >= self.keyframe_ms:
+            stored = [item] # keyframe, frames before it are not needed as pre-roll anymore
+            self.skipped += len(self._pre_roll)
+            self._pre_roll.clear()
+        else:
+            self._pre_roll.append((timestamp, item))
+            self._trim(timestamp)
+            return []
+
+        self._last_stored = timestamp
+        self.stored += len(stored)
+        return stored
+
+    def _trim(self, timestamp):
+        # drop buffered frames older than the pre-roll time
+        while self._pre_roll and self._pre_roll[0][0] < timestamp - self.pre_roll_ms:
+            self._pre_roll.popleft()
+            self.skipped += 1
+
+    def reset(self):
+        """
+        Forget previous positions and the pre-roll buffer, e.g. for a new recording
+        """
+        self._positions[:] = np.nan
+        self._ids[:] = -1
+        self._timestamp = None
+        self._last_motion = None
+        self._last_stored = None
+        self._pre_roll.clear()
@@ -0,0 +1,195 @@
+import collections
+
+import numpy as np
+import pandas as pd
+
+# columns of the gap table: counter of the first missing packet, number of missing packets,
+# number of them that arrived later (reordered), sensor times around the gap, receive time after it
+GAP_COLUMNS = ["first_counter", "lost", "recovered", "sensor_time_before", "sensor_time_after", "host_time"]
+
+
+class GapDetector(object):
+    """
+    This class checks the packet counter of the fused packets of one sensor while they are received.
+
+    Every packet is checked against the previous counter in O(1): the next counter is expected,
+    a larger counter is a gap, a smaller counter is either a packet of one of the latest gaps
+    that arrives late (reordered) or a duplicate. Late packets are only searched in the first
+    window packets of a gap, so the bit mask of arrived packets stays small. A counter far
+    below the previous one, or a run of consecutive counters below it with sensor times after
+    the previous packet (short restart), is a restart of the sensor, counting continues from
+    the new counter. Old packets that are sent again keep their old sensor times, so they stay
+    duplicates.
+
+    Loss is also counted in windows of expected packets, callbacks are notified at the end of a
+    window in which the loss exceeded the threshold.
+    """
+
+    def __init__(self, threshold=0.01, window=500, recent_gaps=16, restart=1000, restart_run=8, modulo=None):
+        """
+        :param threshold: fraction of lost packets in a window above which the callbacks are called
+        :param window: number of expected packets per window
+        :param recent_gaps: number of latest gaps that late packets are searched in
+        :param restart: a counter that is this much below the previous counter is a restart
+        :param restart_run: this many consecutive counters below the previous counter, that are not
+            in a gap and have ascending sensor times after the previous packet, are a restart
+            (instead of duplicates)
+        :param modulo: optional, counter wraps around at this value, e.g. 1 << 16
+        """
+        self.threshold = threshold
+        self.window = window
+        self.restart = restart
+        self.restart_run = restart_run
+        self.modulo = modulo
+        self.callbacks = []
+
+        self.received = 0
+        self.lost = 0 # packets missing now, reordered packets are not counted
+        self.duplicated = 0
+        self.reordered = 0
+        self.restarts = 0
+        self.gaps = [] # rows of the gap table, see GAP_COLUMNS
+        self._recent = collections.deque(maxlen=recent_gaps) # [gap, bit mask of arrived packets] of the latest gaps
+        self._last = None # previous counter
+        self._last_time = None # sensor time of the previous packet
+        self._run = 0 # consecutive counters below the previous counter, counted as duplicates so far
+        self._run_last = None # latest counter of that run
+        self._run_time = None # sensor time of that counter
+        self._window_received = 0
+        self._window_lost = 0
+
+    def register_callback(self, callback):
+        """
+        :param callback: Callable, gets a dict with lost, expected, ratio, counter and host_time
+            of every window with too much loss
+        """
+        self.callbacks.append(callback)
+
+    def _difference(self, counter):
+        difference = counter - self._last
+        if self.modulo is not None:
+            difference = (difference + self.modulo // 2) % self.modulo - self.modulo // 2
+        return difference
+
+    def update(self, counter, sensor_time, host_time):
+        """
+        Check one packet
+
+        :param counter: packet counter of the packet
+        :param sensor_time: timestamp of the sensor in seconds
+        :param host_time: receive time in seconds
+        """
+        counter = int(counter)
+        self.received += 1
+        self._window_received += 1
+        if self._last is None:
+            self._last, self._last_time = counter, sensor_time
+            return
+
+        difference = self._difference(counter)
+        if difference >= 1 or difference < -self.restart:
+            self._run = 0
+        if difference == 1:
+            pass
+        elif difference > 1:
+            first = self._last + 1 if self.modulo is None else (self._last + 1) % self.modulo
+            gap = [first, difference - 1, 0, self._last_time, sensor_time, host_time]
+            self.gaps.append(gap)
+            self._recent.append([gap, 0])
+            self.lost += difference - 1
+            self._window_lost += difference - 1
+        elif difference < -self.restart:
+            self.restarts += 1
+        else:
+            self.received -= 1 # not a new packet
+            self._window_received -= 1
+            for recent in self._recent:
+                gap, arrived = recent
+                offset = counter - gap[0] if self.modulo is None else (counter - gap[0]) % self.modulo
+                if 0 <= offset < min(gap[1], self.window) and not arrived >> offset & 1:
+                    recent[1] = arrived | 1 << offset
+                    gap[2] += 1
+                    self.lost -= 1
+                    self.reordered += 1
+                    self.received += 1
+                    return
+            if self._last_time is None or not sensor_time > self._last_time:
+                self._run = 0 # old packet sent again
+                self.duplicated += 1
+                return
+            following = self._run and sensor_time > self._run_time and \
+                counter == (self._run_last + 1 if self.modulo is None else (self._run_last + 1) % self.modulo)
+            self._run = self._run + 1 if following else 1
+            self._run_last, self._run_time = counter, sensor_time
+            if self._run < self.restart_run:
+                self.duplicated += 1
+                return
+            # short restart: the run was new packets, continue from its end
+            self.restarts += 1
+            self.duplicated -= self._run - 1
+            self.received += self._run
+            self._window_received += self._run
+            self._run = 0
+            self._recent.clear()
+        self._last, self._last_time = counter, sensor_time
+        if self._window_received + self._window_lost >= self.window:
+            self._end_window(counter, host_time)
+
+    def update_batch(self, counters, sensor_times, host_time):
+        """
+        Check the packets of a batch message, in one array step if there is no gap
+
+        :param counters: numpy array of the packet counters
+        :param sensor_times: numpy array of the sensor times in seconds
+        :param host_time: receive time of the message in seconds
+        """
+        counters = np.asarray(counters, dtype=np.int64)
+        if self._last is not None and len(counters) and self.modulo is None and \
+                counters[0] == self._last + 1 and (np.diff(counters) == 1).all():
+            self.received += len(counters)
+            self._window_received += len(counters)
+            self._run = 0
+            self._last, self._last_time = int(counters[-1]), float(sensor_times[-1])
+            if self._window_received + self._window_lost >= self.window:
+                self._end_window(self._last, host_time)
+            return
+        for counter, sensor_time in zip(counters.tolist(), np.asarray(sensor_times).tolist()):
+            self.update(counter, sensor_time, host_time)
+
+    def _end_window(self, counter, host_time):
+        expected = self._window_received + self._window_lost
+        ratio = float(self._window_lost) / expected
+        if ratio > self.threshold:
+            event = {"lost": self._window_lost, "expected": expected, "ratio": ratio, "counter": counter,
+                     "host_time": host_time}
+            for callback in self.callbacks:
+                callback(event)
+        self._window_received = self._window_lost = 0
+
+    def summary(self):
+        """
+        :return: dict with the numbers of received, lost, duplicated and reordered packets, restarts
+            and gaps
+        """
+        return {"received": self.received, "lost": self.lost, "duplicated": self.duplicated,
+                "reordered": self.reordered, "restarts": self.restarts, "gaps": len(self.gaps)}
+
+    def dataframe(self):
+        """
+        :return: gap table as DataFrame, one row per gap, columns GAP_COLUMNS
+        """
+        return pd.DataFrame(self.gaps, columns=GAP_COLUMNS)
+
+    def save(self, session, name="imu-gaps.csv"):
+        """
+        Save the gap table into the session and the summary as imu_packets in its metadata
+
+        :param session: RecordingSession
+        :param name: file name of the gap table
+        """
+        path = session.file(name)
+        if path is None:
+            return
+        with open(path, "w") as fh:
+            self.dataframe().to_csv(fh)
+        session.update_metadata({"imu_packets": self.summary()})
@@ -0,0 +1,294 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# from this number of POIs on, nearest/radius queries use a KD-tree instead of brute force
+KDTREE_MIN_POIS = 200
+
+DEFAULT_RADIUS = 0.05 # radius of POI in meters, if not set in config
+DEFAULT_DRAW_SIZE = 25 # size of drawn POI in pixels, if not set in config
+
+# columns of POI rows
+POI_COLUMNS = ['key', 'point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp']
+
+# columns of distances between wrist and POIs, one row per sample and POI ("long" format)
+DISTANCE_COLUMNS = ['counter', 'tracking_id', 'key', 'distance', 'timestamp']
+
+
+class POIEngine(object):
+    """
+    This class keeps the positions of points-of-interest (POI) in a numpy array and calculates
+    distances between joints and POIs for all tracked bodies in one vectorized step.
+
+    POIs are identified by their key (e.g. '1' for the first tire). Setting a POI with an existing
+    key overwrites its position.
+    """
+
+    def __init__(self):
+        """
+        Create an empty engine
+        """
+        self.keys = [] # key of POI in row i of self.positions
+        self._index = {} # key -> row in self.positions
+        self.positions = np.empty((0, 3), dtype=np.float32) # camera space positions of all POIs
+
+        self._tree = None # KD-tree over self.positions, built lazily if there are many POIs
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set_poi(self, key, position):
+        """
+        Set position of POI, overwrites old position if key is already used
+
+        :param key: key of POI
+        :param position: camera space position (x, y, z)
+        """
+        row = self._index.get(key)
+        if row is None:
+            self._index[key] = len(self.keys)
+            self.keys.append(key)
+            self.positions = np.vstack((self.positions, np.asarray(position, dtype=np.float32).reshape(1, 3)))
+        else:
+            self.positions[row] = position
+        self._tree = None
+
+    def remove_poi(self, key):
+        """
+        Remove POI with given key
+
+        :param key: key of POI
+        """
+        row = self._index.pop(key)
+        del self.keys[row]
+        self.positions = np.delete(self.positions, row, axis=0)
+        self._index = {k: i for i, k in enumerate(self.keys)}
+        self._tree = None
+
+    def distances(self, joints):
+        """
+        Calculate distances between joints and all POIs
+
+        :param joints: array of joint positions (..., 3), e.g. (bodies, joints, 3) from
+            KinectBodyFrameData.joint_positions
+        :return: array of euclidean distances (..., number of POIs)
+        """
+        diff = np.asarray(joints, dtype=np.float32)[..., np.newaxis, :] - self.positions
+        return np.sqrt(np.einsum('...i,...i->...', diff, diff))
+
+    def _kdtree(self):
+        """
+        KD-tree over POI positions, or None if there are too few POIs or scipy is not installed
+        """
+        if len(self.keys) < KDTREE_MIN_POIS:
+            return None
+        if self._tree is None:
+            try:
+                from scipy.spatial import cKDTree
+            except ImportError:
+                return None
+            self._tree = cKDTree(self.positions)
+        return self._tree
+
+    def k_nearest(self, joints, k):
+        """
+        Find the k nearest POIs for every joint position
+
+        :param joints: array of joint positions (..., 3)
+        :param k: number of POIs to return, at most the number of POIs
+        :return: tuple (indices, distances) each of shape (..., k), sorted by distance,
+            indices are rows in self.positions / self.keys
+        """
+        joints = np.asarray(joints, dtype=np.float32)
+        k = min(k, len(self.keys))
+        if k == 0:
+            empty = np.empty(joints.shape[:-1] + (0,))
+            return empty.astype(np.intp), empty
+
+        tree = self._kdtree()
+        if tree is not None:
+            flat = joints.reshape(-1, 3)
+            valid = np.isfinite(flat).all(axis=1)
+            dist = np.full((len(flat), k), np.inf)
+            idx = np.zeros((len(flat), k), dtype=np.intp)
+            if valid.any():
+                d, i = tree.query(flat[valid], k=k)
+                dist[valid] = np.asarray(d).reshape(-1, k)
+                idx[valid] = np.asarray(i).reshape(-1, k)
+            return idx.reshape(joints.shape[:-1] + (k,)), dist.reshape(joints.shape[:-1] + (k,))
+
+        dist = self.distances(joints)
+        dist = np.where(np.isnan(dist), np.inf, dist)
+        if k < dist.shape[-1]:
+            idx = np.argpartition(dist, k - 1, axis=-1)[..., :k]
+        else:
+            idx = np.broadcast_to(np.arange(dist.shape[-1]), dist.shape).copy()
+        part = np.take_along_axis(dist, idx, axis=-1)
+        order = np.argsort(part, axis=-1)
+        return np.take_along_axis(idx, order, axis=-1), np.take_along_axis(part, order, axis=-1)
+
+    def nearest(self, joints):
+        """
+        Find the nearest POI for every joint position
+
+        :param joints: array of joint positions (..., 3)
+        :return: tuple (indices, distances) each of shape (...)
+        """
+        idx, dist = self.k_nearest(joints, 1)
+        return idx[..., 0], dist[..., 0]
+
+    def within_radius(self, joints, radius):
+        """
+        Find all POIs within radius of the joint positions
+
+        :param joints: array of joint positions (..., 3)
+        :param radius: radius in meters, single value or one per POI
+        :return: bool array (..., number of POIs), True if POI is within radius
+        """
+        radius = np.asarray(radius, dtype=np.float32)
+        tree = self._kdtree()
+        if tree is not None and radius.ndim == 0:
+            joints = np.asarray(joints, dtype=np.float32)
+            flat = joints.reshape(-1, 3)
+            result = np.zeros((len(flat), len(self.keys)), dtype=bool)
+            rows = np.flatnonzero(np.isfinite(flat).all(axis=1))
+            for row, hits in zip(rows, tree.query_ball_point(flat[rows], float(radius))):
+                result[row, hits] = True
+            return result.reshape(joints.shape[:-1] + (len(self.keys),))
+        return self.distances(joints) <= radius
+
+
+def load_poi_config(path):
+    """
+    Load POI categories from a JSON config file, see poi_config.json for an example.
+    Each category has a list of keys that place its POIs, a shape for drawing ("circle" or
+    "rectangle"), a radius in meters and a draw size in pixels.
+
+    :param path: path of the JSON file
+    :return: dict of category name -> category settings
+    """
+    with open(path) as fh:
+        config = json.load(fh)
+
+    categories = {}
+    for name, category in config["categories"].items():
+        categories[name] = {
+            "keys": [str(key) for key in category["keys"]],
+            "shape": category.get("shape", "circle"),
+            "radius": float(category.get("radius", DEFAULT_RADIUS)),
+            "draw_size": int(category.get("draw_size", DEFAULT_DRAW_SIZE))}
+    return categories
+
+
+class POIRegistry(object):
+    """
+    This class manages POIs of arbitrary categories, which are placed by key presses.
+
+    The current POI of each key is kept in a dict, so setting a POI is O(1) independent of the
+    number of POIs, and all placements are kept in a history. The positions are mirrored into a
+    POIEngine for distance calculations.
+    """
+
+    def __init__(self, categories):
+        """
+        Create the registry
+
+        :param categories: dict of category name -> settings, as returned by load_poi_config
+        """
+        self.categories = categories
+        self.key_map = {} # key -> category name
+        for name, category in categories.items():
+            for key in category["keys"]:
+                self.key_map[key] = name
+
+        # info: columns of POI rows = POI_COLUMNS
+        self.current = {} # key -> latest POI row, if "tire 2" is reset, old position will be overwritten
+        self.history = [] # all POI rows through time, no position overwritten when reset
+
+        self.engine = POIEngine()
+        self._radii = np.empty(0, dtype=np.float32)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Create the registry from a JSON config file
+
+        :param path: path of the JSON file
+        """
+        return cls(load_poi_config(path))
+
+    def category_of(self, key):
+        """
+        :param key: key that was pressed
+        :return: name of category the key places a POI for, None if key is not mapped
+        """
+        return self.key_map.get(key)
+
+    def set_poi(self, key, point, position, counter, timestamp):
+        """
+        Set POI of key to a new position
+
+        :param key: key of POI, has to be mapped to a category
+        :param point: color space point (x, y), used for drawing
+        :param position: camera space position (x, y, z)
+        :param counter: sample counter when POI was set
+        :param timestamp: unix timestamp in ms when POI was set
+        :return: the POI row
+        """
+        row = (key, point[0], point[1], position[0], position[1], position[2], counter, timestamp)
+        if key not in self.current: # new POI is appended to the engine, keep radii in same order
+            self._radii = np.append(self._radii, np.float32(self.radius(key)))
+        self.current[key] = row
+        self.history.append(row)
+        self.engine.set_poi(key, position)
+        return row
+
+    def radius(self, key):
+        """
+        :param key: key of POI
+        :return: radius of the POI in meters
+        """
+        return self.categories[self.key_map[key]]["radius"]
+
+    @property
+    def radii(self):
+        """
+        radius of every POI in meters, in order of self.engine.keys
+        """
+        return self._radii
+
+    def current_rows(self, category=None):
+        """
+        :param category: optional, only return POIs of this category
+        :return: list of current POI rows
+        """
+        return [row for key, row in self.current.items() if category is None or self.key_map[key] == category]
+
+    def history_rows(self, category=None):
+        """
+        :param category: optional, only return POIs of this category
+        :return: list of all POI rows through time
+        """
+        return [row for row in self.history if category is None or self.key_map[row[0]] == category]
+
+
+def distance_table(rows, distance_format="long", keys=None):
+    """
+    distances between wrist and POIs as DataFrame, valid for any number of POIs
+
+    :param rows: distance rows, columns = DISTANCE_COLUMNS
+    :param distance_format: "long" for columns = DISTANCE_COLUMNS, one row per sample and POI,
+        "wide" for one row per sample with columns distance_<key> for every key, missing
+        distances (POI not set yet) are NaN
+    :param keys: keys of the wide columns, in order, e.g. all keys of the POI config
+    """
+    distances = pd.DataFrame(rows, columns = DISTANCE_COLUMNS)
+    if distance_format != "wide":
+        return distances
+
+    wide = distances.pivot_table(index=['counter', 'tracking_id', 'timestamp'], columns='key', values='distance')
+    if keys is not None:
+        wide = wide.reindex(columns=keys)
+    wide.columns = ['distance_%s' % key for key in wide.columns]
+    return wide.reset_index()
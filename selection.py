@@ -0,0 +1,89 @@
+import numpy as np
+
+import PyKinectV2
+from tracks import JOINT_NAMES
+
+# tables (csv-files) of a session that can be switched off
+TABLES = ('full', # kin-sample-full.csv, all recorded joints, with orientations and tracking states if recorded
+          'hand', # kin-sample-hand.csv, WristRight
+          'hand_points', # kin-sample-hand-points.csv, HandTipRight with color space point
+          'hand_states', # kin-sample-hand-states.csv, open/closed state of both hands
+          'positions', # POI tables, current and all positions
+          'distances', # kin-sample-distances_all.csv
+          'zone_events', # kin-sample-zone-events.csv
+          'predictions', # kin-sample-predictions.csv, if a classifier is used
+          'targets') # targets.csv
+
+# joints that are always recorded, HandTipRight is needed for positioning of POI
+REQUIRED_JOINTS = (PyKinectV2.JointType_HandTipRight,)
+
+
+class RecordingSelection(object):
+    """
+    This class describes what is recorded: a subset of joints, optional per-body data and the
+    tables that are saved.
+
+    The selection is compiled once into an index array of joint types, so the recorded joints
+    of all bodies are extracted from a body frame with a single numpy gather.
+    """
+
+    def __init__(self, joints=None, hand_states=False, orientations=False, tracking_states=False, tables=None):
+        """
+        Create and compile the selection
+
+        :param joints: names of recorded joints (see tracks.JOINT_NAMES), None for all joints,
+            REQUIRED_JOINTS are always added
+        :param hand_states: True to record open/closed state of both hands
+        :param orientations: True to record the orientations (quaternions) of the recorded joints
+        :param tracking_states: True to record the tracking states of the recorded joints
+        :param tables: names of saved tables (see TABLES), None for all tables
+        """
+        names = JOINT_NAMES if joints is None else joints
+        unknown = [name for name in names if name not in JOINT_NAMES]
+        if unknown:
+            raise ValueError("Unknown joints: {}".format(", ".join(unknown)))
+        index = set(JOINT_NAMES.index(name) for name in names) | set(REQUIRED_JOINTS)
+        self.joints = np.array(sorted(index), dtype=np.intp) # recorded joint types, in order of the columns
+
+        self.hand_states = hand_states
+        self.orientations = orientations
+        self.tracking_states = tracking_states
+
+        self.tables = frozenset(TABLES if tables is None else tables)
+        unknown = self.tables - set(TABLES)
+        if unknown:
+            raise ValueError("Unknown tables: {}".format(", ".join(sorted(unknown))))
+
+    def columns(self):
+        """
+        :return: layout of the track columns for this selection, dict of column name -> (shape, dtype)
+        """
+        columns = {
+            'frame': ((), np.int64),
+            'timestamp': ((), np.int64),
+            'positions': ((len(self.joints), 3), np.float32),
+            'hand_tip_point': ((2,), np.float32)}
+        if self.orientations:
+            columns['orientations'] = ((len(self.joints), 4), np.float32) # x, y, z, w
+        if self.tracking_states:
+            columns['tracking_states'] = ((len(self.joints),), np.uint8) # TrackingState_*
+        if self.hand_states:
+            columns['hand_states'] = ((2,), np.uint8) # left, right: HandState_*
+        return columns
+
+    def gather(self, positions):
+        """
+        Extract the recorded joints of all bodies
+
+        :param positions: per-joint values of all bodies (bodies, JointType_Count, ...), e.g. positions,
+            orientations or tracking states
+        :return: values of the recorded joints (bodies, recorded joints, ...)
+        """
+        return positions[:, self.joints]
+
+    def saves(self, table):
+        """
+        :param table: name of the table, one of TABLES
+        :return: True if the table is saved
+        """
+        return table in self.tables
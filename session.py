@@ -0,0 +1,175 @@
+import copy
+import datetime
+import json
+import os
+
+import PyKinectV2
+
+# streams of the Kinect that can be selected in a profile
+STREAMS = {
+    "color": PyKinectV2.FrameSourceTypes_Color,
+    "depth": PyKinectV2.FrameSourceTypes_Depth,
+    "infrared": PyKinectV2.FrameSourceTypes_Infrared,
+    "body_index": PyKinectV2.FrameSourceTypes_BodyIndex,
+    "body": PyKinectV2.FrameSourceTypes_Body}
+
+# settings of a recording, every profile overrides some of them
+DEFAULT_PROFILE = {
+    "streams": ["color", "body"], # Kinect streams that are opened
+    "capture": "thread", # "process" to capture in a separate process, independent of the window
+    "export": None, # prefix of shared memory rings the frames are exported to, e.g. "kinect"
+    "output": "csv", # "csv" to save the recording, "none" for testruns without files
+    "preview_rate": 60, # frames per second of the main loop and the preview window
+    "headless": False, # True to record without window (no key input, POIs cannot be set)
+    "joints": None, # names of recorded joints, None for all joints
+    "hand_states": False, # record open/closed state of both hands
+    "orientations": False, # record joint orientations (quaternions)
+    "tracking_states": False, # record joint tracking states (tracked/inferred)
+    "tables": None, # names of saved tables (see selection.TABLES), None for all tables
+    "poi_config": "poi_config.json", # POI categories and keys, relative to this directory
+    "duration": None, # seconds after which the recording stops, None to stop by closing the window
+    "distance_format": "long",
+    "joint_filter": None,
+    "motion_gate": None, # parameters of motion.MotionGate to store only keyframes while nobody moves
+    "zone_address": None,
+    "skeleton_address": None, # PUB socket for live body frames, e.g. "tcp://*:5557"
+    "classifier": None,
+    "classifier_window": 30,
+    "wal": True} # write-ahead log for crash recovery
+
+# metadata of a session (e.g. estimated IMU clock offset), JSON in the session directory
+METADATA_FILE = "session.json"
+
+DEFAULT_PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles.json")
+
+
+def load_profiles(path=DEFAULT_PROFILES_FILE):
+    """
+    Load recording profiles from a JSON file, see profiles.json.
+    Every profile only lists the settings that differ from DEFAULT_PROFILE.
+
+    :param path: path of the JSON file
+    :return: dict of profile name -> complete settings
+    """
+    with open(path) as fh:
+        profiles = json.load(fh)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    result = {"default": copy.deepcopy(DEFAULT_PROFILE)}
+    for name, settings in profiles.items():
+        unknown = set(settings) - set(DEFAULT_PROFILE)
+        if unknown:
+            raise ValueError("Profile {} has unknown settings: {}".format(name, ", ".join(sorted(unknown))))
+        profile = copy.deepcopy(DEFAULT_PROFILE)
+        profile.update(settings)
+        result[name] = profile
+
+    for profile in result.values():
+        if not os.path.isabs(profile["poi_config"]):
+            profile["poi_config"] = os.path.join(base_dir, profile["poi_config"])
+    return result
+
+
+def frame_source_types(streams):
+    """
+    :param streams: names of streams, keys of STREAMS
+    :return: FrameSourceTypes flags for PyKinectRuntime
+    """
+    flags = 0
+    for stream in streams:
+        flags |= STREAMS[stream]
+    return flags
+
+
+class RecordingSession(object):
+    """
+    This class describes where one recording is saved.
+
+    Every session gets its own directory recordings/sample-<timestamp>, which is created by
+    start. A session with save=False (profile output "none") writes no files at all.
+    """
+
+    def __init__(self, base_dir="recordings", name=None, save=True):
+        """
+        Create the session
+
+        :param base_dir: directory that contains all recordings
+        :param name: name of the session directory, default sample-<timestamp>
+        :param save: False for testruns, that should not produce files
+        """
+        self.base_dir = base_dir
+        self.name = name or "sample-{}".format(datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
+        self.save = save
+
+        # several sessions started within one second (batch recordings) get a suffix
+        suffix = 1
+        name = self.name
+        while self.save and os.path.exists(os.path.join(base_dir, self.name)):
+            suffix += 1
+            self.name = "{}-{}".format(name, suffix)
+        self.path = os.path.join(base_dir, self.name)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Session of an existing recording, e.g. for analysis after the recording
+
+        :param path: session directory
+        :return: RecordingSession that saves into this directory
+        """
+        session = cls.__new__(cls)
+        session.base_dir, session.name = os.path.split(os.path.normpath(path))
+        session.save = True
+        session.path = path
+        return session
+
+    def start(self):
+        """
+        Create directory of the session and its plot directory
+        """
+        if self.save:
+            os.makedirs(os.path.join(self.path, "plots"))
+
+    def file(self, name):
+        """
+        :param name: file name within the session, e.g. kin-sample-full.csv
+        :return: path of the file, None if the session does not save
+        """
+        if not self.save:
+            return None
+        return os.path.join(self.path, name)
+
+    def metadata(self):
+        """
+        :return: dict of the metadata saved with update_metadata, empty if there is none
+        """
+        path = self.file(METADATA_FILE)
+        if path is None or not os.path.exists(path):
+            return {}
+        with open(path) as fh:
+            return json.load(fh)
+
+    def update_metadata(self, values):
+        """
+        Add values to the metadata of the session, existing keys are replaced
+
+        :param values: dict that can be saved as JSON
+        """
+        if not self.save:
+            return
+        metadata = self.metadata()
+        metadata.update(values)
+        with open(self.file(METADATA_FILE), "w") as fh:
+            json.dump(metadata, fh, indent=2)
+
+    def register(self):
+        """
+        Add session to the list of sessions and to the notes of all recordings
+        """
+        if not self.save:
+            return
+        with open(os.path.join(self.base_dir, "session_names.csv"), "a") as fh_samples:
+            fh_samples.write(',' + self.name)
+
+        with open(os.path.join(self.base_dir, "notes.csv"), "a", newline='') as fh_notes:
+            fh_notes.write('\n' + self.name + ': ')
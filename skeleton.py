@@ -0,0 +1,271 @@
+import asyncio
+import collections
+import inspect
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+import zmq
+
+import PyKinectV2
+
+# every message: magic, version, number of bodies, sequence number, unix timestamp in ms,
+# followed by one BODY_DTYPE record per tracked body
+MAGIC = b"KS"
+VERSION = 1
+HEADER = struct.Struct("<2sBBQq")
+# one tracked body: tracking_id, camera space positions and tracking states of all joints (333 bytes)
+BODY_DTYPE = np.dtype([
+    ('tracking_id', '<u8'),
+    ('positions', '<f4', (PyKinectV2.JointType_Count, 3)),
+    ('tracking_states', 'u1', (PyKinectV2.JointType_Count,))])
+
+# decoded message, tracking_ids (bodies,), positions (bodies, JointType_Count, 3), tracking_states (bodies, JointType_Count)
+SkeletonFrame = collections.namedtuple('SkeletonFrame', ['sequence', 'timestamp', 'tracking_ids', 'positions', 'tracking_states'])
+
+
+def encode(sequence, timestamp, tracking_ids, positions, tracking_states=None):
+    """
+    Encode the tracked bodies of one body frame
+
+    :param sequence: sequence number of the message
+    :param timestamp: unix timestamp in ms of the frame
+    :param tracking_ids: tracking_id of every tracked body (bodies,)
+    :param positions: joint positions of the tracked bodies (bodies, JointType_Count, 3)
+    :param tracking_states: optional, TrackingState_* of the joints (bodies, JointType_Count), default tracked
+    :return: bytes, HEADER.size + 333 bytes per body
+    """
+    bodies = np.empty(len(tracking_ids), dtype=BODY_DTYPE)
+    bodies['tracking_id'] = tracking_ids
+    bodies['positions'] = positions
+    bodies['tracking_states'] = PyKinectV2.TrackingState_Tracked if tracking_states is None else tracking_states
+    return HEADER.pack(MAGIC, VERSION, len(bodies), sequence, timestamp) + bodies.tobytes()
+
+
+def decode(msg):
+    """
+    Decode a message without copying, the arrays are views of the message
+
+    :param msg: bytes of one message
+    :return: SkeletonFrame
+    """
+    magic, version, count, sequence, timestamp = HEADER.unpack_from(msg)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a skeleton message of version {}".format(VERSION))
+    bodies = np.frombuffer(msg, dtype=BODY_DTYPE, count=count, offset=HEADER.size)
+    return SkeletonFrame(sequence, timestamp, bodies['tracking_id'], bodies['positions'], bodies['tracking_states'])
+
+
+class SkeletonPublisher(object):
+    """
+    This class publishes the tracked bodies of every body frame on a PUB socket, one binary
+    message per frame (see encode). Messages are dropped instead of blocking the recording if
+    the subscribers are too slow.
+    """
+
+    def __init__(self, address, bind=True):
+        """
+        :param address: address of the PUB socket (string, proto://host:port)
+        :param bind: True to bind the socket, False to connect to a forwarder
+        """
+        self.socket = zmq.Context.instance().socket(zmq.PUB)
+        self.socket.setsockopt(zmq.SNDHWM, 60) # two seconds of frames
+        if bind:
+            self.socket.bind(address)
+        else:
+            self.socket.connect(address)
+        self.sequence = 0
+        self.dropped = 0
+
+    def publish(self, positions, tracked, tracking_ids, timestamp, tracking_states=None):
+        """
+        Publish one body frame
+
+        :param positions: joint positions of all bodies (bodies, JointType_Count, 3)
+        :param tracked: bool array (bodies,) which bodies are tracked
+        :param tracking_ids: tracking_id of every body (bodies,)
+        :param timestamp: unix timestamp in ms of the frame
+        :param tracking_states: optional, TrackingState_* of the joints of all bodies (bodies, JointType_Count)
+        """
+        tracked = np.asarray(tracked, dtype=bool)
+        # untracked bodies have tracking_id -1, only the ids of tracked bodies fit into uint64
+        ids = np.array([tracking_ids[i] for i in np.flatnonzero(tracked)], dtype=np.uint64)
+        msg = encode(self.sequence, timestamp, ids, positions[tracked],
+                     None if tracking_states is None else tracking_states[tracked])
+        self.sequence += 1
+        try:
+            self.socket.send(msg, zmq.NOBLOCK)
+        except zmq.Again:
+            self.dropped += 1
+
+    def close(self):
+        self.socket.close()
+
+
+class SkeletonSubscriber(object):
+    """
+    This class receives the body frames of a SkeletonPublisher, like listener.Listener for IMU data.
+
+    After the creation of the subscriber, start receiving by calling start, or call recv directly.
+    Callbacks get every frame as SkeletonFrame with numpy arrays. Missing sequence numbers are
+    counted in lost.
+    """
+
+    def __init__(self, address, bind=False, context=None):
+        """
+        :param address: address of the PUB socket (string, proto://host:port)
+        :param bind: True to bind the socket, False to connect to the publisher
+        :param context: optional, zmq context of the socket, default the shared instance
+        """
+        self.socket = (context if context is not None else zmq.Context.instance()).socket(zmq.SUB)
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"")
+        if bind:
+            self.socket.bind(address)
+        else:
+            self.socket.connect(address)
+        self.poller = zmq.Poller()
+        self.poller.register(self.socket, zmq.POLLIN)
+
+        self.callbacks = []
+        self.active = True
+        self.thread = None
+        self.received = 0
+        self.lost = 0
+        self._sequence = None
+
+    def register_callback(self, callback):
+        """
+        :param callback: Callable, gets every received SkeletonFrame
+        """
+        self.callbacks.append(callback)
+
+    def recv(self, timeout=None):
+        """
+        Receive and decode one frame
+
+        :param timeout: ms to wait at most, None to wait forever
+        :return: SkeletonFrame, None after timeout
+        """
+        if timeout is not None and not self.poller.poll(timeout):
+            return None
+        return self._decode(self.socket.recv(copy=False))
+
+    def _decode(self, msg):
+        # decode a received zmq.Frame and count the lost frames before it
+        frame = decode(msg.buffer)
+        if self._sequence is not None and frame.sequence > self._sequence + 1:
+            self.lost += frame.sequence - self._sequence - 1
+        self._sequence = frame.sequence
+        self.received += 1
+        return frame
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run)
+            self.thread.start()
+
+    def _run(self):
+        while self.active:
+            frame = self.recv(600)
+            if frame is not None:
+                for callback in self.callbacks:
+                    callback(frame)
+
+    def close(self):
+        """
+        Stop the receiving thread and close the socket
+        """
+        self.active = False
+        if self.thread is not None:
+            self.thread.join()
+        self.socket.close()
+
+
+class AsyncSkeletonSubscriber(SkeletonSubscriber):
+    """
+    This class receives the body frames of a SkeletonPublisher in an asyncio event loop
+    (zmq.asyncio), e.g. together with listener.AsyncListener in listener.run_all.
+
+    Iterate over frames, or register callbacks and call start or await run. Callbacks can be
+    coroutine functions, they are awaited before the next frame is received.
+    """
+
+    def __init__(self, address, bind=False, context=None):
+        """
+        :param address: address of the PUB socket (string, proto://host:port)
+        :param bind: True to bind the socket, False to connect to the publisher
+        :param context: optional, zmq.asyncio.Context, default the shared instance
+        """
+        import zmq.asyncio
+
+        super(AsyncSkeletonSubscriber, self).__init__(address, bind, context if context is not None else zmq.asyncio.Context.instance())
+        self.task = None
+
+    async def recv(self, timeout=None):
+        """
+        Receive and decode one frame
+
+        :param timeout: ms to wait at most, None to wait forever
+        :return: SkeletonFrame, None after timeout
+        """
+        if timeout is not None and not await self.socket.poll(timeout, zmq.POLLIN):
+            return None
+        return self._decode(await self.socket.recv(copy=False))
+
+    async def frames(self, timeout=600):
+        """
+        Receive until stop is called, callbacks are called for every frame
+
+        :param timeout: ms between two checks of stop
+        :return: async iterator of SkeletonFrame
+        """
+        while self.active:
+            frame = await self.recv(timeout)
+            if frame is None:
+                continue
+            for callback in self.callbacks:
+                result = callback(frame)
+                if inspect.isawaitable(result):
+                    await result
+            yield frame
+
+    async def run(self):
+        """
+        Receive and call the callbacks until stop is called
+        """
+        async for _ in self.frames():
+            pass
+
+    def start(self):
+        """
+        Run in a task of the running event loop
+        """
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        """
+        Stop receiving and close the socket
+        """
+        self.active = False
+        if self.task is not None:
+            self.task.cancel()
+        self.socket.close()
+
+
+if __name__ == "__main__":
+    # python skeleton.py tcp://host:5557: print frame rate and lost frames of a publisher
+    subscriber = SkeletonSubscriber(sys.argv[1] if len(sys.argv) > 1 else "tcp://localhost:5557")
+    start = time.time()
+    try:
+        while True:
+            frame = subscriber.recv()
+            print(frame.sequence, "bodies %d" % len(frame.tracking_ids), "lost %d" % subscriber.lost,
+                  "%.1f fps" % (subscriber.received / max(time.time() - start, 1e-3)))
+    except KeyboardInterrupt:
+        subscriber.close()
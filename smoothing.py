@@ -0,0 +1,152 @@
+import numpy as np
+
+import PyKinectV2
+from PyKinectRuntime import KINECT_MAX_BODY_COUNT
+
+
+def _per_joint(value):
+    """
+    parameter as array that broadcasts over (bodies, joints, 1), single value or one value per joint
+    """
+    value = np.asarray(value, dtype=np.float32)
+    if value.ndim == 0:
+        return value
+    return value.reshape(1, PyKinectV2.JointType_Count, 1)
+
+
+class JointFilter(object):
+    """
+    Base class of the joint filters. A filter smooths the positions of all joints of all bodies
+    with one array update per frame, and starts again from the raw position for bodies that lost
+    tracking or got a new tracking_id.
+    """
+
+    def __init__(self, body_count=KINECT_MAX_BODY_COUNT):
+        """
+        :param body_count: number of bodies in a body frame
+        """
+        shape = (body_count, PyKinectV2.JointType_Count, 3)
+        self._value = np.zeros(shape, dtype=np.float32) # filtered positions
+        self._active = np.zeros(body_count, dtype=bool) # filter state of body is valid
+        self._ids = np.full(body_count, -1, dtype=np.int64) # tracking_id the filter state belongs to
+        self._t = np.zeros(body_count, dtype=np.float64) # time of last update
+
+    def reset(self, bodies=None):
+        """
+        Forget the filter state
+
+        :param bodies: optional, bool mask or indices of bodies to reset, default all
+        """
+        if bodies is None:
+            self._active[:] = False
+        else:
+            self._active[bodies] = False
+
+    def update(self, positions, tracked, t, tracking_ids=None):
+        """
+        Filter the positions of one body frame
+
+        :param positions: joint positions (bodies, JointType_Count, 3), e.g. from KinectBodyFrameData.joint_positions
+        :param tracked: bool array (bodies,) which bodies are tracked
+        :param t: time of the frame in seconds
+        :param tracking_ids: optional, tracking_id of every body, a new id resets the body
+        :return: filtered positions (bodies, JointType_Count, 3), NaN for untracked bodies
+        """
+        tracked = np.asarray(tracked, dtype=bool)
+        if tracking_ids is not None:
+            tracking_ids = np.asarray(tracking_ids, dtype=np.int64)
+            self._active &= self._ids == tracking_ids
+            self._ids[:] = tracking_ids
+        self._active &= tracked # tracking loss resets the body
+
+        # all bodies are updated in one step, bodies without valid state are overwritten after
+        mask = tracked.reshape(-1, 1, 1)
+        dt = np.maximum(t - self._t, 1e-3).astype(np.float32).reshape(-1, 1, 1)
+        self._step(np.where(mask, positions, self._value), dt)
+
+        start = tracked & ~self._active # bodies that start with their raw position
+        if start.any():
+            self._value[start] = positions[start]
+            self._start(start)
+
+        self._active = tracked.copy()
+        self._t[tracked] = t
+        return np.where(mask, self._value, np.float32(np.nan))
+
+    def _start(self, bodies):
+        """
+        initialize filter state of bodies, their value is already set to the raw position
+        """
+        raise NotImplementedError
+
+    def _step(self, positions, dt):
+        """
+        update filter state and value of all bodies with new positions
+        """
+        raise NotImplementedError
+
+
+class OneEuroFilter(JointFilter):
+    """
+    One Euro filter (Casiez et al. 2012): a low-pass filter whose cutoff frequency rises with the
+    speed of the joint, so slow movements are smoothed strongly and fast movements lag little.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.5, d_cutoff=1.0, body_count=KINECT_MAX_BODY_COUNT):
+        """
+        :param min_cutoff: cutoff frequency in Hz at rest, single value or one per joint
+        :param beta: increase of cutoff frequency with speed, single value or one per joint
+        :param d_cutoff: cutoff frequency in Hz for the speed estimate
+        :param body_count: number of bodies in a body frame
+        """
+        JointFilter.__init__(self, body_count)
+        self.min_cutoff = _per_joint(min_cutoff)
+        self.beta = _per_joint(beta)
+        self.d_cutoff = np.float32(d_cutoff)
+        self._speed = np.zeros_like(self._value)
+
+    @staticmethod
+    def _alpha(dt, cutoff):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def _start(self, bodies):
+        self._speed[bodies] = 0
+
+    def _step(self, positions, dt):
+        delta = positions - self._value
+        self._speed += self._alpha(dt, self.d_cutoff) * (delta / dt - self._speed)
+        cutoff = self.min_cutoff + self.beta * np.sqrt(np.einsum('...i,...i->...', self._speed, self._speed))[..., np.newaxis]
+        self._value += self._alpha(dt, cutoff) * delta
+
+
+class DoubleExponentialFilter(JointFilter):
+    """
+    Holt double exponential filter: smooths position and trend, so it follows movements with
+    less lag than a simple exponential filter.
+    """
+
+    def __init__(self, smoothing=0.5, correction=0.5, body_count=KINECT_MAX_BODY_COUNT):
+        """
+        :param smoothing: 0..1, weight of the previous estimate, single value or one per joint
+        :param correction: 0..1, weight of the new trend, single value or one per joint
+        :param body_count: number of bodies in a body frame
+        """
+        JointFilter.__init__(self, body_count)
+        self.smoothing = _per_joint(smoothing)
+        self.correction = _per_joint(correction)
+        self._trend = np.zeros_like(self._value)
+
+    def _start(self, bodies):
+        self._trend[bodies] = 0
+
+    def _step(self, positions, dt):
+        value = (1 - self.smoothing) * positions + self.smoothing * (self._value + self._trend)
+        self._trend += self.correction * (value - self._value - self._trend)
+        self._value[...] = value
+
+
+# filters that can be selected by name
+FILTERS = {
+    "one_euro": OneEuroFilter,
+    "holt": DoubleExponentialFilter}
@@ -0,0 +1,213 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import PyKinectV2
+from session import RecordingSession
+
+# common sample rate of both signals in Hz, the offset is interpolated between samples
+SYNC_RATE = 100.0
+# window of the moving averages in seconds: smoothing of both signals, high-pass of the IMU axes
+SMOOTH_WINDOW = 0.1
+HIGHPASS_WINDOW = 1.0
+# correlation peaks closer than this to the best peak (seconds) are the same peak for the confidence
+PEAK_EXCLUSION = 0.5
+
+
+def _moving_average(values, window):
+    """
+    centered moving average along the first axis in O(n), window in samples
+    """
+    window = max(int(window), 1)
+    padded = np.concatenate([np.repeat(values[:1], window // 2, axis=0), values,
+                             np.repeat(values[-1:], window - 1 - window // 2, axis=0)])
+    cumsum = np.cumsum(padded, axis=0, dtype=np.float64)
+    cumsum = np.concatenate([np.zeros((1,) + values.shape[1:]), cumsum])
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def _resample(times, values, rate):
+    """
+    linear interpolation onto a grid with the given rate
+
+    :return: tuple (time of the first grid sample, resampled values)
+    """
+    grid = times[0] + np.arange(int((times[-1] - times[0]) * rate) + 1) / rate
+    return times[0], np.interp(grid, times, values)
+
+
+def _normalized(values):
+    values = values - values.mean()
+    std = values.std()
+    return values / std if std > 0 else values
+
+
+def kinect_activity(times, positions, rate=SYNC_RATE):
+    """
+    Acceleration magnitude of a joint trajectory on a regular grid
+
+    :param times: timestamps in seconds (samples,), ascending
+    :param positions: camera space positions in m (samples, 3), NaN for missing samples
+    :param rate: sample rate of the result in Hz
+    :return: tuple (time of the first sample, normalized acceleration magnitude)
+    """
+    valid = np.isfinite(positions).all(axis=1)
+    times, positions = times[valid], positions[valid]
+    times, unique = np.unique(times, return_index=True)
+    positions = positions[unique]
+    if len(times) < 3:
+        raise ValueError("Not enough samples of the joint")
+    # second derivative on the original, possibly irregular time stamps
+    acceleration = np.gradient(np.gradient(positions, times, axis=0), times, axis=0)
+    start, magnitude = _resample(times, np.linalg.norm(acceleration, axis=1), rate)
+    return start, _normalized(_moving_average(magnitude, SMOOTH_WINDOW * rate))
+
+
+def imu_activity(times, acc, rate=SYNC_RATE):
+    """
+    Magnitude of the linear acceleration of an IMU on a regular grid, gravity is removed by a
+    high-pass filter of the axes, as the orientation of the sensor is not known
+
+    :param times: timestamps in seconds (samples,), ascending
+    :param acc: acceleration (samples, 3), any unit
+    :param rate: sample rate of the result in Hz
+    :return: tuple (time of the first sample, normalized acceleration magnitude)
+    """
+    times, unique = np.unique(times, return_index=True)
+    acc = np.asarray(acc, dtype=np.float64)[unique]
+    if len(times) < 3:
+        raise ValueError("Not enough IMU samples")
+    axes = [_resample(times, acc[:, axis], rate)[1] for axis in range(3)]
+    resampled = np.stack(axes, axis=1)
+    linear = resampled - _moving_average(resampled, HIGHPASS_WINDOW * rate)
+    return times[0], _normalized(_moving_average(np.linalg.norm(linear, axis=1), SMOOTH_WINDOW * rate))
+
+
+def estimate_offset(kinect_times, positions, imu_times, imu_acc, rate=SYNC_RATE, max_offset=None):
+    """
+    Find the clock offset between a joint trajectory of the Kinect and the acceleration of an IMU
+    by cross-correlation of their acceleration magnitudes (computed with FFT)
+
+    :param kinect_times: timestamps of the joint in seconds (samples,)
+    :param positions: positions of the joint (samples, 3), e.g. WristRight with the IMU on the wrist
+    :param imu_times: timestamps of the IMU samples in seconds
+    :param imu_acc: acceleration of the IMU (samples, 3)
+    :param rate: common sample rate in Hz
+    :param max_offset: optional, largest offset in seconds that is searched
+    :return: dict with offset (seconds, kinect time = imu time + offset), correlation (normalized
+        height of the peak, up to 1) and confidence (0..1, 1 - second highest peak / peak)
+    """
+    kinect_start, x = kinect_activity(np.asarray(kinect_times, dtype=np.float64), np.asarray(positions, dtype=np.float64), rate)
+    imu_start, y = imu_activity(np.asarray(imu_times, dtype=np.float64), imu_acc, rate)
+
+    size = 1 << int(np.ceil(np.log2(len(x) + len(y))))
+    correlation = np.fft.irfft(np.fft.rfft(x, size) * np.conj(np.fft.rfft(y, size)), size)
+    correlation /= np.sqrt(np.dot(x, x) * np.dot(y, y)) or 1.0
+    # correlation[k]: kinect sample j + k matches imu sample j, negative lags wrap around
+    lags = np.arange(size)
+    lags[lags >= len(x)] -= size
+    offsets = kinect_start - imu_start + lags / rate
+    allowed = (lags > -len(y)) & (lags < len(x))
+    if max_offset is not None:
+        allowed &= np.abs(offsets) <= max_offset
+    if not allowed.any():
+        raise ValueError("No overlap of the signals within max_offset")
+
+    candidates = np.where(allowed, correlation, -np.inf)
+    best = int(np.argmax(candidates))
+    peak = correlation[best]
+    shift = 0.0
+    before, after = candidates[(best - 1) % size], candidates[(best + 1) % size]
+    if np.isfinite(before) and np.isfinite(after) and before - 2 * peak + after < 0:
+        shift = 0.5 * (before - after) / (before - 2 * peak + after) # parabola through the peak
+
+    others = candidates[np.abs(offsets - offsets[best]) > PEAK_EXCLUSION]
+    second = others.max() if len(others) and np.isfinite(others.max()) else 0.0
+    confidence = float(np.clip(1 - max(second, 0) / peak, 0, 1)) if peak > 0 else 0.0
+    return {"offset": float(offsets[best] + shift / rate), "correlation": float(peak), "confidence": confidence,
+            "rate": rate}
+
+
+def wrist_trajectory(tracks, joint=PyKinectV2.JointType_WristRight, tracking_id=None):
+    """
+    Trajectory of one joint of the Recorder, from the track with most samples
+
+    :param tracks: TrackStore of the Recorder (Recorder.tracks)
+    :param joint: joint type, has to be recorded
+    :param tracking_id: optional, tracking_id of the body with the IMU
+    :return: tuple (timestamps in seconds, positions (samples, 3))
+    """
+    if tracking_id is None:
+        if not tracks.tracks:
+            raise ValueError("No tracked bodies")
+        track = max(tracks.tracks.values(), key=len)
+    else:
+        track = tracks.track(tracking_id)
+    column = list(tracks.joints).index(joint)
+    return track.column('timestamp') / 1000.0, track.column('positions')[:, column, :]
+
+
+def imu_acceleration(listener, time_column="timestamp_sensor"):
+    """
+    Fused acceleration of the Listener
+
+    :param listener: Listener (or AsyncListener) that received the IMU
+    :param time_column: "timestamp_sensor" for the clock of the sensor, "timestamp" for receive times
+    :return: tuple (timestamps in seconds, acceleration (samples, 3))
+    """
+    columns = listener.get_recorded(["fused"], as_type="columns")["fused"]
+    return columns[time_column], np.stack([columns["acc_x"], columns["acc_y"], columns["acc_z"]], axis=1)
+
+
+def synchronize(recorder, listener, session=None, time_column="timestamp_sensor", max_offset=None):
+    """
+    Estimate the offset between the WristRight trajectory of the Recorder and the IMU of the
+    Listener, and save it as imu_offset in the session metadata
+
+    :param recorder: Recorder after the recording
+    :param listener: Listener of the IMU
+    :param session: optional, RecordingSession, default the session of the Recorder
+    :param time_column: IMU timestamps that are aligned, see imu_acceleration
+    :param max_offset: optional, largest offset in seconds that is searched
+    :return: result of estimate_offset
+    """
+    kinect_times, positions = wrist_trajectory(recorder.tracks)
+    imu_times, acc = imu_acceleration(listener, time_column)
+    result = estimate_offset(kinect_times, positions, imu_times, acc, max_offset=max_offset)
+    result["time_column"] = time_column
+    (session or recorder.session).update_metadata({"imu_offset": result})
+    return result
+
+
+def main(argv=None):
+    """
+    estimate the offset of a saved recording: WristRight of kin-sample-hand.csv and a CSV of the
+    fused packets of the Listener (get_recorded(["fused"], as_type="dataframe"))
+    """
+    parser = argparse.ArgumentParser(description="Clock offset between a Kinect recording and an IMU")
+    parser.add_argument("session", help="session directory, e.g. recordings/sample-20200101-120000")
+    parser.add_argument("imu", help="CSV file with the fused packets")
+    parser.add_argument("--time-column", default="timestamp_sensor", help="timestamps of the IMU that are aligned")
+    parser.add_argument("--max-offset", type=float, default=None, help="largest offset in seconds")
+    args = parser.parse_args(argv)
+
+    session = RecordingSession.open(args.session)
+    hand = pd.read_csv(session.file("kin-sample-hand.csv"))
+    hand = hand[hand["typ"] == "WristRight"]
+    hand = hand[hand["tracking_id"] == hand["tracking_id"].value_counts().idxmax()]
+    imu = pd.read_csv(args.imu)
+    if "type" in imu:
+        imu = imu[imu["type"] == "fused"]
+
+    result = estimate_offset(hand["timestamp"].to_numpy() / 1000.0, hand[["pos_x", "pos_y", "pos_z"]].to_numpy(),
+                             imu[args.time_column].to_numpy(), imu[["acc_x", "acc_y", "acc_z"]].to_numpy(),
+                             max_offset=args.max_offset)
+    result["time_column"] = args.time_column
+    session.update_metadata({"imu_offset": result})
+    print("offset %.3f s, correlation %.2f, confidence %.2f" % (result["offset"], result["correlation"], result["confidence"]))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import numpy as np
+
+from clock import ClockEstimator
+
+
+def test_skew_and_offset():
+    clock = ClockEstimator()
+    rng = np.random.RandomState(0)
+    for sensor_time in np.arange(0, 600, 0.1):
+        # 50 ppm skew, 10 s offset, delays of up to 20 ms and a few stalls
+        delay = rng.uniform(0, 0.02) + (0.5 if rng.rand() < 0.01 else 0.0)
+        clock.update(sensor_time, 10.0 + 1.00005 * sensor_time + delay)
+    assert abs(clock.skew - 1.00005) < 5e-6
+    assert abs(clock.map(600.0) - (10.0 + 1.00005 * 600.0)) < 0.02
+    assert clock.steps == []
+
+
+def test_step_detection():
+    clock = ClockEstimator(step_count=25)
+    for sensor_time in np.arange(0, 60, 0.1):
+        host_time = 100.0 + sensor_time + (2.0 if sensor_time >= 30 else 0.0)
+        clock.update(sensor_time, host_time)
+    assert len(clock.steps) == 1
+    assert abs(clock.steps[0][2] - 2.0) < 0.01
+    assert abs(clock.map(59.9) - (102.0 + 59.9)) < 0.01
+
+
+def test_batch_counts_messages():
+    clock = ClockEstimator(step_count=5)
+    for message in range(20):
+        sensor_times = message * 1.0 + np.arange(10) * 0.1
+        host_time = 100.0 + sensor_times[-1] + (2.0 if message >= 10 else 0.0)
+        mapped = clock.update_batch(sensor_times, host_time)
+        if message < 10 + 5 - 1:
+            assert clock.steps == [] # step_count messages, not samples
+    assert clock.count == 20
+    assert len(clock.steps) == 1
+    np.testing.assert_allclose(mapped, 102.0 + sensor_times, atol=0.01)
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+import listener
+from listener import PacketColumns, PacketStore
+
+
+def fused_rows(start, count):
+    # seq, timestamp_sensor, timestamp, timestamp_host, acc, gyro, counter; receive time 10 ms per row
+    return [(i, i * 0.01, 100.0 + i * 0.01, 100.0 + i * 0.01, 0.1, 0.2, 0.3, 1.0, 2.0, 3.0, i)
+            for i in range(start, start + count)]
+
+
+def test_spill_and_search(tmp_path):
+    columns = PacketColumns("fused", capacity=4, max_rows=100, spill_dir=str(tmp_path), chunk_rows=32)
+    for start in range(0, 1000, 50):
+        columns.extend(fused_rows(start, 50))
+    assert len(columns) == 1000
+    assert columns.first == 0
+    assert len(columns._columns[0]) <= 100 # memory stays bounded
+    assert os.path.exists(os.path.join(str(tmp_path), "fused.counter.bin"))
+
+    # rows are numbered over disk and memory
+    np.testing.assert_array_equal(columns.column("counter"), np.arange(1000))
+    np.testing.assert_array_equal(columns.column("counter", 890, 910), np.arange(890, 910))
+    assert columns.search(100.0 + 5 * 0.01) == 5 # on disk
+    assert columns.search(100.0 + 950 * 0.01) == 950 # in memory
+    assert columns.search(100.0 + 950 * 0.01, side="right") == 951
+    assert columns.rows_between(100.0 + 10 * 0.01 - 0.001, 100.0 + 20 * 0.01 - 0.001) == (10, 20)
+    columns.close()
+
+
+def test_dropped_rows_without_spill_dir():
+    columns = PacketColumns("fused", max_rows=100, chunk_rows=32)
+    for start in range(0, 500, 50):
+        columns.extend(fused_rows(start, 50))
+    assert columns.first > 0
+    assert columns.rows_between() == (columns.first, 500)
+    assert columns.rows_between(since=0.0)[0] == columns.first
+    np.testing.assert_array_equal(columns.column("counter"), np.arange(columns.first, 500))
+
+
+def test_spill_dirs_are_unique(tmp_path):
+    first = PacketStore(max_rows=100, spill_dir=str(tmp_path))
+    second = PacketStore(max_rows=100, spill_dir=str(tmp_path))
+    assert first.spill_dir != second.spill_dir
+    assert os.path.dirname(first.spill_dir) == str(tmp_path)
+    for store in (first, second):
+        for columns in store.columns.values():
+            columns.close()
+
+
+def test_chunk_cache_is_bounded():
+    rows = 4 * listener.FRAME_CHUNK_ROWS
+    columns = PacketColumns("fused", max_rows=2 * listener.FRAME_CHUNK_ROWS)
+    for start in range(0, rows, 4096):
+        columns.extend(fused_rows(start, 4096))
+    frame = columns.dataframe(columns.first, rows)
+    assert len(frame) == rows - columns.first
+    assert frame["counter"].iloc[-1] == rows - 1
+    assert len(columns._frames) <= columns._frame_limit
+
+
+def test_ingest_batch_messages():
+    store = PacketStore()
+    messages = [(listener._fused_batch_message(i * 8, 8), 100.0 + i) for i in range(4)]
+    assert store.ingest(messages) == 32
+    recorded = store.get_recorded(filter_types=["fused"], as_type="columns")["fused"]
+    np.testing.assert_array_equal(recorded["counter"], np.arange(32))
+    assert store.gaps.summary()["lost"] == 0
+    assert store.clock.count == 4 # one clock update per message
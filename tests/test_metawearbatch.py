@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import metawearbatch
+import metaweardata_pb2
+
+
+def batch(samples=50, first=1000):
+    counters = np.arange(first, first + samples)
+    counters[10:] += 3 # a gap in the counters
+    timestamps = 1600000000000 + counters * 10
+    rng = np.random.RandomState(0)
+    acc = rng.uniform(-2, 2, (samples, 3)).astype(np.float32)
+    gyro = rng.uniform(-250, 250, (samples, 3)).astype(np.float32)
+    return timestamps, acc, gyro, counters
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 1 << 35, (1 << 64) - 1], dtype=np.uint64)
+    encoded = metawearbatch.encode_varints(values)
+    assert encoded[:4].tolist() == [0, 1, 127, 0x80]
+    np.testing.assert_array_equal(metawearbatch.decode_varints(encoded), values)
+    with pytest.raises(ValueError):
+        metawearbatch.decode_varints(encoded[:-1])
+
+
+def test_zigzag_round_trip():
+    values = np.array([0, -1, 1, -2, 2, -(1 << 62), (1 << 62)], dtype=np.int64)
+    wire = metawearbatch.zigzag_encode(values)
+    assert wire[:5].tolist() == [0, 1, 2, 3, 4]
+    np.testing.assert_array_equal(metawearbatch.zigzag_decode(wire), values)
+
+
+def test_encode_decode():
+    timestamps, acc, gyro, counters = batch()
+    msg = metawearbatch.encode(timestamps, acc, gyro, counters)
+    assert metawearbatch.is_batch(msg)
+    assert metawearbatch.is_batch(memoryview(msg))
+
+    columns = metawearbatch.decode(msg)
+    np.testing.assert_array_equal(columns["counter"], counters)
+    np.testing.assert_allclose(columns["timestamp_sensor"], timestamps / 1000.0)
+    for i, axis in enumerate("xyz"):
+        np.testing.assert_array_equal(columns["acc_" + axis], acc[:, i])
+        np.testing.assert_array_equal(columns["gyro_" + axis], gyro[:, i])
+
+
+def test_protobuf_parses_batch():
+    timestamps, acc, gyro, counters = batch(samples=5)
+    packet = metaweardata_pb2.MetaWearData()
+    packet.ParseFromString(metawearbatch.encode(timestamps, acc, gyro, counters))
+    assert packet.type == metaweardata_pb2.MetaWearData.FUSED_BATCH
+    assert packet.timestamp == timestamps[0]
+    assert packet.extra == counters[0]
+    assert list(packet.batch.counter_delta) == np.diff(counters, prepend=counters[0]).tolist()
+    np.testing.assert_array_equal(np.array(packet.batch.acc_y, dtype=np.float32), acc[:, 1])
+
+
+def test_single_sample_is_not_batch():
+    packet = metaweardata_pb2.MetaWearData()
+    packet.type = metaweardata_pb2.MetaWearData.FUSED
+    packet.timestamp = 1000
+    packet.extra = 3
+    msg = packet.SerializeToString()
+    assert not metawearbatch.is_batch(msg)
+    with pytest.raises(ValueError):
+        metawearbatch.decode(msg)
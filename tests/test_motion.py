@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+PyKinectV2 = pytest.importorskip("PyKinectV2")
+from motion import MotionGate
+
+
+def body(x):
+    positions = np.zeros((1, PyKinectV2.JointType_Count, 3), dtype=np.float32)
+    positions[0, :, 0] = x
+    return positions
+
+
+def run(gate, frames):
+    # frames: (timestamp, x), returns the timestamps of the stored frames
+    stored = []
+    for timestamp, x in frames:
+        stored += gate.update(body(x), [True], timestamp, timestamp, [1])
+    return stored
+
+
+def test_keyframes_while_still():
+    gate = MotionGate(body_count=1, threshold=0.3, hold_ms=100, pre_roll_ms=100, keyframe_ms=1000)
+    stored = run(gate, [(t, 0.0) for t in range(0, 3000, 33)])
+    # the first frame is a new body (motion), then hold, then one keyframe per second
+    assert stored[0] == 0
+    assert all(b - a >= 990 for a, b in zip(stored[4:], stored[5:]))
+    assert gate.stored + gate.skipped + len(gate._pre_roll) == len(range(0, 3000, 33))
+
+
+def test_onset_gets_pre_roll():
+    gate = MotionGate(body_count=1, threshold=0.3, hold_ms=100, pre_roll_ms=100, keyframe_ms=10000)
+    still = [(t, 0.0) for t in range(0, 990, 33)]
+    run(gate, still)
+    onset = run(gate, [(990, 0.5)])
+    assert onset[-1] == 990
+    assert all(990 - t <= 100 for t in onset)
+    assert len(onset) > 1
+
+
+def test_pre_roll_after_gap_without_bodies():
+    gate = MotionGate(body_count=1, threshold=0.3, hold_ms=100, pre_roll_ms=100, keyframe_ms=10000)
+    run(gate, [(t, 0.0) for t in range(0, 990, 33)])
+    # no body frames for 5 s (Recorder skips the gate), then motion starts
+    onset = run(gate, [(6000, 0.0), (6033, 0.5)])
+    assert onset == [6000, 6033]
@@ -0,0 +1,98 @@
+import numpy as np
+
+from packetloss import GapDetector
+
+
+def feed(detector, counters, times=None):
+    times = range(len(counters)) if times is None else times
+    for counter, sensor_time in zip(counters, times):
+        detector.update(counter, sensor_time * 0.01, sensor_time * 0.01)
+    return detector
+
+
+def test_contiguous():
+    detector = feed(GapDetector(), range(1000))
+    assert detector.summary() == {"received": 1000, "lost": 0, "duplicated": 0, "reordered": 0, "restarts": 0, "gaps": 0}
+
+
+def test_gap():
+    detector = feed(GapDetector(), [c for c in range(100) if c not in (40, 41, 42)])
+    assert detector.lost == 3
+    assert detector.gaps[0][:3] == [40, 3, 0]
+
+
+def test_reordered_and_duplicate():
+    detector = feed(GapDetector(), [0, 1, 3, 4, 2, 2, 5])
+    assert detector.lost == 0
+    assert detector.reordered == 1
+    assert detector.duplicated == 1
+    assert detector.received == 6
+    assert detector.gaps[0][2] == 1 # recovered
+
+
+def test_far_restart():
+    detector = feed(GapDetector(), list(range(5000)) + list(range(10)))
+    assert detector.restarts == 1
+    assert detector.lost == 0
+    assert detector.received == 5010
+
+
+def test_short_restart():
+    # the sensor restarts 10 packets back, sensor times go on, then 2 packets are lost
+    counters = list(range(2000)) + [c for c in range(1990, 2100) if c not in (2030, 2031)]
+    detector = feed(GapDetector(), counters)
+    assert detector.restarts == 1
+    assert detector.duplicated == 0
+    assert detector.lost == 2
+    assert detector.received == len(counters)
+
+
+def test_resent_burst_is_not_a_restart():
+    # 20 old packets are sent again with their old sensor times
+    counters = list(range(1000)) + list(range(900, 920)) + list(range(1000, 1100))
+    times = list(range(1000)) + list(range(900, 920)) + list(range(1020, 1120))
+    detector = feed(GapDetector(), counters, times)
+    assert detector.restarts == 0
+    assert detector.duplicated == 20
+    assert detector.lost == 0
+    assert detector.received == 1100
+
+
+def test_short_duplicate_run():
+    detector = feed(GapDetector(), list(range(100)) + [95, 96, 97] + list(range(100, 200)))
+    assert detector.restarts == 0
+    assert detector.duplicated == 3
+
+
+def test_late_packets_of_large_gap_are_bounded():
+    detector = GapDetector(window=500, restart=1 << 20)
+    feed(detector, [0, 100000])
+    detector.update(10, 2.0, 2.0) # within the first window packets of the gap
+    detector.update(50000, 2.0, 2.0) # too far into the gap
+    assert detector.reordered == 1
+    assert detector._recent[0][1].bit_length() <= 500
+
+
+def test_modulo_wrap():
+    detector = feed(GapDetector(modulo=1 << 8), [c % 256 for c in range(200, 400) if c != 300])
+    assert detector.lost == 1
+    assert detector.gaps[0][0] == 300 % 256
+    assert detector.restarts == 0
+
+
+def test_batch():
+    detector = GapDetector()
+    detector.update_batch(np.arange(500), np.arange(500) * 0.01, 1.0)
+    detector.update_batch(np.arange(500, 600), np.arange(500, 600) * 0.01, 2.0)
+    detector.update_batch(np.array([600, 603]), np.array([6.0, 6.03]), 3.0)
+    assert detector.received == 602
+    assert detector.lost == 2
+
+
+def test_loss_callback():
+    events = []
+    detector = GapDetector(threshold=0.01, window=100)
+    detector.register_callback(events.append)
+    feed(detector, [c for c in range(300) if not 120 <= c < 125])
+    assert len(events) == 1
+    assert events[0]["lost"] == 5
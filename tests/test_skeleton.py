@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+import pytest
+
+PyKinectV2 = pytest.importorskip("PyKinectV2")
+pytest.importorskip("zmq")
+import skeleton
+from skeleton import SkeletonPublisher, SkeletonSubscriber
+
+JOINTS = PyKinectV2.JointType_Count
+
+
+def test_encode_decode():
+    positions = np.arange(2 * JOINTS * 3, dtype=np.float32).reshape(2, JOINTS, 3)
+    states = np.full((2, JOINTS), PyKinectV2.TrackingState_Inferred, dtype=np.uint8)
+    msg = skeleton.encode(5, 1600000000000, [1 << 63, 7], positions, states)
+    assert len(msg) == skeleton.HEADER.size + 2 * skeleton.BODY_DTYPE.itemsize
+
+    frame = skeleton.decode(msg)
+    assert (frame.sequence, frame.timestamp) == (5, 1600000000000)
+    assert frame.tracking_ids.tolist() == [1 << 63, 7]
+    np.testing.assert_array_equal(frame.positions, positions)
+    np.testing.assert_array_equal(frame.tracking_states, states)
+    with pytest.raises(ValueError):
+        skeleton.decode(b"XX" + msg[2:])
+
+
+def test_publish_untracked_bodies():
+    address = "inproc://test-skeleton"
+    publisher = SkeletonPublisher(address)
+    subscriber = SkeletonSubscriber(address)
+    time.sleep(0.1) # subscription has to arrive before the first message
+    try:
+        positions = np.zeros((6, JOINTS, 3), dtype=np.float32)
+        positions[2] = 1.0
+        tracked = np.zeros(6, dtype=bool)
+        tracked[2] = True
+        # untracked bodies have tracking_id -1, which does not fit into uint64
+        publisher.publish(positions, tracked, [-1, -1, 42, -1, -1, -1], 1000)
+        frame = subscriber.recv(timeout=1000)
+        assert frame is not None
+        assert frame.tracking_ids.tolist() == [42]
+        np.testing.assert_array_equal(frame.positions[0], positions[2])
+        assert (frame.tracking_states == PyKinectV2.TrackingState_Tracked).all()
+    finally:
+        subscriber.close()
+        publisher.close()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+PyKinectV2 = pytest.importorskip("PyKinectV2")
+from smoothing import FILTERS, OneEuroFilter, DoubleExponentialFilter
+
+JOINTS = PyKinectV2.JointType_Count
+
+
+def frame(x, bodies=2):
+    positions = np.zeros((bodies, JOINTS, 3), dtype=np.float32)
+    positions[..., 0] = x
+    return positions
+
+
+@pytest.mark.parametrize("name", sorted(FILTERS))
+def test_first_frame_and_untracked(name):
+    joint_filter = FILTERS[name](body_count=2)
+    filtered = joint_filter.update(frame(1.0), [True, False], 0.0)
+    np.testing.assert_array_equal(filtered[0], frame(1.0)[0]) # starts from the raw position
+    assert np.isnan(filtered[1]).all()
+
+
+@pytest.mark.parametrize("name", sorted(FILTERS))
+def test_smooths_and_converges(name):
+    joint_filter = FILTERS[name](body_count=1)
+    rng = np.random.RandomState(0)
+    raw = []
+    smoothed = []
+    for i in range(300):
+        x = 1.0 + rng.normal(0, 0.01)
+        raw.append(x)
+        smoothed.append(joint_filter.update(frame(x, 1), [True], i / 30.0)[0, 0, 0])
+    assert np.std(smoothed[100:]) < 0.7 * np.std(raw[100:])
+    assert abs(np.mean(smoothed[100:]) - 1.0) < 0.01
+
+
+def test_new_tracking_id_resets():
+    joint_filter = DoubleExponentialFilter(body_count=1)
+    for i in range(10):
+        joint_filter.update(frame(0.0, 1), [True], i / 30.0, tracking_ids=[1])
+    same = joint_filter.update(frame(1.0, 1), [True], 10 / 30.0, tracking_ids=[1])
+    assert same[0, 0, 0] < 1.0
+    new = joint_filter.update(frame(1.0, 1), [True], 11 / 30.0, tracking_ids=[2])
+    assert new[0, 0, 0] == 1.0
+
+
+def test_tracking_loss_resets():
+    joint_filter = OneEuroFilter(body_count=1)
+    joint_filter.update(frame(0.0, 1), [True], 0.0)
+    assert np.isnan(joint_filter.update(frame(0.0, 1), [False], 1 / 30.0)).all()
+    restarted = joint_filter.update(frame(2.0, 1), [True], 2 / 30.0)
+    assert restarted[0, 0, 0] == 2.0
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("PyKinectV2")
+from sync import estimate_offset
+
+
+def wrist(t):
+    # rest with a few movements of different length, so the correlation has one clear peak
+    x = np.zeros_like(t)
+    for start, length in ((3.0, 0.6), (7.5, 1.2), (12.0, 0.4), (15.0, 0.9)):
+        inside = (t >= start) & (t < start + length)
+        x[inside] += 0.15 * (1 - np.cos(2 * np.pi * (t[inside] - start) / length))
+    return np.stack([x, 0.3 * x, np.zeros_like(t)], axis=1)
+
+
+def imu(t):
+    # acceleration of the same trajectory, with gravity on the z axis
+    dt = 1e-3
+    acc = (wrist(t + dt) - 2 * wrist(t) + wrist(t - dt)) / dt ** 2
+    acc[:, 2] += 9.81
+    return acc
+
+
+def test_estimate_offset():
+    offset = 0.37 # kinect time = imu time + offset
+    kinect_times = 1000.0 + np.arange(0, 20, 1 / 30.0)
+    imu_times = np.arange(0, 20, 1 / 100.0) + 1000.0 - offset
+    rng = np.random.RandomState(0)
+    positions = wrist(kinect_times - 1000.0) + rng.normal(0, 0.002, (len(kinect_times), 3))
+    acc = imu(imu_times + offset - 1000.0) + rng.normal(0, 0.05, (len(imu_times), 3))
+
+    result = estimate_offset(kinect_times, positions, imu_times, acc, max_offset=5.0)
+    assert abs(result["offset"] - offset) < 0.03
+    assert result["confidence"] > 0.2
+
+
+def test_no_overlap_within_max_offset():
+    times = np.arange(0, 20, 1 / 30.0)
+    with pytest.raises(ValueError):
+        estimate_offset(times, wrist(times), times + 100.0, imu(times), max_offset=1.0)
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PyKinectV2 = pytest.importorskip("PyKinectV2")
+from tracks import TRACK_COLUMNS
+from wal import WAL_FILE, RECORD_POI, WriteAheadLog, read_records, recover
+
+WRIST = PyKinectV2.JointType_WristRight
+CATEGORIES = {
+    "tires": {"keys": ["1", "2"], "shape": "circle", "radius": 0.1, "draw_size": 25},
+    "fields": {"keys": ["a"], "shape": "rectangle", "radius": 0.2, "draw_size": 25}}
+
+
+def sample(frame, wrist_x):
+    positions = np.zeros((PyKinectV2.JointType_Count, 3), dtype=np.float32)
+    positions[WRIST] = (wrist_x, 0.0, 2.0)
+    return {'frame': frame, 'timestamp': 1000 + 33 * frame, 'positions': positions, 'hand_tip_point': (10.0, 20.0)}
+
+
+def write_log(path, distance_format="long"):
+    log = WriteAheadLog(path, TRACK_COLUMNS, range(PyKinectV2.JointType_Count), "test", commit_interval=0.01,
+                        settings={"poi_categories": CATEGORIES, "distance_format": distance_format})
+    for frame in range(4):
+        log.log_sample(7, 0, sample(frame, 0.1 * frame))
+        if frame == 1:
+            # set after frame 1, counts from frame 2 on
+            log.log_json(RECORD_POI, ("1", 10.0, 20.0, 0.0, 0.0, 2.0, 1, 1033))
+        if frame == 2:
+            log.log_json(RECORD_POI, ("a", 10.0, 20.0, 1.0, 0.0, 2.0, 2, 1066))
+    log.log_sample(8, 1, sample(3, 0.5))
+    log.close()
+
+
+def test_torn_record_is_ignored(tmp_path):
+    path = str(tmp_path / WAL_FILE)
+    write_log(path)
+    complete = list(read_records(path))
+    with open(path, "ab") as fh:
+        fh.write(b"\x10\x00\x00") # process died while writing the next header
+    assert list(read_records(path)) == complete
+
+
+def test_recover_tables(tmp_path):
+    write_log(str(tmp_path / WAL_FILE))
+    assert recover(str(tmp_path)) == 5
+
+    full = pd.read_csv(os.path.join(str(tmp_path), "kin-sample-full.csv"))
+    assert len(full) == 5 * PyKinectV2.JointType_Count
+    tires = pd.read_csv(os.path.join(str(tmp_path), "kin-sample-tires_all.csv"))
+    assert list(tires['key'].astype(str)) == ["1"]
+    fields = pd.read_csv(os.path.join(str(tmp_path), "kin-sample-fields-current.csv"))
+    assert list(fields['key']) == ["a"]
+
+    distances = pd.read_csv(os.path.join(str(tmp_path), "kin-sample-distances_all.csv"), index_col=0, dtype={'key': str})
+    rows = list(distances[['counter', 'tracking_id', 'key']].itertuples(index=False, name=None))
+    assert rows == [(2, 7, "1"), (3, 7, "1"), (3, 7, "a"), (3, 8, "1"), (3, 8, "a")]
+    np.testing.assert_allclose(distances['distance'], [0.2, 0.3, 0.7, 0.5, 0.5], atol=1e-6)
+
+
+def test_recover_wide_distances(tmp_path):
+    write_log(str(tmp_path / WAL_FILE), "wide")
+    recover(str(tmp_path))
+    distances = pd.read_csv(os.path.join(str(tmp_path), "kin-sample-distances_all.csv"), index_col=0)
+    assert list(distances.columns) == ['counter', 'tracking_id', 'timestamp', 'distance_1', 'distance_2', 'distance_a']
+    assert distances['distance_2'].isna().all()
+    assert len(distances) == 3
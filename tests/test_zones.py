@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+PyKinectV2 = pytest.importorskip("PyKinectV2")
+from zones import ZoneTracker, ZONE_ENTER, ZONE_DWELL, ZONE_EXIT
+
+WRIST = PyKinectV2.JointType_WristRight
+
+
+def distances(wrist, bodies=1):
+    # distances of all joints of all bodies to one POI, only the right wrist is near it
+    values = np.full((bodies, PyKinectV2.JointType_Count, 1), 10.0, dtype=np.float32)
+    values[0, WRIST, 0] = wrist
+    return values
+
+
+def names(events):
+    return [(event[0], event[1]) for event in events]
+
+
+def test_hysteresis_and_dwell():
+    tracker = ZoneTracker(joints=(WRIST,), enter_factor=1.0, exit_factor=1.2, dwell_ms=500)
+    steps = [(0.2, 0), (0.09, 100), (0.11, 200), (0.09, 300), (0.11, 700), (0.13, 800)]
+    events = []
+    for wrist, timestamp in steps:
+        events += tracker.update(distances(wrist), [0.1], ["a"], [7], timestamp // 100, timestamp)
+    # jitter between 0.09 and 0.11 stays inside, exit only above 0.12
+    assert [event[0] for event in events] == [ZONE_ENTER, ZONE_DWELL, ZONE_EXIT]
+    assert all(event[1] == 7 for event in events)
+    assert events[0][2:] == (WRIST, "a", 1, 100)
+
+
+def test_nan_is_outside():
+    tracker = ZoneTracker(joints=(WRIST,))
+    tracker.update(distances(0.05), [0.1], ["a"], [7], 0, 0)
+    events = tracker.update(distances(np.nan), [0.1], ["a"], [7], 1, 33)
+    assert names(events) == [(ZONE_EXIT, 7)]
+
+
+def test_slot_reused_by_another_body():
+    tracker = ZoneTracker(joints=(WRIST,))
+    assert names(tracker.update(distances(0.05), [0.1], ["a"], [7], 0, 0)) == [(ZONE_ENTER, 7)]
+    # same slot, same distance, but another person: the old stay ends, the new one starts
+    events = tracker.update(distances(0.05), [0.1], ["a"], [8], 1, 33)
+    assert names(events) == [(ZONE_EXIT, 7), (ZONE_ENTER, 8)]
+    assert tracker.update(distances(0.05), [0.1], ["a"], [8], 2, 66) == []
+
+
+def test_new_poi():
+    tracker = ZoneTracker(joints=(WRIST,))
+    tracker.update(distances(0.05), [0.1], ["a"], [7], 0, 0)
+    two = np.concatenate([distances(0.05), distances(0.05)], axis=2)
+    events = tracker.update(two, [0.1, 0.1], ["a", "b"], [7], 1, 33)
+    assert [(event[0], event[3]) for event in events] == [(ZONE_ENTER, "b")]
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+
+import PyKinectV2
+
+# names of the joints, index = JointType
+JOINT_NAMES = ['SpineBase','SpineMid','Neck','Head',
+               'ShoulderLeft','ElbowLeft','WristLeft','HandLeft',
+               'ShoulderRight','ElbowRight','WristRight','HandRight',
+               'HipLeft','KneeLeft','AnkleLeft','FootLeft',
+               'HipRight','KneeRight','AnkleRight','FootRight',
+               'SpineShoulder','HandTipLeft','ThumbLeft','HandTipRight','ThumbRight']
+
+# columns stored per sample of a track: name -> (shape of one sample, dtype)
+TRACK_COLUMNS = {
+    'frame': ((), np.int64), # counter of body frames, same for all bodies in one frame
+    'timestamp': ((), np.int64), # unix timestamp in ms
+    'positions': ((PyKinectV2.JointType_Count, 3), np.float32), # camera space positions of all joints
+    'hand_tip_point': ((2,), np.float32)} # color space point of HandTipRight, for positioning of POI
+# optional columns (see selection.RecordingSelection): 'hand_states' (2,) uint8,
+# 'orientations' (joints, 4) float32 and 'tracking_states' (joints,) uint8
+
+
+def mask_inferred(positions, tracking_states, min_state=PyKinectV2.TrackingState_Tracked):
+    """
+    Replace positions of joints that are not tracked well enough with NaN, e.g. before filtering
+
+    :param positions: joint positions (..., joints, 3), e.g. BodyTrack.column('positions')
+    :param tracking_states: tracking states (..., joints) of the same samples
+    :param min_state: lowest TrackingState_* that is kept, TrackingState_Inferred to keep inferred joints
+    :return: copy of positions with NaN for the masked joints
+    """
+    return np.where((np.asarray(tracking_states) >= min_state)[..., np.newaxis], positions, np.nan).astype(positions.dtype, copy=False)
+
+
+class BodyTrack(object):
+    """
+    This class stores the samples of one tracked body in columns (one numpy array per column).
+
+    The arrays grow by doubling, so appending a sample is amortized O(1). The sample index
+    counts the samples of this track, the frame column the body frames of the whole recording.
+    """
+
+    def __init__(self, tracking_id, body_index, columns=TRACK_COLUMNS, capacity=256):
+        """
+        Create an empty track
+
+        :param tracking_id: KinectBody.tracking_id of the body
+        :param body_index: index of the body in the body frame (used for its color)
+        :param columns: dict of column name -> (shape of one sample, dtype)
+        :param capacity: initial number of samples
+        """
+        self.tracking_id = tracking_id
+        self.body_index = body_index
+        self._columns = {name: np.empty((capacity,) + shape, dtype=dtype) for name, (shape, dtype) in columns.items()}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, **values):
+        """
+        Append one sample
+
+        :param values: value of every column of the track, by column name
+        :return: sample index of the new sample
+        """
+        if self._size == len(self._columns['frame']):
+            for name, column in self._columns.items():
+                grown = np.empty((2 * len(column),) + column.shape[1:], dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[name] = grown
+        for name, value in values.items():
+            self._columns[name][self._size] = value
+        self._size += 1
+        return self._size - 1
+
+    def column(self, name):
+        """
+        :param name: name of the column
+        :return: array of all samples of the column (view, no copy)
+        """
+        return self._columns[name][:self._size]
+
+    def latest(self, name):
+        """
+        :param name: name of the column
+        :return: value of the column in the latest sample
+        """
+        return self._columns[name][self._size - 1]
+
+
+class TrackStore(object):
+    """
+    This class organizes samples into one BodyTrack per body, keyed by KinectBody.tracking_id.
+
+    A body that is lost and tracked again gets a new tracking_id from the Kinect, and therefore
+    a new track.
+    """
+
+    def __init__(self, columns=TRACK_COLUMNS, joints=None):
+        """
+        Create an empty store
+
+        :param columns: dict of column name -> (shape of one sample, dtype) of all tracks
+        :param joints: joint types in the positions column, in order, default all joints
+        """
+        self.columns = columns
+        self.joints = np.arange(PyKinectV2.JointType_Count) if joints is None else np.asarray(joints)
+        self._joint_column = dict((int(joint), column) for column, joint in enumerate(self.joints)) # joint type -> column
+        self.tracks = {} # tracking_id -> BodyTrack, in order of first appearance
+        self.frame_count = 0 # number of stored body frames (with at least one tracked body)
+        self.current_ids = [] # tracking_ids of the bodies in the latest frame
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def begin_frame(self):
+        """
+        Start a new body frame, all samples added until the next call belong to this frame
+
+        :return: frame counter of the new frame
+        """
+        self.frame_count += 1
+        self.current_ids = []
+        return self.frame_count - 1
+
+    def add(self, tracking_id, body_index, **values):
+        """
+        Add sample of one body to its track, creates the track for a new tracking_id
+
+        :param tracking_id: KinectBody.tracking_id of the body
+        :param body_index: index of the body in the body frame
+        :param values: value of every column, by column name
+        :return: sample index within the track
+        """
+        track = self.tracks.get(tracking_id)
+        if track is None:
+            track = self.tracks[tracking_id] = BodyTrack(tracking_id, body_index, self.columns)
+        self.current_ids.append(tracking_id)
+        return track.append(**values)
+
+    def track(self, tracking_id):
+        """
+        :param tracking_id: KinectBody.tracking_id of the body
+        :return: BodyTrack of the body, use BodyTrack.latest for its latest sample
+        """
+        return self.tracks[tracking_id]
+
+    def joint_position(self, track, joint):
+        """
+        :param track: BodyTrack of this store
+        :param joint: joint type, has to be recorded
+        :return: latest position of the joint (3,)
+        """
+        return track.latest('positions')[self._joint_column[joint]]
+
+    def nearest_current(self, joint=PyKinectV2.JointType_SpineBase):
+        """
+        Find the body of the latest frame that is nearest to the sensor, e.g. the subject at the workbench
+
+        :param joint: joint type used for the distance to the sensor, if it is not recorded the
+            mean distance of the recorded joints is used
+        :return: BodyTrack of that body, None if no body was tracked in the latest frame
+        """
+        nearest = None
+        nearest_z = None
+        for tracking_id in self.current_ids:
+            track = self.tracks[tracking_id]
+            if joint in self._joint_column:
+                z = self.joint_position(track, joint)[2]
+            else:
+                z = np.nanmean(track.latest('positions')[:, 2])
+            if nearest is None or z < nearest_z:
+                nearest, nearest_z = track, z
+        return nearest
+
+    def joint_dataframe(self, joints=None):
+        """
+        samples of all tracks as one table with one row per sample and joint
+
+        :param joints: optional, list of joint types to include, default all recorded joints,
+            joints that are not recorded are left out
+        :return: DataFrame with columns pos_x, pos_y, pos_z, typ, counter (= frame), timestamp,
+            tracking_id, sample (= sample index within the track), if recorded also ori_x, ori_y,
+            ori_z, ori_w (orientation quaternion) and state (TrackingState_*)
+        """
+        joints = self.joints if joints is None else [joint for joint in joints if joint in self._joint_column]
+        names = np.array(JOINT_NAMES, dtype=object)[np.asarray(joints, dtype=np.intp)]
+        columns = np.array([self._joint_column[int(joint)] for joint in joints], dtype=np.intp)
+
+        names_out = ['pos_x', 'pos_y', 'pos_z', 'typ', 'counter', 'timestamp', 'tracking_id', 'sample']
+        if 'orientations' in self.columns:
+            names_out += ['ori_x', 'ori_y', 'ori_z', 'ori_w']
+        if 'tracking_states' in self.columns:
+            names_out.append('state')
+
+        frames = []
+        for track in self.tracks.values():
+            n = len(track)
+            positions = track.column('positions')[:, columns, :].reshape(-1, 3)
+            data = {
+                'pos_x': positions[:, 0],
+                'pos_y': positions[:, 1],
+                'pos_z': positions[:, 2],
+                'typ': np.tile(names, n),
+                'counter': np.repeat(track.column('frame'), len(joints)),
+                'timestamp': np.repeat(track.column('timestamp'), len(joints)),
+                'tracking_id': track.tracking_id,
+                'sample': np.repeat(np.arange(n), len(joints))}
+            if 'orientations' in self.columns:
+                orientations = track.column('orientations')[:, columns, :].reshape(-1, 4)
+                for axis, name in enumerate(['ori_x', 'ori_y', 'ori_z', 'ori_w']):
+                    data[name] = orientations[:, axis]
+            if 'tracking_states' in self.columns:
+                data['state'] = track.column('tracking_states')[:, columns].reshape(-1)
+            frames.append(pd.DataFrame(data, columns=names_out))
+        if not frames:
+            return pd.DataFrame(columns=names_out)
+        return pd.concat(frames, ignore_index=True).sort_values(['counter', 'tracking_id', 'sample'], kind='stable', ignore_index=True)
+
+    def hand_tip_dataframe(self):
+        """
+        color space points and positions of HandTipRight of all tracks, one row per sample
+
+        :return: DataFrame with columns point_x, point_y, pos_x, pos_y, pos_z, counter, timestamp,
+            tracking_id, sample
+        """
+        frames = []
+        for track in self.tracks.values():
+            point = track.column('hand_tip_point')
+            position = track.column('positions')[:, self._joint_column[PyKinectV2.JointType_HandTipRight], :]
+            frames.append(pd.DataFrame({
+                'point_x': point[:, 0],
+                'point_y': point[:, 1],
+                'pos_x': position[:, 0],
+                'pos_y': position[:, 1],
+                'pos_z': position[:, 2],
+                'counter': track.column('frame'),
+                'timestamp': track.column('timestamp'),
+                'tracking_id': track.tracking_id,
+                'sample': np.arange(len(track))}))
+        if not frames:
+            return pd.DataFrame(columns=['point_x', 'point_y', 'pos_x', 'pos_y', 'pos_z', 'counter', 'timestamp', 'tracking_id', 'sample'])
+        return pd.concat(frames, ignore_index=True).sort_values(['counter', 'tracking_id'], kind='stable', ignore_index=True)
+
+    def hand_state_dataframe(self):
+        """
+        open/closed state of both hands of all tracks (PyKinectV2.HandState_*), one row per sample,
+        only if the tracks have a hand_states column
+
+        :return: DataFrame with columns hand_left_state, hand_right_state, counter, timestamp, tracking_id, sample
+        """
+        frames = []
+        for track in self.tracks.values():
+            states = track.column('hand_states')
+            frames.append(pd.DataFrame({
+                'hand_left_state': states[:, 0],
+                'hand_right_state': states[:, 1],
+                'counter': track.column('frame'),
+                'timestamp': track.column('timestamp'),
+                'tracking_id': track.tracking_id,
+                'sample': np.arange(len(track))}))
+        if not frames:
+            return pd.DataFrame(columns=['hand_left_state', 'hand_right_state', 'counter', 'timestamp', 'tracking_id', 'sample'])
+        return pd.concat(frames, ignore_index=True).sort_values(['counter', 'tracking_id'], kind='stable', ignore_index=True)
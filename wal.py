@@ -0,0 +1,285 @@
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# record types
+RECORD_META = 0 # JSON: session name and column layout of samples
+RECORD_SAMPLE = 1 # one sample of one body
+RECORD_EVENT = 2 # one row of the event log
+RECORD_POI = 3 # JSON: POI row
+RECORD_ZONE = 4 # JSON: zone event row
+
+# every record: payload length, crc32 of payload, record type, payload
+RECORD_HEADER = struct.Struct("<IIB")
+# start of a sample payload: tracking_id, body_index, followed by the track columns
+SAMPLE_HEADER = struct.Struct("<QB")
+
+WAL_FILE = "session.wal"
+
+
+class WriteAheadLog(object):
+    """
+    This class appends everything the Recorder collects to a binary log file as it arrives, so a
+    session can be recovered if the process dies before the csv-files are saved.
+
+    Records are collected in memory and written with one write and fsync per commit interval
+    (group commit) by a background thread, so the recording loop only pays for packing the record.
+    """
+
+    def __init__(self, path, columns, joints, session_name=None, commit_interval=0.2, settings=None):
+        """
+        Create the log file and start the commit thread
+
+        :param path: path of the log file
+        :param columns: layout of the samples, dict of column name -> (shape, dtype) as in tracks.TRACK_COLUMNS
+        :param joints: joint types in the positions column
+        :param session_name: name of the session, saved in the meta record
+        :param commit_interval: seconds between two commits
+        :param settings: optional, JSON serializable settings of the recording saved in the meta record,
+            poi_categories and distance_format are used by recover
+        """
+        self.path = path
+        self.columns = columns
+        self.commit_interval = commit_interval
+
+        self._fh = open(path, "ab")
+        self._pending = bytearray()
+        self._lock = threading.Lock()
+        self._active = True
+
+        self.log_json(RECORD_META, {
+            "session": session_name,
+            "started": time.time(),
+            "joints": [int(joint) for joint in joints],
+            "columns": [[name, list(shape), np.dtype(dtype).str] for name, (shape, dtype) in columns.items()],
+            "settings": settings or {}})
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _append(self, record_type, payload):
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload), record_type) + payload
+        with self._lock:
+            self._pending += record
+
+    def log_sample(self, tracking_id, body_index, values):
+        """
+        Log one sample of one body
+
+        :param tracking_id: KinectBody.tracking_id of the body
+        :param body_index: index of the body in the body frame
+        :param values: value of every track column, by column name
+        """
+        parts = [SAMPLE_HEADER.pack(tracking_id, body_index)]
+        for name, (shape, dtype) in self.columns.items():
+            parts.append(np.asarray(values[name], dtype=dtype).tobytes())
+        self._append(RECORD_SAMPLE, b"".join(parts))
+
+    def log_event(self, row):
+        """
+        Log one row of the event log
+
+        :param row: element of an eventlog.EVENT_DTYPE array
+        """
+        self._append(RECORD_EVENT, row.tobytes())
+
+    def log_json(self, record_type, data):
+        """
+        Log a record with JSON payload (meta data, POIs, zone events)
+
+        :param record_type: RECORD_META, RECORD_POI or RECORD_ZONE
+        :param data: JSON serializable data
+        """
+        self._append(record_type, json.dumps(data).encode("utf-8"))
+
+    def commit(self):
+        """
+        Write pending records to the file and make them durable
+        """
+        with self._lock:
+            pending, self._pending = self._pending, bytearray()
+        if pending:
+            self._fh.write(pending)
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def _run(self):
+        while self._active:
+            time.sleep(self.commit_interval)
+            self.commit()
+
+    def close(self, remove=False):
+        """
+        Commit remaining records and close the file
+
+        :param remove: True to delete the log, e.g. after the session was saved completely
+        """
+        self._active = False
+        self._thread.join()
+        self.commit()
+        self._fh.close()
+        if remove:
+            os.remove(self.path)
+
+
+def read_records(path):
+    """
+    Read all complete records of a log file, stops at the first torn or corrupt record
+
+    :param path: path of the log file
+    :return: generator of (record type, payload)
+    """
+    with open(path, "rb") as fh:
+        data = fh.read()
+
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc, record_type = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        yield record_type, payload
+        offset = start + length
+
+
+def recover(session_dir):
+    """
+    Rebuild the session tables from the write-ahead log of a session that did not end normally.
+    Writes kin-sample-full.csv, kin-sample-hand.csv, kin-sample-hand-points.csv, kin-sample-events.csv,
+    kin-sample-positions_all.csv, kin-sample-positions-current.csv, kin-sample-zone-events.csv and
+    kin-sample-distances_all.csv. If the log has the POI categories of the recording, the current and
+    all-file of every category are written as well. Distances to POIs are not logged, they are
+    calculated from the recovered positions and POIs.
+
+    :param session_dir: directory of the session, contains session.wal
+    :return: number of recovered samples
+    """
+    # imported here, so the log can be written without pygame or Kinect modules
+    import PyKinectV2
+    from eventlog import EVENT_DTYPE
+    from poi import POI_COLUMNS, POIRegistry, distance_table
+    from tracks import TrackStore
+    from zones import ZONE_EVENT_COLUMNS
+
+    store = None
+    events = []
+    pois = []
+    zone_events = []
+    samples = 0
+    last_frame = None
+    settings = {}
+
+    for record_type, payload in read_records(os.path.join(session_dir, WAL_FILE)):
+        if record_type == RECORD_META:
+            meta = json.loads(payload.decode("utf-8"))
+            columns = {name: (tuple(shape), np.dtype(dtype)) for name, shape, dtype in meta["columns"]}
+            store = TrackStore(columns, meta["joints"])
+            settings = meta.get("settings", {})
+        elif record_type == RECORD_SAMPLE:
+            tracking_id, body_index = SAMPLE_HEADER.unpack_from(payload)
+            offset = SAMPLE_HEADER.size
+            values = {}
+            for name, (shape, dtype) in store.columns.items():
+                count = int(np.prod(shape))
+                values[name] = np.frombuffer(payload, dtype=dtype, count=count, offset=offset).reshape(shape)
+                offset += count * dtype.itemsize
+            if values['frame'] != last_frame:
+                store.begin_frame()
+                last_frame = values['frame']
+            store.add(tracking_id, body_index, **values)
+            samples += 1
+        elif record_type == RECORD_EVENT:
+            events.append(np.frombuffer(payload, dtype=EVENT_DTYPE)[0].tolist())
+        elif record_type == RECORD_POI:
+            pois.append(tuple(json.loads(payload.decode("utf-8"))))
+        elif record_type == RECORD_ZONE:
+            zone_events.append(tuple(json.loads(payload.decode("utf-8"))))
+
+    if store is None:
+        raise ValueError("No session data in {}".format(session_dir))
+
+    if 'hand_states' in store.columns:
+        store.hand_state_dataframe().to_csv(os.path.join(session_dir, "kin-sample-hand-states.csv"))
+    store.joint_dataframe().to_csv(os.path.join(session_dir, "kin-sample-full.csv"))
+    store.joint_dataframe([PyKinectV2.JointType_WristRight]).to_csv(os.path.join(session_dir, "kin-sample-hand.csv"))
+    store.hand_tip_dataframe().to_csv(os.path.join(session_dir, "kin-sample-hand-points.csv"))
+    pd.DataFrame(events, columns=list(EVENT_DTYPE.names)).to_csv(os.path.join(session_dir, "kin-sample-events.csv"), index=False)
+    pd.DataFrame(pois, columns=POI_COLUMNS).to_csv(os.path.join(session_dir, "kin-sample-positions_all.csv"))
+    current = dict((row[0], row) for row in pois)
+    pd.DataFrame(list(current.values()), columns=POI_COLUMNS).to_csv(os.path.join(session_dir, "kin-sample-positions-current.csv"))
+    pd.DataFrame(zone_events, columns=ZONE_EVENT_COLUMNS).to_csv(os.path.join(session_dir, "kin-sample-zone-events.csv"))
+
+    categories = settings.get("poi_categories")
+    keys = None # keys of the wide distance columns
+    if categories is not None:
+        registry = POIRegistry(categories)
+        for row in pois:
+            if registry.category_of(row[0]) is not None:
+                registry.set_poi(row[0], row[1:3], row[3:6], row[6], row[7])
+        for category in categories:
+            pd.DataFrame(registry.current_rows(category), columns=POI_COLUMNS).to_csv(
+                os.path.join(session_dir, "kin-sample-%s-current.csv" % category))
+            pd.DataFrame(registry.history_rows(category), columns=POI_COLUMNS).to_csv(
+                os.path.join(session_dir, "kin-sample-%s_all.csv" % category))
+        keys = list(registry.key_map)
+
+    if PyKinectV2.JointType_WristRight in store.joints:
+        distances = recover_distances(store, pois, PyKinectV2.JointType_WristRight)
+        distance_table(distances, settings.get("distance_format", "long"), keys).to_csv(
+            os.path.join(session_dir, "kin-sample-distances_all.csv"))
+    else:
+        print("WristRight is not recorded, distances are not recovered")
+    return samples
+
+
+def recover_distances(store, pois, joint):
+    """
+    distances between a joint and the POIs for all samples, like the Recorder calculates them while
+    recording: a POI set at body frame n counts from frame n + 1 on, one row per sample and POI
+    that is set, POIs in order of their first placement
+
+    :param store: TrackStore with the samples
+    :param pois: POI rows in order of placement, columns = poi.POI_COLUMNS
+    :param joint: joint type, has to be recorded
+    :return: list of distance rows, columns = poi.DISTANCE_COLUMNS
+    """
+    tracks = list(store.tracks.values())
+    if not tracks or not pois:
+        return []
+    column = list(store.joints).index(joint)
+    frames = np.concatenate([track.column('frame') for track in tracks])
+    timestamps = np.concatenate([track.column('timestamp') for track in tracks])
+    ids = np.concatenate([np.full(len(track), track.tracking_id, dtype=np.uint64) for track in tracks])
+    bodies = np.concatenate([np.full(len(track), track.body_index) for track in tracks])
+    positions = np.concatenate([track.column('positions')[:, column] for track in tracks])
+    order = np.lexsort((bodies, frames)) # samples in recording order
+    frames, timestamps, ids, positions = frames[order], timestamps[order], ids[order], positions[order]
+
+    keys = list(dict.fromkeys(row[0] for row in pois))
+    distances = np.empty((len(frames), len(keys)), dtype=np.float32)
+    valid = np.empty(distances.shape, dtype=bool)
+    for k, key in enumerate(keys):
+        rows = [row for row in pois if row[0] == key]
+        counters = np.array([row[6] for row in rows])
+        placed = np.array([row[3:6] for row in rows], dtype=np.float32)
+        index = np.searchsorted(counters, frames, side='left') - 1 # latest placement before the frame
+        valid[:, k] = index >= 0
+        distances[:, k] = np.linalg.norm(positions - placed[np.maximum(index, 0)], axis=1)
+
+    samples, columns = np.nonzero(valid) # sample-major, like the rows written while recording
+    return list(zip(frames[samples].tolist(), ids[samples].tolist(), [keys[k] for k in columns],
+                    distances[samples, columns].tolist(), timestamps[samples].tolist()))
+
+
+if __name__ == "__main__":
+    # python wal.py recordings/sample-<timestamp>
+    for directory in sys.argv[1:]:
+        print(directory, ":", recover(directory), "samples recovered")
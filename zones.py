@@ -0,0 +1,125 @@
+import numpy as np
+
+import PyKinectV2
+
+# names of zone events
+ZONE_ENTER = "enter"
+ZONE_DWELL = "dwell"
+ZONE_EXIT = "exit"
+
+# columns of zone events, tracking_id of the body as in the tracks and the skeleton stream
+ZONE_EVENT_COLUMNS = ['event', 'tracking_id', 'joint', 'key', 'counter', 'timestamp']
+
+# joints that are checked against the POI zones by default
+DEFAULT_ZONE_JOINTS = (PyKinectV2.JointType_WristRight, PyKinectV2.JointType_HandTipRight)
+
+
+class ZoneTracker(object):
+    """
+    This class detects when joints enter, dwell in and exit the zones around POIs.
+
+    The state of every body x joint x POI pair is kept in numpy arrays and updated once per frame.
+    A joint enters a zone when its distance gets below radius * enter_factor and only exits again
+    when its distance gets above radius * exit_factor (hysteresis), so jitter at the border does
+    not produce a stream of events. After staying dwell_ms in a zone, one dwell event is emitted.
+    Kinect reuses body slots for other people, if the tracking_id of a slot changes, the stays of
+    the previous body end with exit events and the new body starts outside.
+
+    You can register callbacks that will receive every zone event by using register_callback,
+    they are called during update, so in the same frame the event happened.
+    """
+
+    def __init__(self, joints=DEFAULT_ZONE_JOINTS, enter_factor=1.0, exit_factor=1.2, dwell_ms=500):
+        """
+        Create the tracker
+
+        :param joints: joint types that are checked against the zones
+        :param enter_factor: joint enters zone if distance <= radius * enter_factor
+        :param exit_factor: joint exits zone if distance > radius * exit_factor, >= enter_factor
+        :param dwell_ms: time in ms a joint has to stay in a zone for a dwell event
+        """
+        self.joints = np.asarray(joints, dtype=np.intp)
+        self.enter_factor = enter_factor
+        self.exit_factor = exit_factor
+        self.dwell_ms = dwell_ms
+
+        self.inside = np.zeros((0, len(self.joints), 0), dtype=bool) # (bodies, joints, POIs)
+        self.dwelled = np.zeros_like(self.inside) # dwell event already emitted for this stay
+        self.since = np.zeros(self.inside.shape, dtype=np.int64) # timestamp of entering
+        self.tracking_ids = [] # tracking_id of every body slot in the previous frame
+
+        self.callbacks = []
+
+    def register_callback(self, callback):
+        """
+        Register a new callback to be called for every zone event.
+
+        :param callback: Callable, has to accept a single argument (event row, columns = ZONE_EVENT_COLUMNS)
+        """
+        self.callbacks.append(callback)
+
+    def _resize(self, shape):
+        """
+        grow state arrays if new POIs were set or more bodies are given, new pairs start outside
+        """
+        self.tracking_ids = (self.tracking_ids + [None] * shape[0])[:shape[0]]
+        if self.inside.shape == shape:
+            return
+        old = tuple(min(a, b) for a, b in zip(self.inside.shape, shape))
+        for name in ('inside', 'dwelled', 'since'):
+            current = getattr(self, name)
+            resized = np.zeros(shape, dtype=current.dtype)
+            resized[:old[0], :old[1], :old[2]] = current[:old[0], :old[1], :old[2]]
+            setattr(self, name, resized)
+
+    def update(self, distances, radii, keys, tracking_ids, counter, timestamp):
+        """
+        Update zone states with the distances of the current frame and emit zone events
+
+        :param distances: distances of all joints to all POIs (bodies, JointType_Count, POIs),
+            NaN for untracked bodies, e.g. from POIEngine.distances
+        :param radii: radius of every POI (POIs,)
+        :param keys: key of every POI (POIs,)
+        :param tracking_ids: tracking_id of every body (bodies,)
+        :param counter: sample counter of the frame
+        :param timestamp: unix timestamp in ms of the frame
+        :return: list of zone events of this frame
+        """
+        distances = distances[:, self.joints, :]
+        self._resize(distances.shape)
+
+        previous = self.tracking_ids
+        self.tracking_ids = list(tracking_ids)
+        changed = np.array([a != b for a, b in zip(previous, self.tracking_ids)], dtype=bool)[:, None, None]
+
+        radii = np.asarray(radii, dtype=np.float32)
+        # NaN distances (tracking lost) never count as inside
+        enter = distances <= radii * self.enter_factor
+        stay = distances <= radii * self.exit_factor
+
+        exited = self.inside & (~stay | changed)
+        self.inside &= ~exited
+        entered = enter & ~self.inside
+        self.inside |= entered
+        self.since[entered] = timestamp
+        self.dwelled[entered | exited] = False
+        dwell = self.inside & ~self.dwelled & (timestamp - self.since >= self.dwell_ms)
+        self.dwelled |= dwell
+
+        events = []
+        if entered.any() or dwell.any() or exited.any():
+            for name, mask, ids in ((ZONE_EXIT, exited, previous), (ZONE_ENTER, entered, self.tracking_ids),
+                                    (ZONE_DWELL, dwell, self.tracking_ids)):
+                for body, joint, poi in zip(*np.nonzero(mask)):
+                    events.append((name, int(ids[body]), int(self.joints[joint]), keys[poi], counter, timestamp))
+            for event in events:
+                for callback in self.callbacks:
+                    callback(event)
+        return events
+
+    def reset(self):
+        """
+        Forget all zone states, e.g. after POIs were rearranged
+        """
+        self.inside[...] = False
+        self.dwelled[...] = False